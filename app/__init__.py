@@ -6,21 +6,37 @@ from flask_cors import CORS
 from flask_bcrypt import Bcrypt
 from flask_marshmallow import Marshmallow
 from flask import send_from_directory, send_file, request
+from flask.cli import run_command
+import click
 import os
 from pathlib import Path
-from flask_apscheduler import APScheduler 
+from app.database_routing import RoutingSession
 
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 migrate = Migrate()
 jwt = JWTManager()
 bcrypt = Bcrypt()
 ma = Marshmallow()
 
+def _loaded_by_cli_command():
+    """True when the app is loaded for a `flask` command other than `flask run`."""
+    if not os.environ.get('FLASK_RUN_FROM_CLI'):
+        return False
+    # Flask sets FLASK_RUN_FROM_CLI for every command; `flask run` loads the app
+    # inside its own click context
+    ctx = click.get_current_context(silent=True)
+    return ctx is None or ctx.command is not run_command
+
+
 def create_app():
     app = Flask(__name__)
     
     app.config.from_object('app.config.Config')
+
+    from app.database_engine import configure_engines, register_engine_listeners
+    configure_engines(app, 'web')
+    register_engine_listeners()
     
     # Initialize extensions
     db.init_app(app)
@@ -29,24 +45,24 @@ def create_app():
     CORS(app)
     bcrypt.init_app(app)
     ma.init_app(app)
-    scheduler = APScheduler()
-    scheduler.init_app(app)
 
-    with app.app_context():
-        # Import the task function within the context
-        from . import tasks
-        # Add the job if it doesn't already exist
-        if not scheduler.get_job('monthly-billing'):
-            scheduler.add_job(
-                id='monthly-billing',
-                func=tasks.generate_monthly_invoices,
-                trigger='cron',
-                hour=5, # Runs at 5:00 AM UTC every day
-                minute=0
-            )
-    
-    scheduler.start()
+    from app.services import rollups
+    rollups.register_listeners()
+
+    from app.utils.auth import register_principal_listeners
+    register_principal_listeners()
+
+    from app.utils.response_cache import register_response_cache_listeners
+    register_response_cache_listeners()
+
+    from app.database_routing import register_replica_routing
+    register_replica_routing(app)
+
+    from app.scheduling import init_scheduler, start_scheduler
+    init_scheduler(app)
     
+    from . import tasks
+
     # UPDATED: Import the renamed models
     from app.models import Tier1Seller, Tier2Seller, Admin, Project, Client
     
@@ -56,9 +72,17 @@ def create_app():
         
         # Register CLI commands
         register_db_commands(app)
+        tasks.register_billing_commands(app)
         
         # Auto-initialize database on startup
         initialize_database()
+
+    # Every process may run the scheduled jobs, but only the holder of the
+    # cluster-wide scheduler lease does (see app.scheduling). `flask run` serves
+    # like run.py; other CLI commands never take part, and gunicorn workers start
+    # it themselves, one candidate per host.
+    if app.config['SCHEDULER_ENABLED'] and not _loaded_by_cli_command():
+        start_scheduler(app)
     
     
     
@@ -133,6 +157,26 @@ def create_app():
             'port': 5021
         }, 200
     
+    @app.route('/api/health/db')
+    def db_health_check():
+        """Connection pool health of the worker serving the request"""
+        from app.database_engine import pool_health
+        healthy, report = pool_health()
+        return report, 200 if healthy else 503
+
+    @app.route('/api/metrics')
+    def metrics():
+        """In-process cache counters of this worker"""
+        from app.utils.auth import get_principal_cache
+        from app.utils.response_cache import get_response_cache
+        gateway = app.extensions.get('payment_gateway')
+        response_cache = get_response_cache()
+        return {
+            'principal_cache': get_principal_cache().snapshot(),
+            'response_cache': response_cache.snapshot() if response_cache else None,
+            'payment_gateway': getattr(gateway, 'stats', None)
+        }, 200
+    
     @app.route('/api/db-info')
     def db_info():
         try:
@@ -264,3 +308,41 @@ def create_app():
     
     return app
 
+
+def create_job_app():
+    """
+    Minimal application for background jobs and the `flask billing` CLI.
+    Only the config, the database and the models are set up: no blueprints,
+    no scheduler and no database bootstrap.
+
+    Usage: FLASK_APP="app:create_job_app" flask billing run
+    """
+    app = Flask(__name__)
+    app.config.from_object('app.config.Config')
+
+    from app.database_engine import configure_engines, register_engine_listeners
+    configure_engines(app, 'job')
+    register_engine_listeners()
+
+    db.init_app(app)
+    migrate.init_app(app, db)
+
+    # Register every model on the metadata
+    from app.models import Tier1Seller, Tier2Seller, Admin, Project, Client
+    from app.models import billing, ledger, scheduler, settlement
+
+    from app.services import rollups
+    rollups.register_listeners()
+
+    # Writes from jobs invalidate the dashboards cached in a shared store
+    from app.utils.response_cache import register_response_cache_listeners
+    register_response_cache_listeners()
+
+    from app.database_routing import register_replica_routing
+    register_replica_routing(app)
+
+    from . import tasks
+    tasks.register_billing_commands(app)
+
+    return app
+
@@ -7,7 +7,97 @@ class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key'
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Database connection pool of each process (see app.database_engine). A gunicorn
+    # deployment opens up to workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) connections.
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 30))  # seconds to wait for a free connection
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))  # seconds before a connection is replaced
+    DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', 'true').lower() == 'true'
+
+    # PostgreSQL statement timeouts in milliseconds (0 = none) for request handlers,
+    # background jobs and streaming exports.
+    DB_STATEMENT_TIMEOUTS = {
+        'web': int(os.environ.get('DB_STATEMENT_TIMEOUT_WEB_MS', 30000)),
+        'job': int(os.environ.get('DB_STATEMENT_TIMEOUT_JOB_MS', 0)),
+        'export': int(os.environ.get('DB_STATEMENT_TIMEOUT_EXPORT_MS', 0)),
+    }
+
+    # Optional read replica, configured as the 'replica' bind. Read-only endpoints and
+    # exports read from it (see app.database_routing); a client that wrote is kept on
+    # the primary for REPLICA_PRIMARY_PIN_SECONDS, longer than the expected replica lag.
+    DATABASE_REPLICA_URL = os.environ.get('DATABASE_REPLICA_URL')
+    REPLICA_PRIMARY_PIN_SECONDS = int(os.environ.get('REPLICA_PRIMARY_PIN_SECONDS', 5))
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY')
     JWT_ACCESS_TOKEN_EXPIRES = False  # Tokens don't expire (adjust as needed)
     STRIPE_SECRET_KEY = os.environ.get('STRIPE_SECRET_KEY')
-    STRIPE_WEBHOOK_SECRET = os.environ.get('STRIPE_WEBHOOK_SECRET')
\ No newline at end of file
+    STRIPE_WEBHOOK_SECRET = os.environ.get('STRIPE_WEBHOOK_SECRET')
+    ADMIN_STRIPE_ACCOUNT_ID = os.environ.get('ADMIN_STRIPE_ACCOUNT_ID')
+
+    # Start the APScheduler jobs in create_app(). The gunicorn launcher disables this
+    # in the master and, unless the operator set it to false (WEB_SCHEDULER), starts the
+    # scheduler in the one worker per host holding SCHEDULER_LOCK_FILE.
+    SCHEDULER_ENABLED = os.environ.get('SCHEDULER_ENABLED', 'true').lower() == 'true'
+    SCHEDULER_LOCK_FILE = os.environ.get('SCHEDULER_LOCK_FILE', '/tmp/billing-backend-scheduler.lock')
+    # Cluster-wide scheduler lease (scheduler_leases table): a leader that has not
+    # renewed it for this many seconds is replaced by another process.
+    SCHEDULER_LEASE_SECONDS = int(os.environ.get('SCHEDULER_LEASE_SECONDS', 30))
+
+    # Monthly billing job: number of shards to split a run into, and the
+    # project column ('id' or 'tier1_seller') the shards are hashed on (PostgreSQL only;
+    # keep a single shard on SQLite).
+    BILLING_SHARDS = int(os.environ.get('BILLING_SHARDS', 1))
+    BILLING_PARTITION_BY = os.environ.get('BILLING_PARTITION_BY', 'id')
+
+    # Serve dashboard commission totals from the revenue_rollups table instead of
+    # rescanning project_billing. Run `flask billing rebuild-rollups` before enabling
+    # (and once after the revenue_rollup_postings migration, to record the per-bill postings).
+    REVENUE_ROLLUPS_ENABLED = os.environ.get('REVENUE_ROLLUPS_ENABLED', 'false').lower() == 'true'
+
+    # Serve paid commission figures from the commission ledger balances, posted when
+    # invoices are paid. Run `flask billing backfill-ledger` before enabling.
+    COMMISSION_LEDGER_ENABLED = os.environ.get('COMMISSION_LEDGER_ENABLED', 'false').lower() == 'true'
+
+    # Per-process cache of resolved users (see app.utils.auth.resolve_principal). Other
+    # workers, and bulk deletes, are only seen once an entry expires, so a removed user
+    # keeps access for at most PRINCIPAL_CACHE_TTL seconds: keep it short.
+    PRINCIPAL_CACHE_TTL = int(os.environ.get('PRINCIPAL_CACHE_TTL', 5))  # seconds
+    PRINCIPAL_CACHE_SIZE = int(os.environ.get('PRINCIPAL_CACHE_SIZE', 10000))
+
+    # Dashboard / revenue response cache (see app.utils.response_cache): 'redis' shares
+    # responses and invalidations between all processes through RESPONSE_CACHE_URL
+    # ('memory://' for an in-process stand-in), 'lru' keeps them in the one process that
+    # serves and writes (single-process development only), 'none' disables caching.
+    # Entries are dropped on any write to bills, invoices or plans, and expire after the TTL.
+    RESPONSE_CACHE_BACKEND = os.environ.get('RESPONSE_CACHE_BACKEND', 'none')
+    RESPONSE_CACHE_URL = os.environ.get('RESPONSE_CACHE_URL', 'redis://localhost:6379/0')
+    RESPONSE_CACHE_TTL = int(os.environ.get('RESPONSE_CACHE_TTL', 30))  # seconds
+    RESPONSE_CACHE_SIZE = int(os.environ.get('RESPONSE_CACHE_SIZE', 2000))
+
+    # Stripe webhook inbox consumers (see app.services.stripe_events): events
+    # applied per transaction, polling interval and concurrent scheduled consumers.
+    STRIPE_EVENT_BATCH_SIZE = int(os.environ.get('STRIPE_EVENT_BATCH_SIZE', 100))
+    STRIPE_EVENT_POLL_SECONDS = int(os.environ.get('STRIPE_EVENT_POLL_SECONDS', 2))
+    STRIPE_EVENT_CONSUMERS = int(os.environ.get('STRIPE_EVENT_CONSUMERS', 2))
+
+    # Payment provider: 'stripe', or 'fake' for local development and load tests.
+    # The fake simulates call latency, API failures, declined payments and
+    # delivers webhooks to PAYMENT_FAKE_WEBHOOK_URL (or straight into the inbox).
+    PAYMENT_GATEWAY = os.environ.get('PAYMENT_GATEWAY', 'stripe')
+    PAYMENT_FAKE_LATENCY_MS = int(os.environ.get('PAYMENT_FAKE_LATENCY_MS', 200))
+    PAYMENT_FAKE_FAILURE_RATE = float(os.environ.get('PAYMENT_FAKE_FAILURE_RATE', 0))
+    PAYMENT_FAKE_DECLINE_RATE = float(os.environ.get('PAYMENT_FAKE_DECLINE_RATE', 0))
+    PAYMENT_FAKE_WEBHOOK_DELAY_MS = int(os.environ.get('PAYMENT_FAKE_WEBHOOK_DELAY_MS', 500))
+    PAYMENT_FAKE_WEBHOOK_URL = os.environ.get('PAYMENT_FAKE_WEBHOOK_URL')
+
+    # Outbound payment calls from request handlers: worker threads (also the size of
+    # the shared keep-alive connection pool), extra queued calls before new ones are
+    # rejected with 503, and the per-call timeout in seconds.
+    PAYMENT_EXECUTOR_WORKERS = int(os.environ.get('PAYMENT_EXECUTOR_WORKERS', 16))
+    PAYMENT_EXECUTOR_QUEUE = int(os.environ.get('PAYMENT_EXECUTOR_QUEUE', 64))
+    PAYMENT_CALL_TIMEOUT = int(os.environ.get('PAYMENT_CALL_TIMEOUT', 20))
+
+    # Batched settlement of Tier-1/admin shares (see app.services.settlements):
+    # minutes between settlement runs of the scheduler.
+    SETTLEMENT_INTERVAL_MINUTES = int(os.environ.get('SETTLEMENT_INTERVAL_MINUTES', 15))
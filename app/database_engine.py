@@ -0,0 +1,180 @@
+import os
+import time
+from contextlib import contextmanager
+from flask import current_app
+from sqlalchemy import event, text
+from sqlalchemy.engine import make_url
+from app import db
+
+# Roles a process or a unit of work runs as. Each role has its own statement
+# timeout (DB_STATEMENT_TIMEOUTS); the role of a process also names its
+# connections (application_name) in pg_stat_activity.
+DB_ROLES = ('web', 'job', 'export')
+
+# Dialects the services' upserts, lease clock and EXPLAIN checks are written for
+SUPPORTED_DIALECTS = ('postgresql', 'sqlite')
+
+
+def engine_options(config, role, url=None):
+    """SQLAlchemy create_engine() options for `url` (default: the primary database) in a `role` process."""
+    url = url or config.get('SQLALCHEMY_DATABASE_URI') or ''
+    options = {
+        'pool_pre_ping': config['DB_POOL_PRE_PING'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+    }
+    if url.startswith('sqlite'):
+        # Local development: no server-side pool sizing or timeouts to configure
+        return options
+
+    options.update(
+        pool_size=config['DB_POOL_SIZE'],
+        max_overflow=config['DB_MAX_OVERFLOW'],
+        pool_timeout=config['DB_POOL_TIMEOUT'],
+    )
+    if url.startswith('postgresql'):
+        options['connect_args'] = {
+            'application_name': f"billing-backend-{role}",
+            'options': f"-c statement_timeout={int(config['DB_STATEMENT_TIMEOUTS'].get(role, 0))}",
+        }
+    return options
+
+
+def check_dialect(url):
+    """Fails at startup, instead of on the first write, when `url` is not a supported database."""
+    dialect = make_url(url).get_backend_name()
+    if dialect not in SUPPORTED_DIALECTS:
+        raise RuntimeError(f"Unsupported database '{dialect}'; use one of {', '.join(SUPPORTED_DIALECTS)}")
+
+
+def check_sharding(dialect, shard_count):
+    """Sharded billing runs hash on PostgreSQL's hashtext(); other databases bill in one run."""
+    if shard_count > 1 and dialect != 'postgresql':
+        raise ValueError(f"Sharded billing needs PostgreSQL; use a single shard on '{dialect}'")
+
+
+def upsert_insert(dialect):
+    """The INSERT construct of `dialect` with ON CONFLICT support."""
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
+
+
+def configure_engines(app, role):
+    """
+    Sets the engine options of the primary database, and of the read replica
+    ('replica' bind) when DATABASE_REPLICA_URL is set, for a `role` process.
+    Call before db.init_app(app).
+    """
+    if app.config.get('SQLALCHEMY_DATABASE_URI'):
+        check_dialect(app.config['SQLALCHEMY_DATABASE_URI'])
+        try:
+            check_sharding(make_url(app.config['SQLALCHEMY_DATABASE_URI']).get_backend_name(),
+                           app.config.get('BILLING_SHARDS', 1))
+        except ValueError as e:
+            raise RuntimeError(f"BILLING_SHARDS: {e}") from None
+    app.config['DB_ROLE'] = role
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config, role)
+
+    replica_url = app.config.get('DATABASE_REPLICA_URL')
+    if replica_url:
+        check_dialect(replica_url)
+        binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+        binds['replica'] = {'url': replica_url, **engine_options(app.config, role, replica_url)}
+        app.config['SQLALCHEMY_BINDS'] = binds
+
+
+# ---------------- PER-UNIT-OF-WORK STATEMENT TIMEOUTS ----------------
+def _timeout_sql(role):
+    return f"SET LOCAL statement_timeout = {int(current_app.config['DB_STATEMENT_TIMEOUTS'].get(role, 0))}"
+
+
+def _after_begin(session, transaction, connection):
+    role = session.info.get('db_role')
+    if role and role != current_app.config.get('DB_ROLE') and connection.dialect.name == 'postgresql':
+        connection.exec_driver_sql(_timeout_sql(role))
+
+
+@contextmanager
+def statement_role(role):
+    """Transactions begun by db.session inside the block use the statement timeout of `role`."""
+    previous = db.session.info.get('db_role')
+    db.session.info['db_role'] = role
+    try:
+        yield
+    finally:
+        if previous is None:
+            db.session.info.pop('db_role', None)
+        else:
+            db.session.info['db_role'] = previous
+
+
+def set_statement_timeout(role, session=None, clause=None):
+    """
+    Switches the current transaction of `session` (default db.session) to the
+    timeout of `role`, on the connection `clause` will be routed to.
+    """
+    session = session or db.session
+    connection = session.connection(bind_arguments={'clause': clause} if clause is not None else None)
+    if connection.dialect.name == 'postgresql':
+        connection.exec_driver_sql(_timeout_sql(role))
+
+
+_listeners_registered = False
+
+
+def register_engine_listeners():
+    global _listeners_registered
+    if _listeners_registered:
+        return
+    event.listen(db.session, 'after_begin', _after_begin)
+    _listeners_registered = True
+
+
+def dispose_engines(app, close=False):
+    """
+    Empties the connection pools of every engine. Right after fork, call with
+    close=False: the inherited connections still belong to the parent and are
+    only dropped, so the worker opens its own.
+    """
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=close)
+
+
+# ---------------- POOL HEALTH ----------------
+def _pool_stats(pool):
+    stats = {'class': type(pool).__name__}
+    for name in ('size', 'checkedin', 'checkedout', 'overflow'):
+        method = getattr(pool, name, None)
+        if callable(method):
+            stats[name] = method()
+    return stats
+
+
+def pool_health():
+    """
+    Checks out one connection of every engine of this worker and runs
+    SELECT 1 on it (pre-ping replaces a dead connection first). Returns
+    (healthy, report) with the latency and pool occupancy of each engine.
+    """
+    engines = {'primary': db.engine}
+    engines.update({name: engine for name, engine in db.engines.items() if name is not None})
+
+    healthy = True
+    report = {'pid': os.getpid(), 'role': current_app.config.get('DB_ROLE'), 'engines': {}}
+    for name, engine in engines.items():
+        entry = {'dialect': engine.dialect.name}
+        started = time.monotonic()
+        try:
+            with engine.connect() as conn:
+                conn.execute(text('SELECT 1'))
+            entry['status'] = 'ok'
+        except Exception as e:
+            healthy = False
+            entry.update(status='error', error=str(e))
+        entry['latency_ms'] = round((time.monotonic() - started) * 1000, 2)
+        entry['pool'] = _pool_stats(engine.pool)
+        report['engines'][name] = entry
+    return healthy, report
@@ -0,0 +1,129 @@
+from contextlib import contextmanager
+from functools import wraps
+from flask import current_app, g, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+
+# ------------------ READ-REPLICA ROUTING ------------------
+# Read-only endpoints and exports run their SELECTs on the 'replica' bind
+# (DATABASE_REPLICA_URL). Everything else stays on the primary:
+# - flushes, INSERT/UPDATE/DELETE, SELECT ... FOR UPDATE / FOR SHARE, raw text()
+#   and session.connection() without a statement;
+# - every statement of a session once it has written (read-your-writes within a request);
+# - requests of a client that wrote less than REPLICA_PRIMARY_PIN_SECONDS ago
+#   (read-your-writes across requests, through the READ_PRIMARY_COOKIE cookie
+#   or an explicit X-Read-Primary: 1 header).
+READ_PRIMARY_COOKIE = 'read_primary'
+READ_PRIMARY_HEADER = 'X-Read-Primary'
+
+
+def _is_read(clause):
+    """True only for a SELECT without FOR UPDATE / FOR SHARE; anything unknown goes to the primary."""
+    if clause is None:
+        return False
+    return getattr(clause, 'is_select', False) and getattr(clause, '_for_update_arg', None) is None
+
+
+class RoutingSession(Session):
+    """db.session class sending the reads of replica-routed work to the 'replica' bind."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (
+            bind is None
+            and self.info.get('db_target') == 'replica'
+            and not self.info.get('db_wrote')
+            and not self._flushing
+            and 'replica' in self._db.engines
+            and _is_read(clause)
+        ):
+            if has_request_context():
+                g.db_read_replica = True
+            return self._db.engines['replica']
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def primary_pinned():
+    """True when the current request must read its own recent writes from the primary."""
+    if not has_request_context():
+        return False
+    return request.headers.get(READ_PRIMARY_HEADER) == '1' or READ_PRIMARY_COOKIE in request.cookies
+
+
+@contextmanager
+def use_replica():
+    """Reads of db.session inside the block go to the replica (when configured and not pinned)."""
+    from app import db
+    if primary_pinned():
+        yield
+        return
+    previous = db.session.info.get('db_target')
+    db.session.info['db_target'] = 'replica'
+    try:
+        yield
+    finally:
+        if previous is None:
+            db.session.info.pop('db_target', None)
+        else:
+            db.session.info['db_target'] = previous
+
+
+@contextmanager
+def use_primary():
+    """Reads of db.session inside the block go to the primary, even within use_replica()."""
+    from app import db
+    previous = db.session.info.pop('db_target', None)
+    try:
+        yield
+    finally:
+        if previous is not None:
+            db.session.info['db_target'] = previous
+
+
+def replica_reads(view):
+    """Routes the reads of a read-only view to the replica. Apply closest to the view function."""
+    @wraps(view)
+    def decorated(*args, **kwargs):
+        with use_replica():
+            return view(*args, **kwargs)
+    return decorated
+
+
+# ------------------ WRITE TRACKING ------------------
+def _mark_wrote(session):
+    session.info['db_wrote'] = True
+
+
+def _after_flush(session, flush_context):
+    _mark_wrote(session)
+
+
+def _do_orm_execute(orm_execute_state):
+    if not orm_execute_state.is_select:
+        _mark_wrote(orm_execute_state.session)
+
+
+def _after_commit(session):
+    if session.info.get('db_wrote') and has_request_context():
+        g.db_wrote = True
+
+
+def _set_primary_pin(response):
+    pin_seconds = current_app.config['REPLICA_PRIMARY_PIN_SECONDS']
+    if g.get('db_wrote') and pin_seconds and 'replica' in current_app.config.get('SQLALCHEMY_BINDS', {}):
+        response.set_cookie(READ_PRIMARY_COOKIE, '1', max_age=pin_seconds, httponly=True, samesite='Lax')
+    return response
+
+
+_listeners_registered = False
+
+
+def register_replica_routing(app):
+    """Tracks writes on db.session and pins clients that just wrote to the primary."""
+    global _listeners_registered
+    from app import db
+    if not _listeners_registered:
+        event.listen(db.session, 'after_flush', _after_flush)
+        event.listen(db.session, 'do_orm_execute', _do_orm_execute)
+        event.listen(db.session, 'after_commit', _after_commit)
+        _listeners_registered = True
+    app.after_request(_set_primary_pin)
@@ -116,7 +116,7 @@ def initialize_database():
         
         if missing_tables_count > 0:
             print(f"📋 Found {missing_tables_count} missing tables. Recreating all tables to ensure schema is up to date.")
-            db.create_all()
+            db.create_all(bind_key=None)  # never the read replica
         else:
             print("✅ All model tables exist in the database.")
 
@@ -163,6 +163,57 @@ def create_sample_data_minimal():
         db.session.rollback()
         return False
 
+def hot_path_queries():
+    """
+    The statements the dashboards (plain, rollup and ledger reads) and the
+    billing job actually run, built for placeholder ids, as {name: statement}.
+    """
+    from datetime import date
+    from app.services import dashboards, ledger, rollups
+    from app.tasks import due_chunk_query
+
+    seller_id = '00000000-0000-0000-0000-000000000000'
+    today = date.today()
+    return {
+        'admin dashboard revenue': dashboards.admin_monthly_revenue(today),
+        'tier1 dashboard tier2 sellers': dashboards.tier2_seller_count(seller_id),
+        'tier1 dashboard projects': dashboards.tier1_project_count(seller_id),
+        'tier1 dashboard totals': dashboards.tier1_totals(seller_id),
+        'tier2 dashboard projects': dashboards.tier2_project_count(seller_id),
+        'tier2 dashboard totals': dashboards.tier2_totals(seller_id),
+        'admin dashboard revenue (rollups)': rollups.admin_monthly_revenue_stmt(today),
+        'tier1 dashboard totals (rollups)': rollups.tier1_dashboard_stmt(seller_id),
+        'tier2 dashboard totals (rollups)': rollups.tier2_dashboard_stmt(seller_id),
+        'admin dashboard revenue (ledger)': ledger.account_totals_stmt('admin', '', today),
+        'tier1 dashboard paid (ledger)': ledger.account_totals_stmt('tier1_seller', seller_id),
+        'due projects (billing job)': due_chunk_query(today, '', 500).statement,
+    }
+
+
+def explain_hot_path_queries():
+    """
+    Runs EXPLAIN on every hot-path query and returns {name: (uses_index, plan)}.
+    On PostgreSQL sequential scans are disabled for the check, so tiny tables
+    still show whether a usable index exists.
+    """
+    dialect = db.engine.dialect
+    results = {}
+
+    for name, stmt in hot_path_queries().items():
+        sql = str(stmt.compile(dialect=dialect, compile_kwargs={'literal_binds': True}))
+        with db.engine.connect() as conn:
+            if dialect.name == 'postgresql':
+                conn.execute(text('SET enable_seqscan = off'))
+                plan = '\n'.join(row[0] for row in conn.exec_driver_sql(f'EXPLAIN {sql}'))
+                uses_index = 'Seq Scan' not in plan
+            else:
+                plan = '\n'.join(row[-1] for row in conn.exec_driver_sql(f'EXPLAIN QUERY PLAN {sql}'))
+                uses_index = all('USING' in line for line in plan.splitlines() if line.startswith(('SCAN', 'SEARCH')))
+            conn.rollback()
+        results[name] = (uses_index, plan)
+
+    return results
+
 # Flask CLI commands registration
 def register_db_commands(app):
     """Register database commands with Flask CLI"""
@@ -172,6 +223,18 @@ def register_db_commands(app):
         """Initializes the database with tables and sample data."""
         initialize_database()
 
+    @app.cli.command('explain_queries')
+    def explain_queries_command():
+        """EXPLAINs the hot-path queries and fails if any of them needs a full table scan."""
+        failures = 0
+        for name, (uses_index, plan) in explain_hot_path_queries().items():
+            print(f"{'✅' if uses_index else '❌'} {name}")
+            if not uses_index:
+                failures += 1
+                print('    ' + plan.replace('\n', '\n    '))
+        if failures:
+            sys.exit(1)
+
     @app.cli.command('reset_db')
     def reset_db_command():
         """Drops all tables and re-initializes the database."""
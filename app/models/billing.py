@@ -28,6 +28,10 @@ class ProjectBilling(db.Model):
     invoice = db.relationship('Invoice', back_populates='billing_record', uselist=False)
     # commission = db.relationship('Commission', backref='billing_records')
 
+    __table_args__ = (
+        db.Index('ix_project_billing_project_id_status', 'project_id', 'status'),
+    )
+
 
 
 # -------------------- INVOICE --------------------
@@ -56,4 +60,122 @@ class Invoice(db.Model):
     billing_record = db.relationship('ProjectBilling', back_populates='invoice')
     project = db.relationship('Project')
 
+    __table_args__ = (
+        db.Index('ix_invoices_paid_date_status', 'paid_date', 'status'),
+    )
+
+
+
+
+# -------------------- BILLING RUN --------------------
+class BillingRun(db.Model):
+    """Checkpoint of one shard of a monthly billing run, committed after every chunk."""
+    __tablename__ = 'billing_runs'
+
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    run_date = db.Column(db.Date, nullable=False)
+    shard = db.Column(db.Integer, default=0, nullable=False)
+    shard_count = db.Column(db.Integer, default=1, nullable=False)
+    partition_by = db.Column(db.String(20), default='id', nullable=False)
+
+    status = db.Column(db.String(20), default='running', nullable=False)  # 'running', 'completed', 'failed'
+    last_project_id = db.Column(db.String(36), default='', nullable=False)
+    projects_billed = db.Column(db.Integer, default=0, nullable=False)
+    chunks = db.Column(db.Integer, default=0, nullable=False)
+    error = db.Column(db.Text)
+
+    started_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('run_date', 'shard', 'shard_count', 'partition_by', name='uq_billing_runs_shard'),
+    )
+
+
+# -------------------- INVOICE SEQUENCE --------------------
+class InvoiceSequence(db.Model):
+    """Next free invoice number per billing period (e.g. '202610')."""
+    __tablename__ = 'invoice_sequences'
+
+    period = db.Column(db.String(20), primary_key=True)
+    next_value = db.Column(db.BigInteger, default=1, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+# -------------------- REVENUE ROLLUP --------------------
+class RevenueRollup(db.Model):
+    """
+    Running totals of bills per seller pair, plan, month and bill status.
+    Missing seller / plan ids are stored as '' so the key never contains NULLs.
+    Paid bills are counted in the month they were paid, all others in the
+    month they were created.
+    """
+    __tablename__ = 'revenue_rollups'
+
+    tier1_seller_id = db.Column(db.String(36), primary_key=True, default='')
+    tier2_seller_id = db.Column(db.String(36), primary_key=True, default='')
+    plan_id = db.Column(db.String(36), primary_key=True, default='')
+    month = db.Column(db.Date, primary_key=True)  # first day of the month
+    status = db.Column(db.String(20), primary_key=True)
+
+    bill_count = db.Column(db.Integer, default=0, nullable=False)
+    amount = db.Column(db.Numeric(14, 2), default=0, nullable=False)
+    admin_commission = db.Column(db.Numeric(14, 4), default=0, nullable=False)
+    tier1_commission = db.Column(db.Numeric(14, 4), default=0, nullable=False)
+
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_revenue_rollups_tier2_seller_id', 'tier2_seller_id'),
+        db.Index('ix_revenue_rollups_month_status', 'month', 'status'),
+    )
+
+
+class RevenueRollupPosting(db.Model):
+    """
+    What one bill currently contributes to revenue_rollups: its rollup key and
+    amounts as they were posted. A status change, deletion or paid-date
+    correction subtracts exactly this row, so later plan, price or seller
+    edits cannot leave residue in the rollups.
+    """
+    __tablename__ = 'revenue_rollup_postings'
+
+    bill_id = db.Column(db.String(36), primary_key=True)
+    tier1_seller_id = db.Column(db.String(36), nullable=False, default='')
+    tier2_seller_id = db.Column(db.String(36), nullable=False, default='')
+    plan_id = db.Column(db.String(36), nullable=False, default='')
+    month = db.Column(db.Date, nullable=False)
+    status = db.Column(db.String(20), nullable=False)
+
+    amount = db.Column(db.Numeric(14, 2), default=0, nullable=False)
+    admin_commission = db.Column(db.Numeric(14, 4), default=0, nullable=False)
+    tier1_commission = db.Column(db.Numeric(14, 4), default=0, nullable=False)
+
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+# -------------------- STRIPE EVENT INBOX --------------------
+class StripeEvent(db.Model):
+    """
+    Raw Stripe webhook event, keyed by the Stripe event id so redeliveries are
+    stored once. Background consumers apply 'received' events and mark them
+    'processed' in the same transaction.
+    """
+    __tablename__ = 'stripe_events'
+
+    id = db.Column(db.String(255), primary_key=True)  # Stripe event id (evt_...)
+    type = db.Column(db.String(100), nullable=False)
+    payload = db.Column(JSONB, nullable=False)
+
+    status = db.Column(db.String(20), default='received', nullable=False)  # 'received', 'processed', 'failed'
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    error = db.Column(db.Text)
+
+    received_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    processed_at = db.Column(db.DateTime)
 
+    __table_args__ = (
+        db.Index('ix_stripe_events_status_next_attempt_at', 'status', 'next_attempt_at'),
+    )
@@ -0,0 +1,48 @@
+from app import db
+from datetime import datetime
+import uuid
+
+
+# -------------------- COMMISSION LEDGER --------------------
+class CommissionLedgerEntry(db.Model):
+    """
+    One leg of a double-entry commission posting, written when an invoice is
+    paid. The legs of an invoice sum to zero: the payer's account is debited
+    (negative amount) and the receivers' accounts are credited. Rows are never
+    updated or deleted; corrections are posted as new legs.
+    """
+    __tablename__ = 'commission_ledger_entries'
+
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    invoice_id = db.Column(db.String(36), db.ForeignKey('invoices.id'), nullable=False)
+    leg = db.Column(db.Integer, nullable=False)  # position within the invoice's posting
+
+    account_type = db.Column(db.String(20), nullable=False)  # 'admin', 'tier1_seller', 'tier2_seller'
+    account_id = db.Column(db.String(36), default='', nullable=False)  # '' for the admin
+    entry_type = db.Column(db.String(30), nullable=False)  # 'admin_commission', 'tier1_commission', 'admin_share'
+    amount = db.Column(db.BigInteger, nullable=False)  # signed, in cents
+    currency = db.Column(db.String(3), nullable=False)
+    month = db.Column(db.Date, nullable=False)  # first day of the month the invoice was paid
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('invoice_id', 'leg', name='uq_commission_ledger_entries_invoice_leg'),
+        db.Index('ix_commission_ledger_entries_account', 'account_type', 'account_id'),
+    )
+
+
+class CommissionBalance(db.Model):
+    """Running credit and debit totals of one ledger account per month, kept in step with the entries."""
+    __tablename__ = 'commission_balances'
+
+    account_type = db.Column(db.String(20), primary_key=True)
+    account_id = db.Column(db.String(36), primary_key=True, default='')
+    currency = db.Column(db.String(3), primary_key=True)
+    month = db.Column(db.Date, primary_key=True)
+
+    credits = db.Column(db.BigInteger, default=0, nullable=False)  # in cents
+    debits = db.Column(db.BigInteger, default=0, nullable=False)  # in cents, positive
+    entry_count = db.Column(db.Integer, default=0, nullable=False)
+
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
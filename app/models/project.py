@@ -174,6 +174,17 @@ class Project(db.Model):
     subscription_plan = db.relationship('SubscriptionPlan', backref='projects')
     # The 'billing_records' backref is already set up correctly by ProjectBilling model.
 
+    # --- INDEXES (hot dashboard, listing and billing-job predicates) ---
+    __table_args__ = (
+        db.Index('ix_projects_tier1_seller_id_tier2_seller_id', 'tier1_seller_id', 'tier2_seller_id'),
+        db.Index('ix_projects_tier2_seller_id', 'tier2_seller_id'),
+        db.Index('ix_projects_status_next_billing_date', 'status', 'next_billing_date'),
+        # Only active projects are ever due: keeps the billing job's index small
+        db.Index('ix_projects_active_next_billing_date', 'next_billing_date', 'id',
+                 postgresql_where=db.text("status = 'active'"),
+                 sqlite_where=db.text("status = 'active'")),
+    )
+
 class Client(db.Model):
     __tablename__ = 'clients'
     
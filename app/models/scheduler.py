@@ -0,0 +1,17 @@
+from app import db
+
+
+# -------------------- SCHEDULER LEASE --------------------
+class SchedulerLease(db.Model):
+    """
+    Cluster-wide lease on a named role, such as running the scheduled jobs.
+    The holder renews it before expires_at; once it has expired, any other
+    process may take it over.
+    """
+    __tablename__ = 'scheduler_leases'
+
+    name = db.Column(db.String(50), primary_key=True)
+    holder = db.Column(db.String(255), nullable=False)  # '<hostname>:<pid>'
+    acquired_at = db.Column(db.DateTime, nullable=False)
+    renewed_at = db.Column(db.DateTime, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
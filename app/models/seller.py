@@ -30,7 +30,7 @@ class Tier2Seller(db.Model):
     __tablename__ = 'tier2_sellers'
     
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
-    tier1_seller_id = db.Column(db.String(36), db.ForeignKey('tier1_sellers.id'), nullable=False)
+    tier1_seller_id = db.Column(db.String(36), db.ForeignKey('tier1_sellers.id'), nullable=False, index=True)
     name = db.Column(db.String(255), nullable=False)
     subdomain = db.Column(db.String(100), unique=True, nullable=True)
     admin_email = db.Column(db.String(255), nullable=False)
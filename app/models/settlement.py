@@ -0,0 +1,67 @@
+from app import db
+from datetime import datetime
+import uuid
+
+
+# -------------------- SETTLEMENT ENTRY --------------------
+class SettlementEntry(db.Model):
+    """
+    One amount owed to a party (a Tier-1 seller or the admin) out of a paid
+    invoice, taken from Invoice.transfer_data. Entries are queued at payment
+    time and later rolled into one SettlementPayout per party and period.
+    """
+    __tablename__ = 'settlement_entries'
+
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    invoice_id = db.Column(db.String(36), db.ForeignKey('invoices.id'), nullable=False)
+    party_type = db.Column(db.String(20), nullable=False)  # 'tier1_seller', 'admin'
+    party_id = db.Column(db.String(36), default='', nullable=False)  # '' for the admin
+
+    amount = db.Column(db.BigInteger, nullable=False)  # in cents
+    currency = db.Column(db.String(3), nullable=False)
+    period = db.Column(db.String(20), nullable=False)  # settlement period, e.g. '2026-10-18'
+    source_transaction = db.Column(db.String(255))  # charge the amount was collected in
+
+    status = db.Column(db.String(20), default='queued', nullable=False)  # 'queued', 'batched'
+    payout_id = db.Column(db.String(36), db.ForeignKey('settlement_payouts.id'), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('invoice_id', 'party_type', name='uq_settlement_entries_invoice_party'),
+        db.Index('ix_settlement_entries_status_period', 'status', 'period'),
+        db.Index('ix_settlement_entries_payout_id', 'payout_id'),
+    )
+
+
+# -------------------- SETTLEMENT PAYOUT --------------------
+class SettlementPayout(db.Model):
+    """
+    One transfer to a party covering all of its entries of a period. Sent in
+    batches by the settlement job and retried with exponential backoff.
+    """
+    __tablename__ = 'settlement_payouts'
+
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    party_type = db.Column(db.String(20), nullable=False)
+    party_id = db.Column(db.String(36), default='', nullable=False)
+    currency = db.Column(db.String(3), nullable=False)
+    period = db.Column(db.String(20), nullable=False)
+
+    amount = db.Column(db.BigInteger, nullable=False)  # in cents
+    entry_count = db.Column(db.Integer, nullable=False)
+
+    status = db.Column(db.String(20), default='pending', nullable=False)  # 'pending', 'sending', 'paid', 'failed'
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    last_error = db.Column(db.Text)
+    destination_account = db.Column(db.String(255))
+    transfer_id = db.Column(db.String(255))
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    paid_at = db.Column(db.DateTime)
+
+    entries = db.relationship('SettlementEntry', backref='payout', foreign_keys=[SettlementEntry.payout_id])
+
+    __table_args__ = (
+        db.Index('ix_settlement_payouts_status_next_attempt_at', 'status', 'next_attempt_at'),
+    )
@@ -1,23 +1,23 @@
-from flask import Blueprint, jsonify
+from flask import Blueprint, jsonify, current_app
 from app import db
 from app.models import Tier1Seller, Tier2Seller, Admin, Project
-from app.models.billing import Invoice
 from app.utils.auth import admin_required,jwt_required_custom
+from app.utils.response_cache import cached_response
+from app.database_routing import replica_reads
+from app.services import dashboards, ledger, rollups
 from datetime import date
-from sqlalchemy import or_
 admin_bp = Blueprint('admin', __name__)
 # Make sure to import these models at the top of your admin routes file
-from app.models.billing import ProjectBilling, Invoice
-from app.models.project import SubscriptionPlan
 from app.models.seller import Tier1Seller, Tier2Seller
 from app.models import Project
-from decimal import Decimal
 from datetime import date
 from app import db
 from app.utils.auth import admin_required # Assuming you have this decorator
 
 @admin_bp.route('/dashboard', methods=['GET'])
 @admin_required
+@cached_response
+@replica_reads
 def get_admin_dashboard():
     """Provides a complete, commission-based overview of the system for the admin."""
     try:
@@ -27,39 +27,14 @@ def get_admin_dashboard():
         total_projects = Project.query.count()
     
         # --- 2. NEW: Commission-based Monthly Revenue Calculation ---
-        monthly_revenue = Decimal('0.0')
         today = date.today()
 
-        # Find all bills that were paid in the current month
-        paid_bills_this_month = db.session.query(ProjectBilling).join(
-            Invoice, ProjectBilling.id == Invoice.billing_record_id
-        ).filter(
-            db.extract('year', Invoice.paid_date) == today.year,
-            db.extract('month', Invoice.paid_date) == today.month,
-            Invoice.status == 'paid'
-        ).all()
-
-        for bill in paid_bills_this_month:
-            plan = bill.project.subscription_plan
-            
-            if plan and plan.admin_commission_pct is not None:
-                base_price = Decimal(plan.price)
-                admin_pct = Decimal(plan.admin_commission_pct)
-
-                # Case A: Commission from a Tier-1 seller's direct project
-                if bill.project.tier1_seller_id and not bill.project.tier2_seller_id:
-                    admin_commission = base_price * (admin_pct / 100)
-                    monthly_revenue += admin_commission
-                
-                # Case B: Admin's share of commission from a Tier-2 seller's project
-                elif bill.project.tier2_seller_id and plan.tier1_commission_pct is not None:
-                    tier1_pct = Decimal(plan.tier1_commission_pct)
-                    
-                    # First, find the commission the Tier-1 seller earned
-                    tier1_commission_earned = base_price * (tier1_pct / 100)
-                    # Then, find the admin's share of that commission
-                    admin_share = tier1_commission_earned * (admin_pct / 100)
-                    monthly_revenue += admin_share
+        if current_app.config['COMMISSION_LEDGER_ENABLED']:
+            monthly_revenue, _ = ledger.account_totals('admin', '', today)
+        elif current_app.config['REVENUE_ROLLUPS_ENABLED']:
+            monthly_revenue = rollups.admin_monthly_revenue(today)
+        else:
+            monthly_revenue = db.session.execute(dashboards.admin_monthly_revenue(today)).scalar()
 
         return jsonify({
             'stats': {
@@ -75,92 +50,35 @@ def get_admin_dashboard():
 
 
 # Make sure to import these models at the top of your admin routes file
-from app.models.billing import ProjectBilling, Invoice
-from app.models.project import SubscriptionPlan
 from app.models.seller import Tier2Seller
 from app.models import Project # Ensure Project is imported
-from decimal import Decimal
 from datetime import date
 from app import db # Ensure db is imported
 
 @admin_bp.route('/dashboard/tier1/<tier1_id>', methods=['GET'])
 @jwt_required_custom
+@cached_response
+@replica_reads
 def get_tier1_dashboard(tier1_id):
     """
     Provides a dashboard overview for a specific Tier-1 seller based on commission logic.
     """
     try:
         # --- 1. Total Tier 2 sellers and Total Projects (No changes needed) ---
-        total_tier2 = Tier2Seller.query.filter_by(tier1_seller_id=tier1_id).count()
-        total_projects = Project.query.filter_by(
-            tier1_seller_id=tier1_id, 
-            tier2_seller_id=None
-        ).count()
-
-        # --- 2. Calculate Total Revenue (Commission received from PAID Tier 2 seller bills) ---
-        tier2_seller_ids = [
-            seller.id for seller in Tier2Seller.query.filter_by(tier1_seller_id=tier1_id).all()
-        ]
-        
-        total_revenue_from_tier2 = Decimal('0.0')
-        tier2_bills = []
-        if tier2_seller_ids:
-            tier2_bills = db.session.query(ProjectBilling).join(
-                Project, ProjectBilling.project_id == Project.id
-            ).filter(
-                Project.tier2_seller_id.in_(tier2_seller_ids)
-            ).all()
-
-            for bill in tier2_bills:
-                if bill.status == 'paid':
-                    plan = bill.project.subscription_plan
-                    if plan and plan.tier1_commission_pct is not None:
-                        base_price = Decimal(plan.price)
-                        commission_pct = Decimal(plan.tier1_commission_pct)
-                        total_revenue_from_tier2 += base_price * (commission_pct / 100)
-
-        # --- 3. Calculate Paid and Pending Commission (Owed to Admin) ---
-        total_paid_to_admin = Decimal('0.0')
-        pending_amount_to_admin = Decimal('0.0')
-
-        # Part A: Commission from the Tier 1 seller's own projects
-        tier1_own_bills = db.session.query(ProjectBilling).join(
-            Project, ProjectBilling.project_id == Project.id
-        ).filter(
-            Project.tier1_seller_id == tier1_id,
-            Project.tier2_seller_id == None
-        ).all()
-
-        for bill in tier1_own_bills:
-            plan = bill.project.subscription_plan
-            if plan and plan.admin_commission_pct is not None:
-                base_price = Decimal(plan.price)
-                commission_pct = Decimal(plan.admin_commission_pct)
-                commission_amount = base_price * (commission_pct / 100)
-
-                if bill.status == 'paid':
-                    total_paid_to_admin += commission_amount
-                elif bill.status in ['pending', 'invoiced']:
-                    pending_amount_to_admin += commission_amount
-
-        # --- NEW LOGIC ---
-        # Part B: Admin's share of the commission from Tier 2 seller projects
-        for bill in tier2_bills:
-            plan = bill.project.subscription_plan
-            if plan and plan.tier1_commission_pct is not None and plan.admin_commission_pct is not None:
-                base_price = Decimal(plan.price)
-                tier1_pct = Decimal(plan.tier1_commission_pct)
-                admin_pct = Decimal(plan.admin_commission_pct)
-
-                # First, find the commission the Tier 1 earned
-                tier1_commission_earned = base_price * (tier1_pct / 100)
-                # Then, find the admin's share of that commission
-                admin_share = tier1_commission_earned * (admin_pct / 100)
-
-                if bill.status == 'paid':
-                    total_paid_to_admin += admin_share
-                elif bill.status in ['pending', 'invoiced']:
-                    pending_amount_to_admin += admin_share
+        total_tier2 = db.session.execute(dashboards.tier2_seller_count(tier1_id)).scalar()
+        total_projects = db.session.execute(dashboards.tier1_project_count(tier1_id)).scalar()
+
+        if current_app.config['REVENUE_ROLLUPS_ENABLED']:
+            total_revenue_from_tier2, total_paid_to_admin, pending_amount_to_admin = \
+                rollups.tier1_dashboard_totals(tier1_id)
+        else:
+            # --- 2./3. Tier-2 revenue and commission paid / pending to the admin, in one pass ---
+            total_revenue_from_tier2, total_paid_to_admin, pending_amount_to_admin = \
+                db.session.execute(dashboards.tier1_totals(tier1_id)).one()
+
+        if current_app.config['COMMISSION_LEDGER_ENABLED']:
+            # Paid figures as posted when the invoices were paid, unaffected by later plan edits
+            total_revenue_from_tier2, total_paid_to_admin = ledger.account_totals('tier1_seller', tier1_id)
 
 
         return jsonify({
@@ -177,46 +95,28 @@ def get_tier1_dashboard(tier1_id):
     except Exception as e:
         return jsonify({'message': f'Error fetching Tier1 dashboard: {str(e)}'}), 500
 
-# You will need to import these models at the top of your routes file
-from app.models.billing import ProjectBilling
-from app.models.project import SubscriptionPlan
-from decimal import Decimal
 
 @admin_bp.route('/dashboard/tier2/<tier2_id>', methods=['GET'])
 @jwt_required_custom
+@cached_response
+@replica_reads
 def get_tier2_dashboard(tier2_id):
     """
     Provides a dashboard overview for a specific Tier-2 seller, 
     calculating paid and pending commissions owed to their Tier-1 parent.
     """
     try:
-        # 1. Get all billing records for the Tier-2 seller's projects
-        bills = db.session.query(ProjectBilling).join(
-            Project, ProjectBilling.project_id == Project.id
-        ).filter(Project.tier2_seller_id == tier2_id).all()
-
-        total_projects = Project.query.filter_by(tier2_seller_id=tier2_id).count()
-        paid_commission = Decimal('0.0')
-        pending_commission = Decimal('0.0')
-
-        # 2. Iterate through each bill to calculate commission
-        for bill in bills:
-            plan = bill.project.subscription_plan
-            
-            # Proceed only if the project has a plan with T1 commission
-            if plan and plan.tier1_commission_pct is not None:
-                base_price = Decimal(plan.price)
-                commission_pct = Decimal(plan.tier1_commission_pct)
-                
-                # Calculate the commission amount from the plan's base price
-                commission_amount = base_price * (commission_pct / 100)
-
-                # 3. Add the commission to the correct bucket based on status
-                if bill.status == 'paid':
-                    paid_commission += commission_amount
-                elif bill.status in ['pending', 'invoiced']:
-                    pending_commission += commission_amount
-        
+        total_projects = db.session.execute(dashboards.tier2_project_count(tier2_id)).scalar()
+
+        if current_app.config['REVENUE_ROLLUPS_ENABLED']:
+            paid_commission, pending_commission = rollups.tier2_dashboard_totals(tier2_id)
+        else:
+            # Paid and pending Tier-1 commission on the seller's bills in one aggregation
+            paid_commission, pending_commission = db.session.execute(dashboards.tier2_totals(tier2_id)).one()
+
+        if current_app.config['COMMISSION_LEDGER_ENABLED']:
+            _, paid_commission = ledger.account_totals('tier2_seller', tier2_id)
+
         return jsonify({
             'stats': {
                 'tier2_seller_id': tier2_id,
@@ -230,4 +130,32 @@ def get_tier2_dashboard(tier2_id):
         # It's helpful to log the error for debugging
         # import logging
         # logging.error(f"Error fetching Tier-2 dashboard: {str(e)}")
-        return jsonify({'message': f'Error fetching Tier-2 dashboard: {str(e)}'}), 500
\ No newline at end of file
+        return jsonify({'message': f'Error fetching Tier-2 dashboard: {str(e)}'}), 500
+
+# ---------------- SETTLEMENT STATUS ----------------
+from app.services.settlements import settlement_summary
+
+@admin_bp.route('/settlements', methods=['GET'])
+@admin_required
+def get_settlements():
+    """Queued settlement entries and payouts by status (amounts in cents)."""
+    try:
+        return jsonify(settlement_summary()), 200
+    except Exception as e:
+        return jsonify({'message': f'Error fetching settlements: {str(e)}'}), 500
+
+
+# ---------------- SCHEDULER LEASE ----------------
+from app.scheduling import current_lease, is_leader, lease_holder_id
+
+@admin_bp.route('/scheduler', methods=['GET'])
+@admin_required
+def get_scheduler_lease():
+    """Which process holds the scheduler lease, and whether this one is it."""
+    try:
+        return jsonify({
+            'lease': current_lease(),
+            'this_process': {'holder': lease_holder_id(), 'leader': is_leader()}
+        }), 200
+    except Exception as e:
+        return jsonify({'message': f'Error fetching scheduler lease: {str(e)}'}), 500
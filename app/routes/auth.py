@@ -5,6 +5,7 @@ from flask_jwt_extended import (
 )
 from app import db, bcrypt
 from app.models import Tier1Seller, Tier2Seller, Admin
+from app.database_routing import replica_reads
 from datetime import timedelta
 
 auth_bp = Blueprint('auth', __name__)
@@ -202,6 +203,7 @@ def logout():
 # ------------------ GET ALL USERS ------------------
 @auth_bp.route('/users', methods=['GET'])
 @jwt_required()
+@replica_reads
 def get_all_users():
     claims = get_jwt()
 
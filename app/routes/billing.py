@@ -3,14 +3,22 @@
 from flask import Blueprint, request, jsonify, current_app
 from app import db
 from app.utils.auth import jwt_required_custom
+from app.database_routing import replica_reads, use_replica
 from app.models import Project
 from app.models.project import Client
 from app.models.billing import ProjectBilling, Invoice
 from app.models.seller import Tier1Seller, Tier2Seller
+from app.services.invoice_numbers import next_invoice_number
+from app.services.stripe_events import record_event
+from app.services import ledger
+from app.services.ledger import record_invoice_payment
+from app.services.payment_gateway import (
+    get_gateway, get_executor, intent_idempotency_key,
+    GatewayBusyError, WebhookSignatureError, CANCELABLE_INTENT_STATUSES, REUSABLE_INTENT_STATUSES
+)
 from datetime import date, timedelta
-import uuid
 from decimal import Decimal
-import stripe # <-- ADD IMPORT
+import json
 
 billing_bp = Blueprint('billing', __name__)
 # app/routes/billing.py
@@ -71,7 +79,7 @@ def generate_invoice_from_bill():
         new_invoice = Invoice(
             billing_record_id=bill.id,
             project_id=bill.project_id,
-            invoice_number=f"INV-{uuid.uuid4().hex[:6].upper()}",
+            invoice_number=next_invoice_number(),
             total_amount=bill.amount,
             issue_date=date.today(),
             due_date=bill.due_date or (date.today() + timedelta(days=30)),
@@ -90,6 +98,231 @@ def generate_invoice_from_bill():
         db.session.rollback()
         return jsonify({'message': f'Error: {str(e)}'}), 500
 
+# ---------------- BATCH BILL / INVOICE CREATION ----------------
+from app.models.project import SubscriptionPlan
+from app.services import rollups
+from app.services.invoice_numbers import allocate_invoice_numbers, invoice_period
+from datetime import datetime
+from sqlalchemy import insert, update
+import uuid
+
+MAX_BATCH_SIZE = 1000
+
+
+def _batch_ids(data, field):
+    """Validates the id array of a batch request; returns (ids, error_response)."""
+    ids = data.get(field) if isinstance(data, dict) else None
+    if not isinstance(ids, list) or not ids:
+        return None, (jsonify({'message': f'{field} must be a non-empty array'}), 400)
+    if len(ids) > MAX_BATCH_SIZE:
+        return None, (jsonify({'message': f'At most {MAX_BATCH_SIZE} {field} per batch'}), 400)
+    if not all(isinstance(item, (str, int)) and not isinstance(item, bool) for item in ids):
+        return None, (jsonify({'message': f'{field} must contain only strings or integers'}), 400)
+    return ids, None
+
+
+def _batch_response(results):
+    created = sum(1 for item in results if item['success'])
+    return jsonify({
+        'created': created,
+        'failed': len(results) - created,
+        'results': results
+    }), 201 if created else 400
+
+
+@billing_bp.route('/bill/create-batch', methods=['POST'])
+@jwt_required_custom
+def create_bills_batch():
+    """
+    Batch form of /bill/create: {"project_ids": [...], "billing_type", "description", "due_date"}.
+    Loads every project with its plan in one IN query, inserts the bills in
+    bulk and commits once. Each project id gets its own result, in request order.
+    """
+    data = request.get_json()
+    project_ids, error = _batch_ids(data, 'project_ids')
+    if error:
+        return error
+
+    try:
+        due_date = date.fromisoformat(data['due_date']) if data.get('due_date') else None
+    except (TypeError, ValueError):
+        return jsonify({'message': 'due_date must be an ISO date (YYYY-MM-DD)'}), 400
+
+    rows = db.session.query(
+        Project.id,
+        Project.tier1_seller_id,
+        Project.tier2_seller_id,
+        SubscriptionPlan.id.label('plan_id'),
+        SubscriptionPlan.price,
+        SubscriptionPlan.admin_commission_pct,
+        SubscriptionPlan.tier1_commission_pct
+    ).outerjoin(
+        SubscriptionPlan, Project.subscription_plan_id == SubscriptionPlan.id
+    ).filter(Project.id.in_(set(map(str, project_ids)))).all()
+    projects = {row.id: row for row in rows}
+
+    now = datetime.utcnow()
+    bills = []
+    results = []
+    rollup_changes = rollups.RollupChanges()
+    seen = set()
+    for project_id in project_ids:
+        project = projects.get(str(project_id))
+        if project_id in seen:
+            results.append({'project_id': project_id, 'success': False, 'message': 'Duplicate project_id in batch'})
+            continue
+        seen.add(project_id)
+        if not project:
+            results.append({'project_id': project_id, 'success': False, 'message': 'Project not found'})
+            continue
+        if not project.price:
+            results.append({'project_id': project_id, 'success': False,
+                            'message': 'Project does not have a subscription plan with a price.'})
+            continue
+
+        bill_id = str(uuid.uuid4())
+        amount = Decimal(project.price)
+        bills.append({
+            'id': bill_id,
+            'project_id': project.id,
+            'billing_type': data.get('billing_type', 'General'),
+            'amount': amount,
+            'description': data.get('description'),
+            'status': 'pending',
+            'due_date': due_date,
+            'created_at': now,
+            'updated_at': now
+        })
+        # Bulk INSERTs bypass the ORM flush listeners, so rollups are kept here
+        rollup_changes.post(bill_id, rollups.bill_posting(
+            'pending', rollups.month_start(now.date()), amount,
+            project.tier1_seller_id, project.tier2_seller_id, project.plan_id,
+            project.price, project.admin_commission_pct, project.tier1_commission_pct
+        ))
+        results.append({'project_id': project_id, 'success': True, 'bill_id': bill_id})
+
+    try:
+        if bills:
+            db.session.execute(insert(ProjectBilling), bills)
+            rollup_changes.apply(db.session.connection())
+            db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': f'Error: {str(e)}'}), 500
+
+    return _batch_response(results)
+
+
+@billing_bp.route('/invoice/generate-batch', methods=['POST'])
+@jwt_required_custom
+def generate_invoices_batch():
+    """
+    Batch form of /invoice/generate: {"bill_ids": [...]}. Loads and locks every
+    bill in one IN query, reserves the invoice numbers as one range, inserts
+    the invoices in bulk, flips the bills to 'invoiced' with one UPDATE and
+    commits once. Each bill id gets its own result, in request order.
+    """
+    bill_ids, error = _batch_ids(request.get_json(), 'bill_ids')
+    if error:
+        return error
+
+    today = date.today()
+    try:
+        rows = db.session.query(
+            ProjectBilling.id,
+            ProjectBilling.project_id,
+            ProjectBilling.amount,
+            ProjectBilling.status,
+            ProjectBilling.due_date,
+            ProjectBilling.created_at,
+            Invoice.id.label('invoice_id'),
+            Project.tier1_seller_id,
+            Project.tier2_seller_id,
+            SubscriptionPlan.id.label('plan_id'),
+            SubscriptionPlan.price,
+            SubscriptionPlan.admin_commission_pct,
+            SubscriptionPlan.tier1_commission_pct
+        ).join(
+            Project, ProjectBilling.project_id == Project.id
+        ).outerjoin(
+            Invoice, Invoice.billing_record_id == ProjectBilling.id
+        ).outerjoin(
+            SubscriptionPlan, Project.subscription_plan_id == SubscriptionPlan.id
+        ).filter(
+            ProjectBilling.id.in_(set(map(str, bill_ids)))
+        ).with_for_update(of=ProjectBilling).all()
+        bills = {row.id: row for row in rows}
+
+        results = []
+        to_invoice = []
+        seen = set()
+        for bill_id in bill_ids:
+            bill = bills.get(str(bill_id))
+            if bill_id in seen:
+                results.append({'bill_id': bill_id, 'success': False, 'message': 'Duplicate bill_id in batch'})
+            elif not bill:
+                results.append({'bill_id': bill_id, 'success': False, 'message': 'Bill not found'})
+            elif bill.status != 'pending' or bill.invoice_id:
+                results.append({'bill_id': bill_id, 'success': False,
+                                'message': f'Bill is not pending. Current status: {bill.status}'})
+            else:
+                to_invoice.append(bill)
+                results.append({'bill_id': bill_id, 'success': True})
+            seen.add(bill_id)
+
+        if to_invoice:
+            now = datetime.utcnow()
+            invoice_numbers = iter(allocate_invoice_numbers(len(to_invoice), invoice_period(today)))
+            invoices = {}
+            rollup_changes = rollups.RollupChanges()
+            for bill in to_invoice:
+                invoices[bill.id] = {
+                    'id': str(uuid.uuid4()),
+                    'billing_record_id': bill.id,
+                    'project_id': bill.project_id,
+                    'invoice_number': next(invoice_numbers),
+                    'total_amount': bill.amount,
+                    'issue_date': today,
+                    'due_date': bill.due_date or (today + timedelta(days=30)),
+                    'status': 'sent',
+                    'created_at': now,
+                    'updated_at': now
+                }
+                month = rollups.month_start((bill.created_at or now).date())
+                pending, invoiced = (
+                    rollups.bill_posting(
+                        status, month, bill.amount,
+                        bill.tier1_seller_id, bill.tier2_seller_id, bill.plan_id,
+                        bill.price, bill.admin_commission_pct, bill.tier1_commission_pct
+                    )
+                    for status in ('pending', 'invoiced')
+                )
+                rollup_changes.reverse(bill.id, pending)
+                rollup_changes.post(bill.id, invoiced)
+
+            db.session.execute(insert(Invoice), list(invoices.values()))
+            db.session.execute(
+                update(ProjectBilling)
+                .where(ProjectBilling.id.in_(list(invoices)))
+                .values(status='invoiced', updated_at=now)
+                .execution_options(synchronize_session=False)
+            )
+            rollup_changes.apply(db.session.connection())
+            db.session.commit()
+
+            for item in results:
+                invoice = invoices.get(str(item['bill_id'])) if item['success'] else None
+                if invoice:
+                    item.update(invoice_id=invoice['id'], invoice_number=invoice['invoice_number'])
+        else:
+            db.session.rollback()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': f'Error: {str(e)}'}), 500
+
+    return _batch_response(results)
+
+
 
 # ---------------- INITIATE PAYMENT FOR AN INVOICE (UPDATED) ----------------
 @billing_bp.route('/invoice/<invoice_id>/initiate-payment', methods=['POST'])
@@ -99,8 +332,10 @@ def initiate_invoice_payment(invoice_id):
     Creates a Stripe PaymentIntent for the correct commission amount.
     Tier-2 → pays Tier-1's commission, which is then split.
     Tier-1 → pays Admin's commission directly.
+    The provider is called on the bounded payment executor with an idempotency
+    key derived from the invoice, and an intent that can still be paid is reused.
     """
-    stripe.api_key = current_app.config['STRIPE_SECRET_KEY']
+    gateway = get_gateway()
     
     current_user = get_current_user(get_jwt_identity())
     user_role = 'tier2' if is_tier2(current_user) else 'tier1' if is_tier1(current_user) else None
@@ -146,137 +381,126 @@ def initiate_invoice_payment(invoice_id):
     if amount_in_cents < 50:
         return jsonify({'message': 'Payable amount is below the minimum charge.'}), 400
 
+    # ----- Tier-2 Seller Flow -----
+    if user_role == 'tier2':
+        # This logic correctly splits the amount_in_cents (the commission)
+        # between the Tier-1 seller and the Admin.
+        admin_pct = Decimal(plan.admin_commission_pct or 0)
+        admin_amount = int(amount_in_cents * (admin_pct / 100))
+        tier1_amount = amount_in_cents - admin_amount
+        transfer_group = invoice.invoice_number
+
+        # store split data for webhook handling
+        transfer_data = {
+            # 'tier1_account_id': project.tier1_seller.stripe_account_id if project.tier1_seller else None,
+            'tier1_amount': tier1_amount,
+            # 'admin_account_id': current_app.config.get('ADMIN_STRIPE_ACCOUNT_ID'),
+            'admin_amount': admin_amount,
+        }
+
+    # ----- Tier-1 Seller Flow -----
+    else:
+        transfer_group = None
+        transfer_data = {
+            'admin_amount': amount_in_cents
+        }
+
+    invoice_pk = invoice.id
+    invoice_number = invoice.invoice_number
+    previous_intent_id = invoice.stripe_payment_intent_id
+
+    # Don't hold a DB connection while waiting on the payment provider
+    db.session.rollback()
+
+    executor = get_executor()
+    timeout = current_app.config['PAYMENT_CALL_TIMEOUT']
     try:
-        # ----- Tier-2 Seller Flow -----
-        if user_role == 'tier2':
-            # This logic correctly splits the amount_in_cents (the commission)
-            # between the Tier-1 seller and the Admin.
-            admin_pct = Decimal(plan.admin_commission_pct or 0)
-            admin_amount = int(amount_in_cents * (admin_pct / 100))
-            tier1_amount = amount_in_cents - admin_amount
-
-            intent = stripe.PaymentIntent.create(
+        # Hand out the invoice's existing intent while it can still be paid. A new one is
+        # only created once Stripe confirms the previous one is cancelled, so the invoice
+        # never has two live intents the customer could both pay.
+        intent = None
+        if previous_intent_id:
+            try:
+                existing = executor.run(timeout, gateway.retrieve_payment_intent, previous_intent_id)
+            except GatewayBusyError:
+                raise
+            except Exception as e:
+                print(f"Could not retrieve payment intent {previous_intent_id}: {str(e)}")
+                return jsonify({'message': 'Could not check the existing payment for this invoice; try again.'}), 503
+
+            status = existing['status']
+            if status == 'succeeded':
+                return jsonify({'message': 'This invoice has already been paid; confirmation is pending.'}), 409
+            if status in REUSABLE_INTENT_STATUSES and existing['amount'] == amount_in_cents:
+                intent = existing
+            elif status in CANCELABLE_INTENT_STATUSES:
+                # The payable amount changed: retire the outdated intent first
+                try:
+                    executor.run(timeout, gateway.cancel_payment_intent, previous_intent_id)
+                except GatewayBusyError:
+                    raise
+                except Exception as e:
+                    print(f"Could not cancel payment intent {previous_intent_id}: {str(e)}")
+                    return jsonify({'message': 'Could not replace the existing payment for this invoice; try again.'}), 503
+            elif status != 'canceled':
+                return jsonify({'message': f'A payment for this invoice is in progress. Status: {status}'}), 409
+
+        if intent is None:
+            intent = executor.run(
+                timeout,
+                gateway.create_payment_intent,
                 amount=amount_in_cents,
                 currency=currency,
-                payment_method_types=['card'],
-                description=f"Commission Payment for Invoice #{invoice.invoice_number}",
-                transfer_group=invoice.invoice_number,
-                metadata={'invoice_id': invoice.id, 'role': 'tier2'},
+                description=f"Commission Payment for Invoice #{invoice_number}",
+                transfer_group=transfer_group,
+                metadata={'invoice_id': invoice_pk, 'role': user_role},
+                idempotency_key=intent_idempotency_key(invoice_pk, user_role, amount_in_cents, previous_intent_id)
             )
-
-            # store split data for webhook handling
-            invoice.transfer_data = {
-                # 'tier1_account_id': project.tier1_seller.stripe_account_id if project.tier1_seller else None,
-                'tier1_amount': tier1_amount,
-                # 'admin_account_id': current_app.config.get('ADMIN_STRIPE_ACCOUNT_ID'),
-                'admin_amount': admin_amount,
-            }
-
-        # ----- Tier-1 Seller Flow -----
-        elif user_role == 'tier1':
-            intent = stripe.PaymentIntent.create(
-                amount=amount_in_cents,
-                currency=currency,
-                payment_method_types=['card'],
-                description=f"Commission Payment for Invoice #{invoice.invoice_number}",
-                metadata={'invoice_id': invoice.id, 'role': 'tier1'},
+    except GatewayBusyError as e:
+        return jsonify({'message': str(e)}), 503
+    except Exception as e:
+        return jsonify({'message': f'Stripe Error: {str(e) or type(e).__name__}'}), 500
+
+    if intent['id'] != previous_intent_id:
+        try:
+            # Save intent ID to the invoice for tracking
+            db.session.execute(
+                update(Invoice)
+                .where(Invoice.id == invoice_pk)
+                .values(stripe_payment_intent_id=intent['id'], transfer_data=transfer_data)
+                .execution_options(synchronize_session=False)
             )
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            return jsonify({'message': f'Error: {str(e)}'}), 500
 
-            admin_amount = amount_in_cents
-            invoice.transfer_data = {
-                'admin_amount': admin_amount
-            }
- 
+    return jsonify({'client_secret': intent['client_secret']}), 200
 
-        # Save intent ID to the invoice for tracking
-        invoice.stripe_payment_intent_id = intent.id
-        db.session.commit()
-        return jsonify({'client_secret': intent.client_secret}), 200
 
-    except Exception as e:
-        db.session.rollback()
-        return jsonify({'message': f'Stripe Error: {str(e)}'}), 500
-
-
-# ---------------- STRIPE WEBHOOK (NO CHANGE) ----------------
+# ---------------- STRIPE WEBHOOK ----------------
 @billing_bp.route('/stripe-webhook', methods=['POST'])
 def stripe_webhook():
+    """
+    Verifies the signature, stores the raw event in the stripe_events inbox
+    and acknowledges. The background consumers (tasks.consume_stripe_events)
+    apply it; a redelivered event id is acknowledged without being stored again.
+    """
     payload = request.get_data(as_text=True)
     sig_header = request.headers.get('Stripe-Signature')
-    endpoint_secret = current_app.config['STRIPE_WEBHOOK_SECRET']
 
     try:
-        event = stripe.Webhook.construct_event(payload, sig_header, endpoint_secret)
-    except (ValueError, stripe.error.SignatureVerificationError):
+        event = get_gateway().construct_event(payload, sig_header)
+    except WebhookSignatureError:
         return 'Invalid payload or signature', 400
 
-    if event['type'] == 'payment_intent.succeeded':
-        intent = event['data']['object']
-        invoice_id = intent.get('metadata', {}).get('invoice_id')
-        if not invoice_id:
-            return 'Missing invoice_id in metadata', 400
-
-        with db.session.begin():
-            invoice = Invoice.query.filter_by(id=invoice_id).first()
-            if invoice and invoice.status != 'paid':
-                invoice.status = 'paid'
-                invoice.paid_date = date.today()
-                if invoice.billing_record:
-                    invoice.billing_record.status = 'paid'
-
-                project = invoice.project
-                if project and project.tier2_seller_id:
-                    handle_tier2_transfers(intent, project, invoice)
-
-    elif event['type'] == 'payment_intent.payment_failed':
-        intent = event['data']['object']
-        invoice_id = intent.get('metadata', {}).get('invoice_id')
-        if invoice_id:
-            with db.session.begin():
-                invoice = Invoice.query.filter_by(id=invoice_id).first()
-                if invoice:
-                    invoice.status = 'failed'
-
-    return jsonify({'status': 'success'}), 200
-
-
-# ---------------- HANDLE TIER-2 TRANSFERS (NO CHANGE) ----------------
-def handle_tier2_transfers(payment_intent, project, invoice):
-    """Performs post-payment fund transfers for Tier-2 payment (Tier-1 + Admin)."""
-    stripe.api_key = current_app.config['STRIPE_SECRET_KEY']
-    
-    transfer_info = getattr(invoice, 'transfer_data', None)
-    if not transfer_info:
-        return
-
-    # Use the currency from the payment intent for consistency
-    currency = payment_intent.get('currency', 'usd')
-
-    tier1_amount = int(transfer_info.get('tier1_amount', 0))
-    admin_amount = int(transfer_info.get('admin_amount', 0))
-    # tier1_account = transfer_info.get('tier1_account_id')
-    # admin_account = transfer_info.get('admin_account_id')
-
-    source_txn = payment_intent.get('latest_charge')
-    transfer_group = payment_intent.get('transfer_group')
-
-    # Tier-1 transfer (after admin deduction)
-    # stripe.Transfer.create(
-    #     amount=tier1_amount,
-    #     currency=currency,
-    #     destination=tier1_account,
-    #     source_transaction=source_txn,
-    #     transfer_group=transfer_group
-    # )
-    # # Admin transfer
-    # stripe.Transfer.create(
-    #     amount=admin_amount,
-    #     currency=currency,
-    #     destination=admin_account,
-    #     source_transaction=source_txn,
-    #     transfer_group=transfer_group
-    # )
+    try:
+        stored = record_event(event)
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': f'Error: {str(e)}'}), 500
 
+    return jsonify({'status': 'success', 'duplicate': not stored}), 200
 
 
 # ---------------- NEW: MARK INVOICE AS PAID (FOR LOCAL TESTING) ----------------
@@ -297,6 +521,8 @@ def mark_invoice_as_paid_manually(invoice_id):
             invoice.paid_date = date.today()
             if invoice.billing_record:
                 invoice.billing_record.status = 'paid'
+            if invoice.project:
+                record_invoice_payment(invoice, invoice.project)
             db.session.commit()
             return jsonify({'message': f'Invoice {invoice_id} marked as paid.'}), 200
         else:
@@ -594,22 +820,169 @@ from datetime import date
 from app import db 
 from app.routes.projects import get_current_user, get_jwt_identity, is_admin, is_tier1, is_tier2
 from app.utils.auth import jwt_required_custom
+from app.utils.helpers import get_page_args, keyset_page, with_next_cursor
+from app.utils.response_cache import cached_response
+from flask import Response, stream_with_context
+from sqlalchemy import func
+
+# Rows fetched per round-trip when streaming /revenue as NDJSON
+REVENUE_STREAM_BATCH_SIZE = 500
+
+def _bill_status(bill):
+    if bill.status in ["pending", "invoiced"] and bill.due_date and bill.due_date < date.today():
+        return "Overdue"
+    return bill.status.capitalize()
+
+
+def _base_detail(bill, project, invoice):
+    return {
+        "client_name": project.name if project else "Unknown",
+        "invoice_id": invoice.invoice_number if invoice else None,
+        "project_value": 0,
+        "due_date": bill.due_date.isoformat() if bill.due_date else None,
+        "status": _bill_status(bill),
+        "payment_date": invoice.paid_date.isoformat() if (invoice and invoice.paid_date) else None,
+    }
+
+
+def _tier1_revenue_detail(row, user_id):
+    """(section, detail) of one bill as seen by a Tier-1 seller, or None."""
+    bill, project, plan, t1_seller, t2_seller, invoice = row
+    detail_data = _base_detail(bill, project, invoice)
+    detail_data.update({
+        "commission_percentage": None, "commission_amount": 0,
+        "admin_commission_percentage": None, "admin_commission_amount": 0
+    })
+    if not plan:
+        return None
+
+    base_price = Decimal(plan.price)
+    detail_data["project_value"] = float(base_price)
+
+    if project.tier1_seller_id == user_id and not project.tier2_seller_id:
+        if plan.admin_commission_pct is not None:
+            pct = Decimal(plan.admin_commission_pct)
+            detail_data["commission_percentage"] = float(pct)
+            detail_data["commission_amount"] = float(base_price * (pct / 100))
+        return "tier1_project_billing", detail_data
+
+    if t2_seller and t2_seller.tier1_seller_id == user_id:
+        tier1_commission_earned = Decimal('0.0')
+        if plan.tier1_commission_pct is not None:
+            pct = Decimal(plan.tier1_commission_pct)
+            detail_data["commission_percentage"] = float(pct)
+            tier1_commission_earned = base_price * (pct / 100)
+            detail_data["commission_amount"] = float(tier1_commission_earned)
+
+        if plan.admin_commission_pct is not None:
+            admin_pct = Decimal(plan.admin_commission_pct)
+            detail_data["admin_commission_percentage"] = float(admin_pct)
+            admin_commission_to_pay = tier1_commission_earned * (admin_pct / 100)
+            detail_data["admin_commission_amount"] = float(admin_commission_to_pay)
+        return "tier2_project_billing", detail_data
+
+    return None
+
+
+def _admin_revenue_detail(row):
+    """(section, detail) of one bill as seen by the admin, or None."""
+    bill, project, plan, t1_seller, t2_seller, invoice = row
+    detail_data = _base_detail(bill, project, invoice)
+    if not plan:
+        return None
+
+    base_price = Decimal(plan.price)
+    detail_data["project_value"] = float(base_price)
+
+    if project.tier1_seller_id and not project.tier2_seller_id:
+        detail_data["seller_name"] = t1_seller.name if t1_seller else "N/A"
+        if plan.admin_commission_pct is not None:
+            pct = Decimal(plan.admin_commission_pct)
+            detail_data["commission_percentage"] = float(pct)
+            detail_data["commission_amount"] = float(base_price * (pct / 100))
+        return "direct_revenue_details", detail_data
+
+    if project.tier2_seller_id:
+        detail_data["tier1_seller_name"] = t1_seller.name if t1_seller else "N/A"
+        detail_data["tier2_seller_name"] = t2_seller.name if t2_seller else "N/A"
+        tier1_commission_earned = Decimal('0.0')
+
+        if plan.tier1_commission_pct is not None:
+            t1_pct = Decimal(plan.tier1_commission_pct)
+            tier1_commission_earned = base_price * (t1_pct / 100)
+            detail_data["tier1_commission_amount"] = float(tier1_commission_earned)
+
+        if plan.admin_commission_pct is not None:
+            admin_pct = Decimal(plan.admin_commission_pct)
+            admin_share = tier1_commission_earned * (admin_pct / 100)
+            detail_data["admin_commission_amount"] = float(admin_share)
+        return "indirect_revenue_details", detail_data
+
+    return None
+
+
+def _tier2_revenue_detail(row):
+    """(section, detail) of one bill as seen by a Tier-2 seller."""
+    bill, project, plan, t1_seller, t2_seller, invoice = row
+    detail_data = _base_detail(bill, project, invoice)
+    detail_data.update({
+        "project_value": float(bill.amount),
+        "commission_percentage": None,
+        "commission_amount": 0
+    })
+
+    if plan:
+        base_price = Decimal(plan.price)
+        detail_data["project_value"] = float(base_price)
+        if plan.tier1_commission_pct is not None:
+            pct_to_use = Decimal(plan.tier1_commission_pct)
+            detail_data["commission_percentage"] = float(pct_to_use)
+            detail_data["commission_amount"] = float(base_price * (pct_to_use / 100))
+
+    return "billing_details", detail_data
+
+
+def _revenue_filters(query):
+    """Applies the optional date_from / date_to (bill creation date), status and seller_id filters."""
+    date_from = request.args.get('date_from')
+    date_to = request.args.get('date_to')
+    statuses = request.args.get('status')
+    seller_id = request.args.get('seller_id')
+
+    if date_from:
+        query = query.filter(ProjectBilling.created_at >= date.fromisoformat(date_from))
+    if date_to:
+        query = query.filter(ProjectBilling.created_at < date.fromisoformat(date_to) + timedelta(days=1))
+    if statuses:
+        query = query.filter(ProjectBilling.status.in_(statuses.split(',')))
+    if seller_id:
+        query = query.filter(or_(Project.tier1_seller_id == seller_id, Project.tier2_seller_id == seller_id))
+    return query
+
 
 @billing_bp.route('/revenue', methods=['GET'])
 @jwt_required_custom
+@cached_response
+@replica_reads
 def revenue_overview():
     """
     Get overall revenue stats + billing details for the dashboard,
     filtered by the current user's role and permissions.
+
+    Query parameters:
+      limit, after      keyset pagination, opt-in: without either every bill is returned;
+                        the next cursor is returned in X-Next-Cursor
+      date_from, date_to, status (comma-separated), seller_id
+      format=ndjson     stream every matching bill as one JSON object per line
     """
     user_id = get_jwt_identity()
     current_user = get_current_user(user_id)
     if not current_user:
         return jsonify({'message': 'User not found or invalid token'}), 401
 
-    # --- UPDATED QUERY to include joins for seller names ---
+    # The invoice is loaded in the same query instead of lazily per bill
     base_query = db.session.query(
-        ProjectBilling, Project, SubscriptionPlan, Tier1Seller, Tier2Seller
+        ProjectBilling, Project, SubscriptionPlan, Tier1Seller, Tier2Seller, Invoice
     ).select_from(ProjectBilling).join(
         Project, ProjectBilling.project_id == Project.id
     ).outerjoin(
@@ -618,148 +991,124 @@ def revenue_overview():
         Tier1Seller, Project.tier1_seller_id == Tier1Seller.id
     ).outerjoin(
         Tier2Seller, Project.tier2_seller_id == Tier2Seller.id
+    ).outerjoin(
+        Invoice, Invoice.billing_record_id == ProjectBilling.id
     )
 
-    # --- Logic for Tier 1 Seller ---
     if is_tier1(current_user):
-        tier1_project_details = []
-        tier2_project_details = []
-
-        managed_tier2_ids = [
-            seller.id for seller in Tier2Seller.query.filter_by(tier1_seller_id=user_id).all()
-        ]
-        
-        related_bills_query = base_query.filter(
+        sections = ("tier1_project_billing", "tier2_project_billing")
+        query = base_query.filter(
             or_(
                 Project.tier1_seller_id == user_id,
-                Project.tier2_seller_id.in_(managed_tier2_ids)
+                Tier2Seller.tier1_seller_id == user_id
             )
         )
-        
-        for bill, project, plan, t1_seller, t2_seller in related_bills_query.all():
-            detail_data = {
-                "client_name": project.name if project else "Unknown",
-                "invoice_id": bill.invoice.invoice_number if bill.invoice else None,
-                "project_value": 0, "commission_percentage": None, "commission_amount": 0,
-                "due_date": bill.due_date.isoformat() if bill.due_date else None,
-                "status": ("Overdue" if bill.status in ["pending", "invoiced"] and bill.due_date and bill.due_date < date.today() else bill.status.capitalize()),
-                "payment_date": bill.invoice.paid_date.isoformat() if (bill.invoice and bill.invoice.paid_date) else None,
-                "admin_commission_percentage": None, "admin_commission_amount": 0
-            }
-
-            if plan:
-                base_price = Decimal(plan.price)
-                detail_data["project_value"] = float(base_price)
-
-                if project.tier1_seller_id == user_id and not project.tier2_seller_id:
-                    if plan.admin_commission_pct is not None:
-                        pct = Decimal(plan.admin_commission_pct)
-                        detail_data["commission_percentage"] = float(pct)
-                        detail_data["commission_amount"] = float(base_price * (pct / 100))
-                    tier1_project_details.append(detail_data)
-                
-                elif project.tier2_seller_id in managed_tier2_ids:
-                    tier1_commission_earned = Decimal('0.0')
-                    if plan.tier1_commission_pct is not None:
-                        pct = Decimal(plan.tier1_commission_pct)
-                        detail_data["commission_percentage"] = float(pct)
-                        tier1_commission_earned = base_price * (pct / 100)
-                        detail_data["commission_amount"] = float(tier1_commission_earned)
-                    
-                    if plan.admin_commission_pct is not None:
-                        admin_pct = Decimal(plan.admin_commission_pct)
-                        detail_data["admin_commission_percentage"] = float(admin_pct)
-                        admin_commission_to_pay = tier1_commission_earned * (admin_pct / 100)
-                        detail_data["admin_commission_amount"] = float(admin_commission_to_pay)
-                    tier2_project_details.append(detail_data)
-
-        return jsonify({
-            "tier1_project_billing": tier1_project_details,
-            "tier2_project_billing": tier2_project_details
-        }), 200
-
-    # --- Logic for Admin ---
+        build_detail = lambda row: _tier1_revenue_detail(row, user_id)
+        ledger_account = ('tier1_seller', user_id)
     elif is_admin(current_user):
-        bills_result = base_query.all()
-        direct_revenue_details = []
-        indirect_revenue_details = []
-
-        for bill, project, plan, t1_seller, t2_seller in bills_result:
-            detail_data = {
-                "client_name": project.name if project else "Unknown",
-                "invoice_id": bill.invoice.invoice_number if bill.invoice else None,
-                "project_value": 0,
-                "due_date": bill.due_date.isoformat() if bill.due_date else None,
-                "status": ("Overdue" if bill.status in ["pending", "invoiced"] and bill.due_date and bill.due_date < date.today() else bill.status.capitalize()),
-                "payment_date": bill.invoice.paid_date.isoformat() if (bill.invoice and bill.invoice.paid_date) else None,
-            }
-
-            if plan:
-                base_price = Decimal(plan.price)
-                detail_data["project_value"] = float(base_price)
-
-                if project.tier1_seller_id and not project.tier2_seller_id:
-                    detail_data["seller_name"] = t1_seller.name if t1_seller else "N/A"
-                    if plan.admin_commission_pct is not None:
-                        pct = Decimal(plan.admin_commission_pct)
-                        detail_data["commission_percentage"] = float(pct)
-                        detail_data["commission_amount"] = float(base_price * (pct / 100))
-                    direct_revenue_details.append(detail_data)
-
-                elif project.tier2_seller_id:
-                    detail_data["tier1_seller_name"] = t1_seller.name if t1_seller else "N/A"
-                    detail_data["tier2_seller_name"] = t2_seller.name if t2_seller else "N/A"
-                    tier1_commission_earned = Decimal('0.0')
-                    
-                    if plan.tier1_commission_pct is not None:
-                        t1_pct = Decimal(plan.tier1_commission_pct)
-                        tier1_commission_earned = base_price * (t1_pct / 100)
-                        detail_data["tier1_commission_amount"] = float(tier1_commission_earned)
-
-                    if plan.admin_commission_pct is not None:
-                        admin_pct = Decimal(plan.admin_commission_pct)
-                        admin_share = tier1_commission_earned * (admin_pct / 100)
-                        detail_data["admin_commission_amount"] = float(admin_share)
-                    indirect_revenue_details.append(detail_data)
-        
-        return jsonify({
-            "summary": { "total_bills": len(bills_result) },
-            "direct_revenue_details": direct_revenue_details,
-            "indirect_revenue_details": indirect_revenue_details
-        }), 200
-
-    # --- Logic for Tier 2 Seller ---
+        sections = ("direct_revenue_details", "indirect_revenue_details")
+        query = base_query
+        build_detail = _admin_revenue_detail
+        ledger_account = ('admin', '')
     elif is_tier2(current_user):
-        bills_result = base_query.filter(Project.tier2_seller_id == user_id).all()
-        
-        summary = { "total_bills": len(bills_result) }
-        details = []
-        for bill, project, plan, t1_seller, t2_seller in bills_result:
-            project_value = float(bill.amount)
-            commission_pct = None
-            commission_amount = 0
-
-            if plan:
-                base_price = Decimal(plan.price)
-                project_value = float(base_price)
-                if plan.tier1_commission_pct is not None:
-                    pct_to_use = Decimal(plan.tier1_commission_pct)
-                    commission_pct = float(pct_to_use)
-                    commission_amount = float(base_price * (pct_to_use / 100))
-
-            details.append({
-                "client_name": project.name if project else "Unknown",
-                "invoice_id": bill.invoice.invoice_number if bill.invoice else None,
-                "project_value": project_value,
-                "commission_percentage": commission_pct,
-                "commission_amount": commission_amount,
-                "due_date": bill.due_date.isoformat() if bill.due_date else None,
-                "status": ("Overdue" if bill.status in ["pending", "invoiced"] and bill.due_date and bill.due_date < date.today() else bill.status.capitalize()),
-                "payment_date": bill.invoice.paid_date.isoformat() if (bill.invoice and bill.invoice.paid_date) else None,
-            })
-        
-        return jsonify({ "summary": summary, "billing_details": details }), 200
-    
-    # Fallback for any other user type
+        sections = ("billing_details",)
+        query = base_query.filter(Project.tier2_seller_id == user_id)
+        build_detail = _tier2_revenue_detail
+        ledger_account = ('tier2_seller', user_id)
     else:
-        return jsonify({ "summary": {}, "billing_details": [] }), 200
\ No newline at end of file
+        # Fallback for any other user type
+        return jsonify({ "summary": {}, "billing_details": [] }), 200
+
+    try:
+        query = _revenue_filters(query)
+    except ValueError:
+        return jsonify({'message': 'date_from and date_to must be YYYY-MM-DD dates'}), 400
+
+    # --- Streaming: one JSON object per bill, fetched from the cursor in batches ---
+    if request.args.get('format') == 'ndjson':
+        def generate():
+            # Runs after the view has returned, so it routes its own reads
+            with use_replica():
+                for row in query.order_by(ProjectBilling.id).yield_per(REVENUE_STREAM_BATCH_SIZE):
+                    detail = build_detail(row)
+                    if detail:
+                        section, detail_data = detail
+                        yield json.dumps({"section": section, **detail_data}) + "\n"
+
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+    # --- Paginated JSON ---
+    limit, after = get_page_args()
+    rows, next_cursor = keyset_page(query, ProjectBilling.id, after, limit, key=lambda row: row[0].id)
+
+    result = {section: [] for section in sections}
+    for row in rows:
+        detail = build_detail(row)
+        if detail:
+            section, detail_data = detail
+            result[section].append(detail_data)
+
+    summary = {}
+    if not is_tier1(current_user):
+        summary["total_bills"] = query.order_by(None).with_entities(func.count(ProjectBilling.id)).scalar()
+    if current_app.config['COMMISSION_LEDGER_ENABLED']:
+        # Commission actually received / paid out, from the ledger balances
+        earned, paid = ledger.account_totals(*ledger_account)
+        summary.update({"commission_earned": float(earned), "commission_paid": float(paid)})
+    if summary:
+        result = {"summary": summary, **result}
+
+    return with_next_cursor(jsonify(result), next_cursor), 200
+
+
+# ---------------- EXPORT (ADMIN) ----------------
+from app.services.exports import EXPORT_FORMATS, ExportError, export_chunks, export_statement, iter_batches
+
+
+@billing_bp.route('/export', methods=['GET'])
+@jwt_required_custom
+@replica_reads
+def export_billing():
+    """
+    Streams every bill with its invoice, project, sellers and plan as a file.
+    Rows are read from a server-side cursor in batches, so memory stays flat
+    whatever the size of the export.
+
+    Query parameters:
+      format=csv|ndjson|parquet   (default csv; parquet needs pyarrow installed)
+      gzip=1                      gzip-compress the stream
+      date_from, date_to, status (comma-separated), seller_id
+    """
+    current_user = get_current_user(get_jwt_identity())
+    if not current_user or not is_admin(current_user):
+        return jsonify({'message': 'Admin access required'}), 403
+
+    fmt = request.args.get('format', 'csv')
+    compress = request.args.get('gzip', '').lower() in ('1', 'true', 'yes')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'message': f"format must be one of {', '.join(EXPORT_FORMATS)}"}), 400
+
+    try:
+        stmt = export_statement(
+            date_from=date.fromisoformat(request.args['date_from']) if request.args.get('date_from') else None,
+            date_to=date.fromisoformat(request.args['date_to']) if request.args.get('date_to') else None,
+            statuses=request.args['status'].split(',') if request.args.get('status') else None,
+            seller_id=request.args.get('seller_id')
+        )
+    except ValueError:
+        return jsonify({'message': 'date_from and date_to must be YYYY-MM-DD dates'}), 400
+
+    try:
+        chunks = export_chunks(fmt, iter_batches(stmt), compress=compress)
+    except ExportError as e:
+        return jsonify({'message': str(e)}), 501
+
+    def generate():
+        # The rows are read while the response streams, after the view has returned
+        with use_replica():
+            yield from chunks
+
+    filename = f"billing-export-{date.today().isoformat()}.{fmt}" + ('.gz' if compress else '')
+    headers = {'Content-Disposition': f'attachment; filename="{filename}"'}
+    mimetype = 'application/gzip' if compress else EXPORT_FORMATS[fmt]
+    return Response(stream_with_context(generate()), mimetype=mimetype, headers=headers)
@@ -1,23 +1,22 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app import db
-from app.models import Admin, Client , Project, Tier1Seller, Tier2Seller
+from app.models import Client , Project, Tier2Seller
 from datetime import datetime
 
 from app.models.project import SubscriptionPlan
 from app.models.seller import Tier2Seller
+from app.utils.auth import resolve_principal
+from app.database_routing import replica_reads
+from app.utils.helpers import get_page_args, keyset_page, with_next_cursor
+from sqlalchemy import or_
+from sqlalchemy.orm import selectinload
 
 projects_bp = Blueprint('projects', __name__)
 
 # ------------------ HELPER FUNCTIONS ------------------
 def get_current_user(user_id):
-    if admin := Admin.query.get(user_id):
-        return {"id": admin.id, "role": "admin"}
-    if tier1 := Tier1Seller.query.get(user_id):
-        return {"id": tier1.id, "role": "tier1_seller"}
-    if tier2 := Tier2Seller.query.get(user_id):
-        return {"id": tier2.id, "role": "tier2_seller"}
-    return None
+    return resolve_principal(user_id)
 
 def is_admin(user): return user and user.get('role') == 'admin'
 def is_tier1(user): return user and user.get('role') == 'tier1_seller'
@@ -25,43 +24,90 @@ def is_tier2(user): return user and user.get('role') == 'tier2_seller'
 
 # -------------------- PROJECT ROUTES -------------------- #
 
+# Fields of a serialized project; `fields=` selects a subset (sparse fieldset)
+PROJECT_FIELDS = {
+    'id': lambda p: p.id,
+    'name': lambda p: p.name,
+    'status': lambda p: p.status,
+    'project_type': lambda p: p.project_type,
+    'description': lambda p: p.description,
+    'tier1_seller_id': lambda p: p.tier1_seller_id,
+    'tier2_seller_id': lambda p: p.tier2_seller_id,
+    'hours_used': lambda p: float(p.hours_used) if p.hours_used else 0,
+    'hourly_budget': lambda p: float(p.hourly_budget) if p.hourly_budget else 0,
+    'completion_percentage': lambda p: (float(p.hours_used or 0) / float(p.hourly_budget or 1)) * 100 if p.hourly_budget else 0,
+    'clients': lambda p: [{'id': c.id, 'name': c.name, 'company': c.company} for c in p.clients],
+    'subscription_plan_id': lambda p: p.subscription_plan_id,
+}
+
+
+def get_project_fields():
+    """Fields requested with `fields=a,b,c` (all by default); raises ValueError on an unknown field."""
+    requested = request.args.get('fields')
+    if not requested:
+        return list(PROJECT_FIELDS)
+    fields = [name.strip() for name in requested.split(',') if name.strip()]
+    unknown = [name for name in fields if name not in PROJECT_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+
+def serialize_project(project, fields):
+    return {name: PROJECT_FIELDS[name](project) for name in fields}
+
+
 @projects_bp.route('/', methods=['GET'])
 @jwt_required()
+@replica_reads
 def get_all_projects():
+    """
+    Lists the projects visible to the current user: all of them, or one keyset
+    page at a time when `limit` or `after` is given.
+
+    Query parameters:
+      limit, after      keyset pagination (opt-in); the next cursor is returned in X-Next-Cursor
+      status, project_type, seller_id (Tier-1 or Tier-2 seller)
+      fields            comma-separated subset of the project fields, e.g. fields=id,name,status
+    """
     current_user = get_current_user(get_jwt_identity())
     user_id = current_user.get('id')
 
     if is_admin(current_user):
-        projects = Project.query.all()
+        query = Project.query
     elif is_tier1(current_user):
         # MODIFIED: Tier 1 sees their projects that are NOT assigned to a Tier 2 seller.
-        projects = Project.query.filter_by(
+        query = Project.query.filter_by(
             tier1_seller_id=user_id, 
             tier2_seller_id=None
-        ).all()
+        )
     elif is_tier2(current_user):
-        projects = Project.query.filter_by(tier2_seller_id=user_id).all()
+        query = Project.query.filter_by(tier2_seller_id=user_id)
     else:
         return jsonify({'message': 'Access denied'}), 403
 
-    result = []
-    for p in projects:
-        result.append({
-            'id': p.id,
-            'name': p.name,
-            'status': p.status,
-            'project_type': p.project_type,
-            'description': p.description,
-            'tier1_seller_id': p.tier1_seller_id,
-            'tier2_seller_id': p.tier2_seller_id,
-            # 'project_value': float(p.project_value) if p.project_value else 0,
-            'hours_used': float(p.hours_used) if p.hours_used else 0,
-            'hourly_budget': float(p.hourly_budget) if p.hourly_budget else 0,
-            'completion_percentage': (float(p.hours_used or 0) / float(p.hourly_budget or 1)) * 100 if p.hourly_budget else 0,
-            'clients': [{'id': c.id, 'name': c.name, 'company': c.company} for c in p.clients],
-            'subscription_plan_id': p.subscription_plan_id 
-        })
-    return jsonify(result), 200
+    try:
+        fields = get_project_fields()
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    if request.args.get('status'):
+        query = query.filter(Project.status == request.args['status'])
+    if request.args.get('project_type'):
+        query = query.filter(Project.project_type == request.args['project_type'])
+    if request.args.get('seller_id'):
+        seller_id = request.args['seller_id']
+        query = query.filter(or_(Project.tier1_seller_id == seller_id, Project.tier2_seller_id == seller_id))
+
+    # Clients of the whole page in one extra query, only when they are returned
+    if 'clients' in fields:
+        query = query.options(selectinload(Project.clients))
+
+    limit, after = get_page_args()
+    projects, next_cursor = keyset_page(query, Project.id, after, limit)
+
+    result = [serialize_project(p, fields) for p in projects]
+    return with_next_cursor(jsonify(result), next_cursor), 200
 
 
 
@@ -95,11 +141,20 @@ def toggle_project_status(project_id):
 
 @projects_bp.route('/<project_id>', methods=['GET'])
 @jwt_required()
+@replica_reads
 def get_project(project_id):
     current_user = get_current_user(get_jwt_identity())
     user_id = current_user.get('id')
 
-    project = Project.query.get(project_id)
+    try:
+        fields = get_project_fields()
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    query = Project.query.filter_by(id=project_id)
+    if 'clients' in fields:
+        query = query.options(selectinload(Project.clients))
+    project = query.first()
     if not project:
         return jsonify({'message': 'Project not found'}), 404
 
@@ -107,21 +162,7 @@ def get_project(project_id):
        (is_tier2(current_user) and project.tier2_seller_id != user_id):
         return jsonify({'message': 'Access denied'}), 403
 
-    return jsonify({
-        'id': project.id,
-        'name': project.name,
-        'status': project.status,
-        'project_type': project.project_type,
-        'description': project.description,
-        'tier1_seller_id': project.tier1_seller_id,
-        'tier2_seller_id': project.tier2_seller_id,
-        'project_value': float(project.project_value) if project.project_value else 0,
-        'hours_used': float(project.hours_used) if project.hours_used else 0,
-        'hourly_budget': float(project.hourly_budget) if project.hourly_budget else 0,
-        'completion_percentage': (float(project.hours_used or 0) / float(project.hourly_budget or 1)) * 100 if project.hourly_budget else 0,
-        'clients': [{'id': c.id, 'name': c.name, 'company': c.company} for c in project.clients],
-        'subscription_plan_id': project.subscription_plan_id
-    }), 200
+    return jsonify(serialize_project(project, fields)), 200
 
 @projects_bp.route('/', methods=['POST'])
 @jwt_required()
@@ -249,6 +290,7 @@ def create_client():
 
 @projects_bp.route('/clients', methods=['GET'])
 @jwt_required()
+@replica_reads
 def list_clients():
     current_user = get_current_user(get_jwt_identity())
     user_id = current_user.get('id')
@@ -266,6 +308,7 @@ def list_clients():
 
 @projects_bp.route('/clients/<client_id>', methods=['GET'])
 @jwt_required()
+@replica_reads
 def get_client(client_id):
     current_user = get_current_user(get_jwt_identity())
     user_id = current_user.get('id')
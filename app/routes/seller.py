@@ -1,27 +1,18 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app import db
-from app.models import Tier1Seller, Tier2Seller, Admin,Project,Client
-from app.models.billing import ProjectBilling
+from app.models import Tier1Seller, Tier2Seller,Project,Client
+from app.models.billing import ProjectBilling, RevenueRollup
+from app.utils.auth import resolve_principal
+from app.database_routing import replica_reads
 from datetime import datetime
 
 seller_bp = Blueprint('seller', __name__)
 
 # ------------------ HELPER ------------------
 def get_current_user(user_id):
-    admin = Admin.query.get(user_id)
-    if admin:
-        return {"id": admin.id, "role": "admin"}
-
-    tier1 = Tier1Seller.query.get(user_id)
-    if tier1:
-        return {"id": tier1.id, "role": "tier1_seller"}
-
-    tier2 = Tier2Seller.query.get(user_id)
-    if tier2:
-        return {"id": tier2.id, "role": "tier2_seller"}
-
-    return None
+    # Resolved from the token's role claim through the per-process principal cache
+    return resolve_principal(user_id)
 
 def is_admin(user):
     return user and user.get('role') == 'admin'
@@ -57,46 +48,69 @@ def create_tier1():
     return jsonify({'message': 'Tier1 seller created successfully', 'id': new_tier1.id}), 201
 
 
-# ------------------ GET ALL TIER1 SELLERS ------------------
 # ------------------ GET ALL TIER1 SELLERS ------------------
 from sqlalchemy import func
+from app.utils.helpers import get_page_args, keyset_page, with_next_cursor
+
+def seller_projects_filter(seller_column, tier):
+    """Projects a seller row owns: a Tier1's direct projects, or a Tier2's projects."""
+    if tier == 'tier1':
+        return (Project.tier1_seller_id == seller_column, Project.tier2_seller_id.is_(None))
+    return (Project.tier2_seller_id == seller_column,)
+
+def seller_project_count(seller_column, tier):
+    """Correlated subquery: number of projects owned by the seller row."""
+    return db.session.query(func.count(Project.id)).filter(
+        *seller_projects_filter(seller_column, tier)
+    ).scalar_subquery().correlate_except(Project)
+
+def seller_paid_revenue(seller_column, tier):
+    """Correlated subquery: sum of the paid bills of the seller row's projects."""
+    if current_app.config['REVENUE_ROLLUPS_ENABLED']:
+        if tier == 'tier1':
+            criteria = (RevenueRollup.tier1_seller_id == seller_column, RevenueRollup.tier2_seller_id == '')
+        else:
+            criteria = (RevenueRollup.tier2_seller_id == seller_column,)
+        return db.session.query(func.coalesce(func.sum(RevenueRollup.amount), 0)).filter(
+            *criteria,
+            RevenueRollup.status == 'paid'
+        ).scalar_subquery().correlate_except(RevenueRollup)
+
+    return db.session.query(func.coalesce(func.sum(ProjectBilling.amount), 0)).join(
+        Project, ProjectBilling.project_id == Project.id
+    ).filter(
+        *seller_projects_filter(seller_column, tier),
+        ProjectBilling.status == 'paid'
+    ).scalar_subquery().correlate_except(Project, ProjectBilling)
 
-# ------------------ GET ALL TIER1 SELLERS ------------------
 @seller_bp.route('/tier1', methods=['GET'])
 @jwt_required()
+@replica_reads
 def get_tier1_sellers():
-    sellers = Tier1Seller.query.all()
-
-    result = []
-    for s in sellers:
-        # Count projects under this Tier1 seller (client_count means project_count here)
-        client_count = (
-            db.session.query(Project)
-            .filter(
-                Project.tier1_seller_id == s.id,
-                Project.tier2_seller_id.is_(None)  # ADD THIS CONDITION
-            )
-            .count()
-        )
-
-        # Revenue = sum of all paid bills of projects under this Tier1 seller
-        revenue = (
-            db.session.query(func.coalesce(func.sum(ProjectBilling.amount), 0))
-            .join(Project, ProjectBilling.project_id == Project.id)
-            .filter(Project.tier1_seller_id == s.id,Project.tier2_seller_id.is_(None), ProjectBilling.status == 'paid')
-            .scalar()
-        )
-
-        result.append({
-            'id': s.id,
-            'name': s.name,
-            'admin_email': s.admin_email,
-            'subdomain': s.subdomain,
-            'project_count': client_count,  # projects count
-            'revenue': float(revenue)
-        })
-
-    return jsonify(result), 200
+    limit, after = get_page_args()
+
+    # One query per page: project counts and paid revenue (direct projects only)
+    # are correlated subqueries evaluated for the sellers on this page.
+    query = db.session.query(
+        Tier1Seller.id,
+        Tier1Seller.name,
+        Tier1Seller.admin_email,
+        Tier1Seller.subdomain,
+        seller_project_count(Tier1Seller.id, 'tier1').label('project_count'),
+        seller_paid_revenue(Tier1Seller.id, 'tier1').label('revenue')
+    )
+    sellers, next_cursor = keyset_page(query, Tier1Seller.id, after, limit)
+
+    result = [{
+        'id': s.id,
+        'name': s.name,
+        'admin_email': s.admin_email,
+        'subdomain': s.subdomain,
+        'project_count': s.project_count,  # projects count
+        'revenue': float(s.revenue)
+    } for s in sellers]
+
+    return with_next_cursor(jsonify(result), next_cursor), 200
 
 # from sqlalchemy import func, or_ # <-- Make sure to import or_
 
@@ -151,6 +165,7 @@ def get_tier1_sellers():
 # ------------------ GET SINGLE TIER1 SELLER ------------------
 @seller_bp.route('/tier1/<seller_id>', methods=['GET'])
 @jwt_required()
+@replica_reads
 def get_tier1_seller(seller_id):
     seller = Tier1Seller.query.get(seller_id)
     if not seller:
@@ -234,58 +249,49 @@ def create_tier2():
     return jsonify({'message': 'Tier2 seller created successfully', 'id': new_tier2.id}), 201
 
 
-# ------------------ GET ALL TIER2 SELLERS ------------------
-from sqlalchemy import func
-
 # ------------------ GET ALL TIER2 SELLERS ------------------
 @seller_bp.route('/tier2', methods=['GET'])
 @jwt_required()
+@replica_reads
 def get_tier2_sellers():
     current_user = get_current_user(get_jwt_identity())
+    limit, after = get_page_args()
+
+    query = db.session.query(
+        Tier2Seller.id,
+        Tier2Seller.name,
+        Tier2Seller.admin_email,
+        Tier2Seller.subdomain,
+        Tier1Seller.name.label('tier1_seller_name'),
+        seller_project_count(Tier2Seller.id, 'tier2').label('project_count'),
+        seller_paid_revenue(Tier2Seller.id, 'tier2').label('revenue')
+    ).outerjoin(Tier1Seller, Tier2Seller.tier1_seller_id == Tier1Seller.id)
 
     if is_tier1(current_user):
-        sellers = Tier2Seller.query.filter_by(tier1_seller_id=current_user['id']).all()
-    elif is_admin(current_user):
-        sellers = Tier2Seller.query.all()
-    else:
+        query = query.filter(Tier2Seller.tier1_seller_id == current_user['id'])
+    elif not is_admin(current_user):
         return jsonify({'message': 'Unauthorized'}), 403
 
-    result = []
-    for s in sellers:
-        # Count projects under this Tier2 seller (client_count means project_count here)
-        client_count = (
-            db.session.query(Project)
-            .filter(Project.tier2_seller_id == s.id)
-            .count()
-        )
-
-        # Revenue = sum of all paid bills of projects under this Tier2 seller
-        revenue = (
-            db.session.query(func.coalesce(func.sum(ProjectBilling.amount), 0))
-            .join(Project, ProjectBilling.project_id == Project.id)
-            .filter(Project.tier2_seller_id == s.id, ProjectBilling.status == 'paid')
-            .scalar()
-        )
-        # Fetch tier1 seller name
-        tier1_seller = Tier1Seller.query.get(s.tier1_seller_id)
-
-        result.append({
-            'id': s.id,
-            'name': s.name,
-            'admin_email': s.admin_email,
-            'subdomain': s.subdomain,
-            'project_count': client_count,  # projects count
-            'revenue': float(revenue),
-            'tier1_seller': {'name':tier1_seller.name if tier1_seller else None}
-        })
-
-    return jsonify(result), 200
+    sellers, next_cursor = keyset_page(query, Tier2Seller.id, after, limit)
+
+    result = [{
+        'id': s.id,
+        'name': s.name,
+        'admin_email': s.admin_email,
+        'subdomain': s.subdomain,
+        'project_count': s.project_count,  # projects count
+        'revenue': float(s.revenue),
+        'tier1_seller': {'name': s.tier1_seller_name}
+    } for s in sellers]
+
+    return with_next_cursor(jsonify(result), next_cursor), 200
 
 
 
 # ------------------ GET SINGLE TIER2 SELLER ------------------
 @seller_bp.route('/tier2/<seller_id>', methods=['GET'])
 @jwt_required()
+@replica_reads
 def get_tier2_seller(seller_id):
     current_user = get_current_user(get_jwt_identity())
     seller = Tier2Seller.query.get(seller_id)
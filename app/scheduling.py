@@ -0,0 +1,276 @@
+import fcntl
+import os
+import signal
+import socket
+import threading
+from datetime import timedelta
+from flask_apscheduler import APScheduler
+from sqlalchemy import case, func, or_, select, update
+from app import db
+from app.database_engine import upsert_insert
+
+
+# ------------------ SCHEDULED JOBS ------------------
+def init_scheduler(app):
+    """Creates the app's APScheduler with the billing jobs, without starting it."""
+    from app import tasks
+
+    scheduler = APScheduler()
+    scheduler.init_app(app)
+
+    with app.app_context():
+        # Scheduled jobs reuse this app (and its engine/pool) instead of building their own
+        tasks.init_app(app)
+        # Add the job if it doesn't already exist
+        if not scheduler.get_job('monthly-billing'):
+            scheduler.add_job(
+                id='monthly-billing',
+                func=tasks.generate_monthly_invoices,
+                trigger='cron',
+                hour=5, # Runs at 5:00 AM UTC every day
+                minute=0
+            )
+        if not scheduler.get_job('stripe-events'):
+            scheduler.add_job(
+                id='stripe-events',
+                func=tasks.consume_stripe_events,
+                trigger='interval',
+                seconds=app.config['STRIPE_EVENT_POLL_SECONDS'],
+                max_instances=app.config['STRIPE_EVENT_CONSUMERS']
+            )
+        if not scheduler.get_job('settlement'):
+            scheduler.add_job(
+                id='settlement',
+                func=tasks.settle_transfers,
+                trigger='interval',
+                minutes=app.config['SETTLEMENT_INTERVAL_MINUTES']
+            )
+    return scheduler
+
+
+# ------------------ LEADER LEASE ------------------
+# Every process that may run the jobs starts its scheduler paused and tries to
+# take the 'scheduler' lease in scheduler_leases. Only the holder resumes its
+# scheduler; it renews the lease every SCHEDULER_LEASE_SECONDS / 3 and pauses
+# again as soon as a renewal fails. A lease left by a dead holder expires after
+# SCHEDULER_LEASE_SECONDS and is taken over by the next process that asks.
+SCHEDULER_LEASE = 'scheduler'
+
+_leader = threading.Event()
+_stop = threading.Event()
+
+
+def lease_holder_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def is_leader():
+    """True while this process holds the scheduler lease."""
+    return _leader.is_set()
+
+
+def _db_now(seconds=0):
+    """
+    The database server's current UTC time plus `seconds`, as a SQL expression.
+    Lease times never come from the app host's clock: a node whose clock runs
+    ahead must not see a live lease as expired.
+    """
+    if db.session.get_bind().dialect.name == 'postgresql':
+        now = func.timezone('UTC', func.now())
+        return now + timedelta(seconds=seconds) if seconds else now
+    return func.datetime('now', f"+{seconds} seconds")
+
+
+def acquire_lease(name, holder, ttl_seconds):
+    """Takes or renews lease `name` for `holder` and commits; True if `holder` now holds it."""
+    from app.models.scheduler import SchedulerLease
+
+    now = _db_now()
+    expires_at = _db_now(ttl_seconds)
+    result = db.session.execute(
+        update(SchedulerLease)
+        .where(
+            SchedulerLease.name == name,
+            or_(SchedulerLease.holder == holder, SchedulerLease.expires_at <= now)
+        )
+        .values(
+            holder=holder,
+            acquired_at=case((SchedulerLease.holder == holder, SchedulerLease.acquired_at), else_=now),
+            renewed_at=now,
+            expires_at=expires_at
+        )
+        .execution_options(synchronize_session=False)
+    )
+    acquired = result.rowcount == 1
+
+    if not acquired:
+        upsert = upsert_insert(db.session.get_bind().dialect.name)
+        # First run: nobody has held the lease yet
+        result = db.session.execute(
+            upsert(SchedulerLease).values(
+                name=name, holder=holder, acquired_at=now, renewed_at=now, expires_at=expires_at
+            ).on_conflict_do_nothing(index_elements=['name'])
+        )
+        acquired = result.rowcount == 1
+
+    db.session.commit()
+    return acquired
+
+
+def release_lease(name, holder):
+    """Expires lease `name` now if `holder` holds it, so another process can take over at once."""
+    from app.models.scheduler import SchedulerLease
+
+    db.session.execute(
+        update(SchedulerLease)
+        .where(SchedulerLease.name == name, SchedulerLease.holder == holder)
+        .values(expires_at=_db_now())
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+
+
+def current_lease(name=SCHEDULER_LEASE):
+    """The lease row as a dict, or None if no process has held it yet."""
+    from app.models.scheduler import SchedulerLease
+
+    row = db.session.execute(
+        select(SchedulerLease, (SchedulerLease.expires_at <= _db_now()).label('expired'))
+        .where(SchedulerLease.name == name)
+    ).first()
+    if row is None:
+        return None
+    lease = row.SchedulerLease
+    return {
+        'name': lease.name,
+        'holder': lease.holder,
+        'acquired_at': lease.acquired_at.isoformat(),
+        'renewed_at': lease.renewed_at.isoformat(),
+        'expires_at': lease.expires_at.isoformat(),
+        'expired': bool(row.expired)
+    }
+
+
+class LeaseLost(RuntimeError):
+    """The process running a scheduled job no longer holds the scheduler lease."""
+
+
+def check_lease(holder, name=SCHEDULER_LEASE):
+    """
+    Raises LeaseLost unless `holder` still holds lease `name`. Long scheduled
+    jobs call it at the start of every chunk transaction: the lease row is
+    read FOR SHARE, so another process cannot take the lease over until that
+    chunk has committed, and the next chunk sees the takeover and stops.
+    A `holder` of None (a run started from the CLI) is not checked.
+    """
+    from app.models.scheduler import SchedulerLease
+
+    if holder is None:
+        return
+    held = db.session.execute(
+        select(SchedulerLease.name)
+        .where(
+            SchedulerLease.name == name,
+            SchedulerLease.holder == holder,
+            SchedulerLease.expires_at > _db_now()
+        )
+        .with_for_update(read=True)
+    ).first()
+    if held is None:
+        raise LeaseLost(f"{holder} no longer holds the '{name}' lease")
+
+
+def _lead(app):
+    scheduler = app.apscheduler
+    holder = lease_holder_id()
+    ttl = app.config['SCHEDULER_LEASE_SECONDS']
+
+    while not _stop.is_set():
+        try:
+            with app.app_context():
+                leading = acquire_lease(SCHEDULER_LEASE, holder, ttl)
+        except Exception as e:
+            # Without a confirmed lease this process must not run jobs
+            print(f"Error renewing the scheduler lease: {str(e)}")
+            leading = False
+
+        if leading and not _leader.is_set():
+            _leader.set()
+            scheduler.resume()
+            print(f"Scheduler lease acquired by {holder}; scheduled jobs running here.")
+        elif not leading and _leader.is_set():
+            _leader.clear()
+            scheduler.pause()
+            print(f"Scheduler lease lost by {holder}; scheduled jobs paused.")
+
+        _stop.wait(max(ttl / 3, 1))
+
+
+def start_scheduler(app):
+    """Starts the app's scheduler paused; it runs jobs only while this process holds the lease."""
+    scheduler = app.apscheduler
+    scheduler.start(paused=True)
+    if not scheduler.running:
+        # Flask's reloader parent, or a host outside SCHEDULER_ALLOWED_HOSTS
+        return
+    _stop.clear()
+    threading.Thread(target=_lead, args=(app,), name='scheduler-lease', daemon=True).start()
+
+
+def stop_scheduler(app):
+    """Stops the scheduler and hands the lease over immediately if this process held it."""
+    _stop.set()
+    scheduler = getattr(app, 'apscheduler', None)
+    if scheduler is not None and scheduler.running:
+        scheduler.shutdown(wait=False)
+    if _leader.is_set():
+        _leader.clear()
+        try:
+            with app.app_context():
+                release_lease(SCHEDULER_LEASE, lease_holder_id())
+        except Exception as e:
+            print(f"Error releasing the scheduler lease: {str(e)}")
+
+
+def run_scheduler_process(app):
+    """Runs the scheduler in the foreground of a dedicated process until SIGTERM or SIGINT."""
+    stopped = threading.Event()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *args: stopped.set())
+
+    start_scheduler(app)
+    print(f"Scheduler process {lease_holder_id()} started; waiting for the lease.")
+    stopped.wait()
+    stop_scheduler(app)
+
+
+# ------------------ ONE CANDIDATE PER HOST ------------------
+# Under gunicorn every worker has the scheduler configured but not started.
+# Each worker waits on an exclusive lock on SCHEDULER_LOCK_FILE in a daemon
+# thread; the worker that holds it becomes this host's candidate for the
+# lease. The kernel releases the lock when that worker exits (graceful reload,
+# max_requests restart, crash), and one of the waiting workers takes over.
+_lock_file = None
+
+
+def _run_when_elected(app, path):
+    global _lock_file
+    lock_file = open(path, 'a+')
+    fcntl.flock(lock_file, fcntl.LOCK_EX)  # blocks until the current holder exits
+    _lock_file = lock_file  # keep the descriptor (and the lock) for the worker's lifetime
+
+    lock_file.seek(0)
+    lock_file.truncate()
+    lock_file.write(str(os.getpid()))
+    lock_file.flush()
+
+    print(f"Worker {os.getpid()} is this host's scheduler candidate")
+    start_scheduler(app)
+
+
+def pin_scheduler_to_one_worker(app):
+    """Starts the app's scheduler in this worker once it holds the host-wide scheduler lock."""
+    path = app.config['SCHEDULER_LOCK_FILE']
+    threading.Thread(
+        target=_run_when_elected, args=(app, path), name='scheduler-election', daemon=True
+    ).start()
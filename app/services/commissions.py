@@ -0,0 +1,68 @@
+# app/services/commissions.py
+
+from decimal import Decimal
+
+from sqlalchemy import and_, case
+
+from app.models import Project
+from app.models.project import SubscriptionPlan
+
+# Commission rules:
+# - direct Tier-1 project: the admin takes admin_pct of the plan price;
+# - Tier-2 project: the Tier-1 takes tier1_pct of the plan price and the admin
+#   takes admin_pct of that Tier-1 commission.
+
+
+def bill_commissions(price, admin_pct, tier1_pct, tier1_seller_id, tier2_seller_id):
+    """(admin_commission, tier1_commission) earned on one bill of a plan."""
+    admin_commission = Decimal('0')
+    tier1_commission = Decimal('0')
+    if price is None:
+        return admin_commission, tier1_commission
+
+    price = Decimal(price)
+    if tier2_seller_id and tier1_pct is not None:
+        tier1_commission = price * (Decimal(tier1_pct) / 100)
+
+    if admin_pct is not None:
+        if tier1_seller_id and not tier2_seller_id:
+            admin_commission = price * (Decimal(admin_pct) / 100)
+        elif tier2_seller_id and tier1_pct is not None:
+            admin_commission = tier1_commission * (Decimal(admin_pct) / 100)
+
+    return admin_commission, tier1_commission
+
+
+def tier1_commission_expr():
+    """SQL counterpart of bill_commissions()[1] over a Project / SubscriptionPlan join."""
+    return case(
+        (
+            and_(Project.tier2_seller_id.isnot(None), SubscriptionPlan.tier1_commission_pct.isnot(None)),
+            SubscriptionPlan.price * SubscriptionPlan.tier1_commission_pct / 100
+        ),
+        else_=0
+    )
+
+
+def admin_commission_expr():
+    """SQL counterpart of bill_commissions()[0] over a Project / SubscriptionPlan join."""
+    return case(
+        (
+            and_(
+                SubscriptionPlan.admin_commission_pct.isnot(None),
+                Project.tier1_seller_id.isnot(None),
+                Project.tier2_seller_id.is_(None)
+            ),
+            SubscriptionPlan.price * SubscriptionPlan.admin_commission_pct / 100
+        ),
+        (
+            and_(
+                SubscriptionPlan.admin_commission_pct.isnot(None),
+                Project.tier2_seller_id.isnot(None),
+                SubscriptionPlan.tier1_commission_pct.isnot(None)
+            ),
+            SubscriptionPlan.price * SubscriptionPlan.tier1_commission_pct / 100
+            * SubscriptionPlan.admin_commission_pct / 100
+        ),
+        else_=0
+    )
@@ -0,0 +1,92 @@
+# app/services/dashboards.py
+
+from dateutil.relativedelta import relativedelta
+from sqlalchemy import and_, or_, case, func, select
+
+from app.models import Project, Tier2Seller
+from app.models.billing import ProjectBilling, Invoice
+from app.models.project import SubscriptionPlan
+from app.services.commissions import admin_commission_expr, tier1_commission_expr
+
+# The statements behind the admin / Tier-1 / Tier-2 dashboards when neither
+# the rollups nor the ledger are enabled. The routes execute them and
+# `flask explain_queries` EXPLAINs the very same statements.
+
+PENDING_STATUSES = ('pending', 'invoiced')
+
+
+def tier1_project_count(tier1_id):
+    """Direct projects of a Tier-1 seller (those without a Tier-2 seller)."""
+    return select(func.count(Project.id)).where(
+        Project.tier1_seller_id == tier1_id,
+        Project.tier2_seller_id.is_(None)
+    )
+
+
+def tier2_seller_count(tier1_id):
+    return select(func.count(Tier2Seller.id)).where(Tier2Seller.tier1_seller_id == tier1_id)
+
+
+def tier2_project_count(tier2_id):
+    return select(func.count(Project.id)).where(Project.tier2_seller_id == tier2_id)
+
+
+def admin_monthly_revenue(day):
+    """Admin commission on every bill paid in the month of `day`, summed in one query."""
+    # The paid_date range (rather than extract()) lets the database use an index.
+    this_month = day.replace(day=1)
+    return select(
+        func.coalesce(func.sum(admin_commission_expr()), 0)
+    ).select_from(Invoice).join(
+        ProjectBilling, ProjectBilling.id == Invoice.billing_record_id
+    ).join(
+        Project, ProjectBilling.project_id == Project.id
+    ).join(
+        SubscriptionPlan, Project.subscription_plan_id == SubscriptionPlan.id
+    ).where(
+        Invoice.paid_date >= this_month,
+        Invoice.paid_date < this_month + relativedelta(months=1),
+        Invoice.status == 'paid'
+    )
+
+
+def tier1_totals(tier1_id):
+    """
+    (revenue from Tier-2 projects, commission paid to admin, commission
+    pending to admin) in one pass. Tier-2 bills are those of the sellers this
+    Tier-1 manages (subquery, no id list); own bills are the Tier-1's
+    projects without a Tier-2 seller.
+    """
+    managed_tier2_ids = select(Tier2Seller.id).where(
+        Tier2Seller.tier1_seller_id == tier1_id
+    ).scalar_subquery()
+    tier2_bill = Project.tier2_seller_id.in_(managed_tier2_ids)
+    own_bill = and_(Project.tier1_seller_id == tier1_id, Project.tier2_seller_id.is_(None))
+    is_paid = ProjectBilling.status == 'paid'
+    is_pending = ProjectBilling.status.in_(PENDING_STATUSES)
+    admin_commission = admin_commission_expr()
+
+    return select(
+        func.coalesce(func.sum(case((and_(tier2_bill, is_paid), tier1_commission_expr()), else_=0)), 0),
+        func.coalesce(func.sum(case((is_paid, admin_commission), else_=0)), 0),
+        func.coalesce(func.sum(case((is_pending, admin_commission), else_=0)), 0)
+    ).select_from(ProjectBilling).join(
+        Project, ProjectBilling.project_id == Project.id
+    ).join(
+        SubscriptionPlan, Project.subscription_plan_id == SubscriptionPlan.id
+    ).where(
+        or_(own_bill, tier2_bill)
+    )
+
+
+def tier2_totals(tier2_id):
+    """(Tier-1 commission paid, Tier-1 commission pending) on a Tier-2 seller's bills."""
+    tier1_commission = tier1_commission_expr()
+    return select(
+        func.coalesce(func.sum(case((ProjectBilling.status == 'paid', tier1_commission), else_=0)), 0),
+        func.coalesce(func.sum(case((ProjectBilling.status.in_(PENDING_STATUSES), tier1_commission), else_=0)), 0)
+    ).select_from(ProjectBilling).join(
+        Project, ProjectBilling.project_id == Project.id
+    ).join(
+        SubscriptionPlan, Project.subscription_plan_id == SubscriptionPlan.id
+    ).where(Project.tier2_seller_id == tier2_id)
@@ -0,0 +1,206 @@
+# app/services/exports.py
+
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+import csv
+import io
+import json
+import zlib
+
+from sqlalchemy import or_, select
+
+from app import db
+from app.database_engine import set_statement_timeout
+from app.models import Project, Tier1Seller, Tier2Seller
+from app.models.project import SubscriptionPlan
+from app.models.billing import ProjectBilling, Invoice
+
+# Rows fetched from the server-side cursor per round-trip, and rows per output chunk
+# (one CSV/NDJSON chunk or one Parquet row group).
+EXPORT_BATCH_SIZE = 5000
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+# (output column, SQL expression, Parquet type name)
+EXPORT_COLUMNS = [
+    ('bill_id', ProjectBilling.id, 'string'),
+    ('bill_status', ProjectBilling.status, 'string'),
+    ('billing_type', ProjectBilling.billing_type, 'string'),
+    ('amount', ProjectBilling.amount, 'money'),
+    ('bill_due_date', ProjectBilling.due_date, 'date'),
+    ('bill_created_at', ProjectBilling.created_at, 'timestamp'),
+    ('project_id', Project.id, 'string'),
+    ('project_name', Project.name, 'string'),
+    ('tier1_seller_id', Project.tier1_seller_id, 'string'),
+    ('tier1_seller_name', Tier1Seller.name, 'string'),
+    ('tier2_seller_id', Project.tier2_seller_id, 'string'),
+    ('tier2_seller_name', Tier2Seller.name, 'string'),
+    ('plan_id', SubscriptionPlan.id, 'string'),
+    ('plan_name', SubscriptionPlan.name, 'string'),
+    ('plan_price', SubscriptionPlan.price, 'money'),
+    ('admin_commission_pct', SubscriptionPlan.admin_commission_pct, 'percent'),
+    ('tier1_commission_pct', SubscriptionPlan.tier1_commission_pct, 'percent'),
+    ('invoice_id', Invoice.id, 'string'),
+    ('invoice_number', Invoice.invoice_number, 'string'),
+    ('invoice_status', Invoice.status, 'string'),
+    ('invoice_total', Invoice.total_amount, 'money'),
+    ('issue_date', Invoice.issue_date, 'date'),
+    ('invoice_due_date', Invoice.due_date, 'date'),
+    ('paid_date', Invoice.paid_date, 'date'),
+]
+
+
+class ExportError(ValueError):
+    """The requested export cannot be produced (unknown format, missing optional dependency)."""
+
+
+def export_statement(date_from=None, date_to=None, statuses=None, seller_id=None):
+    """
+    SELECT of every bill with its invoice, project, sellers and plan, ordered
+    by bill id. Filters match /api/billing/revenue: bill creation date range,
+    bill statuses and a Tier-1 or Tier-2 seller id.
+    """
+    stmt = select(
+        *(expr.label(name) for name, expr, _ in EXPORT_COLUMNS)
+    ).select_from(ProjectBilling).join(
+        Project, ProjectBilling.project_id == Project.id
+    ).outerjoin(
+        SubscriptionPlan, Project.subscription_plan_id == SubscriptionPlan.id
+    ).outerjoin(
+        Tier1Seller, Project.tier1_seller_id == Tier1Seller.id
+    ).outerjoin(
+        Tier2Seller, Project.tier2_seller_id == Tier2Seller.id
+    ).outerjoin(
+        Invoice, Invoice.billing_record_id == ProjectBilling.id
+    )
+
+    if date_from:
+        stmt = stmt.where(ProjectBilling.created_at >= date_from)
+    if date_to:
+        stmt = stmt.where(ProjectBilling.created_at < date_to + timedelta(days=1))
+    if statuses:
+        stmt = stmt.where(ProjectBilling.status.in_(statuses))
+    if seller_id:
+        stmt = stmt.where(or_(Project.tier1_seller_id == seller_id, Project.tier2_seller_id == seller_id))
+    return stmt.order_by(ProjectBilling.id)
+
+
+def iter_batches(stmt, batch_size=EXPORT_BATCH_SIZE):
+    """Lists of row tuples, read through a server-side cursor `batch_size` rows at a time."""
+    stmt = stmt.execution_options(yield_per=batch_size)
+    set_statement_timeout('export', clause=stmt)
+    result = db.session.execute(stmt)
+    for partition in result.partitions():
+        yield partition
+
+
+# ---------------- ENCODERS ----------------
+def _text(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def _csv_chunks(batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([name for name, _, _ in EXPORT_COLUMNS])
+    for rows in batches:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def _ndjson_chunks(batches):
+    names = [name for name, _, _ in EXPORT_COLUMNS]
+    for rows in batches:
+        yield ''.join(
+            json.dumps({name: _text(value) for name, value in zip(names, row)}) + '\n' for row in rows
+        ).encode()
+
+
+class _ChunkSink:
+    """Write-only file object collecting what the Parquet writer produces until it is drained."""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _parquet_chunks(batches):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ExportError('Parquet export requires the optional pyarrow package (pip install pyarrow)')
+
+    types = {
+        'string': pa.string(),
+        'money': pa.decimal128(14, 2),
+        'percent': pa.decimal128(5, 2),
+        'date': pa.date32(),
+        'timestamp': pa.timestamp('us'),
+    }
+    schema = pa.schema([(name, types[kind]) for name, _, kind in EXPORT_COLUMNS])
+
+    def generate():
+        sink = _ChunkSink()
+        with pq.ParquetWriter(pa.PythonFile(sink, mode='w'), schema, compression='snappy') as writer:
+            for rows in batches:
+                columns = list(zip(*rows)) if rows else [[] for _ in EXPORT_COLUMNS]
+                writer.write_table(pa.Table.from_arrays(
+                    [pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+                    schema=schema
+                ))
+                yield sink.drain()
+        yield sink.drain()
+
+    return generate()
+
+
+def _gzip_chunks(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_chunks(fmt, batches, compress=False):
+    """Encodes row batches as `fmt` ('csv', 'ndjson' or 'parquet'), one bytes chunk per batch."""
+    encoders = {'csv': _csv_chunks, 'ndjson': _ndjson_chunks, 'parquet': _parquet_chunks}
+    if fmt not in encoders:
+        raise ExportError(f"Unknown export format '{fmt}'; use one of {', '.join(EXPORT_FORMATS)}")
+    chunks = encoders[fmt](batches)
+    return _gzip_chunks(chunks) if compress else chunks
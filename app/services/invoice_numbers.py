@@ -0,0 +1,68 @@
+# app/services/invoice_numbers.py
+
+from datetime import date, datetime
+
+from sqlalchemy import insert, update
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.models.billing import InvoiceSequence
+
+# Zero-padded width of the sequence part, so numbers sort in creation order.
+SEQUENCE_WIDTH = 8
+
+
+def invoice_period(day=None):
+    """Sequence key for the billing period a day falls in, e.g. '202610'."""
+    return (day or date.today()).strftime('%Y%m')
+
+
+def format_invoice_number(period, value):
+    return f"INV-{period}-{value:0{SEQUENCE_WIDTH}d}"
+
+
+def _reserve(conn, period, count):
+    """Bumps the period's counter by `count` and returns the first reserved value."""
+    new_next = conn.execute(
+        update(InvoiceSequence)
+        .where(InvoiceSequence.period == period)
+        .values(next_value=InvoiceSequence.next_value + count, updated_at=datetime.utcnow())
+        .returning(InvoiceSequence.next_value)
+    ).scalar()
+    if new_next is not None:
+        return new_next - count
+
+    # First invoice of the period: create its counter. Another process may
+    # have created it concurrently, in which case we bump that one instead.
+    try:
+        with conn.begin_nested():
+            conn.execute(
+                insert(InvoiceSequence).values(period=period, next_value=count + 1, updated_at=datetime.utcnow())
+            )
+        return 1
+    except IntegrityError:
+        return _reserve(conn, period, count)
+
+
+def allocate_invoice_numbers(count, period=None):
+    """
+    Reserves `count` consecutive invoice numbers for a period with a single
+    round-trip and returns them in order, e.g. ['INV-202610-00000042', ...].
+
+    The reservation commits in its own short transaction, so the counter row
+    is never locked for the duration of the caller's work. Numbers reserved by
+    a caller that later rolls back are skipped, never reused.
+    """
+    if count <= 0:
+        return []
+    period = period or invoice_period()
+
+    with db.engine.begin() as conn:
+        first = _reserve(conn, period, count)
+
+    return [format_invoice_number(period, value) for value in range(first, first + count)]
+
+
+def next_invoice_number(period=None):
+    """Reserves a single invoice number."""
+    return allocate_invoice_numbers(1, period)[0]
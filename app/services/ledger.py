@@ -0,0 +1,226 @@
+# app/services/ledger.py
+
+from datetime import date, datetime
+from decimal import Decimal
+import uuid
+
+from flask import current_app
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import selectinload
+
+from app import db
+from app.database_engine import upsert_insert
+from app.models.billing import Invoice
+from app.models.ledger import CommissionLedgerEntry, CommissionBalance
+from app.models.project import Project
+from app.services.commissions import bill_commissions
+
+BALANCE_KEY = ('account_type', 'account_id', 'currency', 'month')
+
+
+def _cents(amount):
+    return int(Decimal(amount) * 100)
+
+
+def _to_units(cents):
+    return Decimal(int(cents or 0)) / 100
+
+
+def posting_legs(invoice, project):
+    """
+    The balanced legs [(account_type, account_id, entry_type, amount_in_cents)]
+    for a paid invoice, from the amounts recorded in invoice.transfer_data at
+    payment time (falling back to the plan percentages for invoices settled
+    without a PaymentIntent):
+    - Tier-1 project: the Tier-1 seller pays the admin its commission.
+    - Tier-2 project: the Tier-2 seller pays the Tier-1 seller its commission,
+      and the Tier-1 seller passes the admin's share on.
+    """
+    transfer_info = getattr(invoice, 'transfer_data', None) or {}
+    tier1_id = project.tier1_seller_id or (project.tier2_seller.tier1_seller_id if project.tier2_seller else '')
+
+    if transfer_info:
+        admin_amount = int(transfer_info.get('admin_amount', 0))
+        tier1_commission = int(transfer_info.get('tier1_amount', 0)) + admin_amount
+    else:
+        plan = project.subscription_plan
+        if not plan:
+            return []
+        admin_commission, tier1_commission = bill_commissions(
+            invoice.total_amount, plan.admin_commission_pct, plan.tier1_commission_pct,
+            project.tier1_seller_id, project.tier2_seller_id
+        )
+        admin_amount, tier1_commission = _cents(admin_commission), _cents(tier1_commission)
+
+    if project.tier2_seller_id:
+        legs = [
+            ('tier2_seller', project.tier2_seller_id, 'tier1_commission', -tier1_commission),
+            ('tier1_seller', tier1_id or '', 'tier1_commission', tier1_commission),
+            ('tier1_seller', tier1_id or '', 'admin_share', -admin_amount),
+            ('admin', '', 'admin_share', admin_amount),
+        ]
+    else:
+        legs = [
+            ('tier1_seller', tier1_id or '', 'admin_commission', -admin_amount),
+            ('admin', '', 'admin_commission', admin_amount),
+        ]
+    return [leg for leg in legs if leg[3]]
+
+
+def _apply_balances(conn, rows):
+    """Adds the posted legs to commission_balances with one upsert."""
+    totals = {}
+    for row in rows:
+        key = tuple(row[name] for name in BALANCE_KEY)
+        credits, debits, count = totals.get(key, (0, 0, 0))
+        amount = row['amount']
+        totals[key] = (credits + max(amount, 0), debits + max(-amount, 0), count + 1)
+    if not totals:
+        return
+
+    table = CommissionBalance.__table__
+    stmt = upsert_insert(conn.dialect.name)(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(BALANCE_KEY),
+        set_={
+            'credits': table.c.credits + stmt.excluded.credits,
+            'debits': table.c.debits + stmt.excluded.debits,
+            'entry_count': table.c.entry_count + stmt.excluded.entry_count,
+            'updated_at': stmt.excluded.updated_at
+        }
+    )
+    now = datetime.utcnow()
+    conn.execute(stmt, [
+        dict(zip(BALANCE_KEY, key), credits=credits, debits=debits, entry_count=count, updated_at=now)
+        for key, (credits, debits, count) in totals.items()
+    ])
+
+
+def _entry_rows(invoice, project, currency):
+    month = (invoice.paid_date or date.today()).replace(day=1)
+    now = datetime.utcnow()
+    return [
+        {
+            'id': str(uuid.uuid4()),
+            'invoice_id': invoice.id,
+            'leg': leg,
+            'account_type': account_type,
+            'account_id': account_id,
+            'entry_type': entry_type,
+            'amount': amount,
+            'currency': currency,
+            'month': month,
+            'created_at': now
+        }
+        for leg, (account_type, account_id, entry_type, amount) in enumerate(posting_legs(invoice, project))
+    ]
+
+
+def record_invoice_payment(invoice, project, currency=None):
+    """
+    Posts the commission legs of a just-paid invoice and updates the account
+    balances, in the caller's transaction. Call once per invoice, when its
+    status turns 'paid'.
+    """
+    rows = _entry_rows(invoice, project, currency or current_app.config.get('STRIPE_CURRENCY', 'usd'))
+    if not rows:
+        return
+    db.session.execute(insert(CommissionLedgerEntry), rows)
+    _apply_balances(db.session.connection(), rows)
+
+
+# ---------------- BACKFILL ----------------
+def backfill_ledger(batch_size=1000):
+    """
+    Posts every paid invoice that has no ledger entries yet, then recomputes
+    the balances from the entries. Needed once before enabling
+    COMMISSION_LEDGER_ENABLED; existing entries are never touched. Invoices
+    are posted in chunks of `batch_size` keyed by invoice id, each committed
+    on its own, so an interrupted backfill keeps its progress and is simply
+    run again.
+    """
+    posted = select(CommissionLedgerEntry.invoice_id).distinct()
+    currency = current_app.config.get('STRIPE_CURRENCY', 'usd')
+    count = 0
+    last_id = ''
+
+    while True:
+        invoices = db.session.scalars(
+            select(Invoice).options(
+                selectinload(Invoice.project).selectinload(Project.tier2_seller),
+                selectinload(Invoice.project).selectinload(Project.subscription_plan)
+            ).where(
+                Invoice.status == 'paid',
+                Invoice.id > last_id,
+                Invoice.id.notin_(posted)
+            ).order_by(Invoice.id).limit(batch_size)
+        ).all()
+        if not invoices:
+            break
+
+        rows = []
+        for invoice in invoices:
+            if invoice.project is None:
+                continue
+            invoice_rows = _entry_rows(invoice, invoice.project, currency)
+            if invoice_rows:
+                rows.extend(invoice_rows)
+                count += 1
+        if rows:
+            db.session.execute(insert(CommissionLedgerEntry), rows)
+        last_id = invoices[-1].id
+        db.session.commit()
+
+    rebuilt = rebuild_balances()
+    return {'invoices_posted': count, 'balance_rows': rebuilt}
+
+
+def rebuild_balances():
+    """Recomputes commission_balances from the ledger entries; returns the number of balance rows."""
+    rows = db.session.query(
+        CommissionLedgerEntry.account_type,
+        CommissionLedgerEntry.account_id,
+        CommissionLedgerEntry.currency,
+        CommissionLedgerEntry.month,
+        func.sum(CommissionLedgerEntry.amount).filter(CommissionLedgerEntry.amount > 0),
+        -func.sum(CommissionLedgerEntry.amount).filter(CommissionLedgerEntry.amount < 0),
+        func.count(CommissionLedgerEntry.id)
+    ).group_by(
+        CommissionLedgerEntry.account_type,
+        CommissionLedgerEntry.account_id,
+        CommissionLedgerEntry.currency,
+        CommissionLedgerEntry.month
+    ).all()
+
+    db.session.query(CommissionBalance).delete(synchronize_session=False)
+    now = datetime.utcnow()
+    if rows:
+        db.session.execute(insert(CommissionBalance), [
+            {
+                'account_type': account_type, 'account_id': account_id, 'currency': currency, 'month': month,
+                'credits': int(credits or 0), 'debits': int(debits or 0), 'entry_count': count, 'updated_at': now
+            }
+            for account_type, account_id, currency, month, credits, debits, count in rows
+        ])
+    db.session.commit()
+    return len(rows)
+
+
+# ---------------- READS ----------------
+def account_totals_stmt(account_type, account_id='', month=None):
+    stmt = select(
+        func.coalesce(func.sum(CommissionBalance.credits), 0),
+        func.coalesce(func.sum(CommissionBalance.debits), 0)
+    ).where(
+        CommissionBalance.account_type == account_type,
+        CommissionBalance.account_id == account_id
+    )
+    if month is not None:
+        stmt = stmt.where(CommissionBalance.month == month.replace(day=1))
+    return stmt
+
+
+def account_totals(account_type, account_id='', month=None):
+    """(credits, debits) of one account in currency units, over all months or for the month of `month`."""
+    credits, debits = db.session.execute(account_totals_stmt(account_type, account_id, month)).one()
+    return _to_units(credits), _to_units(debits)
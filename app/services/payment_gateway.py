@@ -0,0 +1,349 @@
+# app/services/payment_gateway.py
+
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import hmac
+import json
+import random
+import threading
+import time
+import urllib.request
+import uuid
+
+import requests
+import stripe
+from flask import current_app
+
+
+class PaymentGatewayError(Exception):
+    """A call to the payment provider failed."""
+
+
+class GatewayBusyError(PaymentGatewayError):
+    """Every slot of the gateway's executor is taken; the caller should retry later."""
+
+
+class WebhookSignatureError(ValueError):
+    """A webhook payload is malformed or its signature does not verify."""
+
+
+# PaymentIntent statuses in which the customer can still complete the payment,
+# so an existing intent is handed out again instead of creating a new one.
+REUSABLE_INTENT_STATUSES = ('requires_payment_method', 'requires_confirmation', 'requires_action', 'processing')
+# Statuses in which an intent for an outdated amount is cancelled before a new one is
+# created; an invoice never has two intents the customer could pay.
+CANCELABLE_INTENT_STATUSES = ('requires_payment_method', 'requires_confirmation', 'requires_action')
+
+
+class BoundedExecutor:
+    """
+    Thread pool for provider calls with a hard cap on in-flight plus queued
+    calls. When the cap is reached submit() fails fast with GatewayBusyError
+    instead of piling up request threads behind a slow provider.
+    """
+
+    def __init__(self, workers, queue_size):
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='payment-gateway')
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+
+    def submit(self, fn, *args, **kwargs):
+        if not self._slots.acquire(blocking=False):
+            raise GatewayBusyError('Payment gateway is busy, please retry')
+        try:
+            future = self._pool.submit(fn, *args, **kwargs)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def run(self, timeout, fn, *args, **kwargs):
+        """Runs `fn` on the pool and waits at most `timeout` seconds for its result."""
+        return self.submit(fn, *args, **kwargs).result(timeout=timeout)
+
+
+class PaymentGateway:
+    """
+    The payment operations the billing routes need. PaymentIntents are
+    returned as dicts with at least 'id', 'client_secret' and 'status';
+    webhook events as the provider's event dict.
+    """
+
+    def create_payment_intent(self, amount, currency, description, metadata, transfer_group=None,
+                              idempotency_key=None):
+        raise NotImplementedError
+
+    def retrieve_payment_intent(self, intent_id):
+        raise NotImplementedError
+
+    def cancel_payment_intent(self, intent_id):
+        raise NotImplementedError
+
+    def create_transfer(self, amount, currency, destination, source_transaction=None, transfer_group=None,
+                        idempotency_key=None):
+        raise NotImplementedError
+
+    def construct_event(self, payload, sig_header):
+        raise NotImplementedError
+
+
+# ---------------- STRIPE ----------------
+class StripeGateway(PaymentGateway):
+    """
+    Stripe through one StripeClient per process, sharing a keep-alive
+    connection pool of `pool_size` connections instead of the global,
+    per-call configured `stripe` module.
+    """
+
+    def __init__(self, secret_key, webhook_secret, pool_size=10, timeout=20, max_network_retries=2):
+        self.webhook_secret = webhook_secret
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        session.mount('https://', adapter)
+        self.client = stripe.StripeClient(
+            secret_key,
+            http_client=stripe.RequestsClient(timeout=timeout, session=session),
+            max_network_retries=max_network_retries
+        )
+
+    @staticmethod
+    def _options(idempotency_key):
+        return {'idempotency_key': idempotency_key} if idempotency_key else None
+
+    def create_payment_intent(self, amount, currency, description, metadata, transfer_group=None,
+                              idempotency_key=None):
+        params = {
+            'amount': amount,
+            'currency': currency,
+            'payment_method_types': ['card'],
+            'description': description,
+            'metadata': metadata
+        }
+        if transfer_group:
+            params['transfer_group'] = transfer_group
+        return self.client.v1.payment_intents.create(params, self._options(idempotency_key))
+
+    def retrieve_payment_intent(self, intent_id):
+        return self.client.v1.payment_intents.retrieve(intent_id)
+
+    def cancel_payment_intent(self, intent_id):
+        return self.client.v1.payment_intents.cancel(intent_id)
+
+    def create_transfer(self, amount, currency, destination, source_transaction=None, transfer_group=None,
+                        idempotency_key=None):
+        params = {'amount': amount, 'currency': currency, 'destination': destination}
+        if source_transaction:
+            params['source_transaction'] = source_transaction
+        if transfer_group:
+            params['transfer_group'] = transfer_group
+        return self.client.v1.transfers.create(params, self._options(idempotency_key))
+
+    def construct_event(self, payload, sig_header):
+        try:
+            stripe.Webhook.construct_event(payload, sig_header, self.webhook_secret)
+        except (ValueError, stripe.error.SignatureVerificationError) as e:
+            raise WebhookSignatureError(str(e))
+        return json.loads(payload)
+
+
+# ---------------- IN-PROCESS FAKE ----------------
+def sign_payload(payload, secret, timestamp=None):
+    """Stripe-Signature header value for `payload` (same scheme as Stripe)."""
+    timestamp = int(timestamp or time.time())
+    signature = hmac.new(secret.encode(), f"{timestamp}.{payload}".encode(), hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={signature}"
+
+
+class FakeGateway(PaymentGateway):
+    """
+    Stand-in for Stripe for local development and load tests. Every call
+    sleeps `latency_ms`, fails with probability `failure_rate`, and each
+    PaymentIntent is followed `webhook_delay_ms` later by a signed
+    payment_intent.succeeded event (payment_intent.payment_failed with
+    probability `decline_rate`). Events are POSTed to `webhook_url` when set,
+    otherwise stored straight into the webhook inbox of `app`.
+    """
+
+    def __init__(self, app, webhook_secret, latency_ms=0, failure_rate=0.0, decline_rate=0.0,
+                 webhook_delay_ms=0, webhook_url=None, seed=None):
+        self.app = app
+        self.webhook_secret = webhook_secret or 'whsec_fake'
+        self.latency_ms = latency_ms
+        self.failure_rate = failure_rate
+        self.decline_rate = decline_rate
+        self.webhook_delay_ms = webhook_delay_ms
+        self.webhook_url = webhook_url
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._intents = {}
+        self._idempotent_results = {}
+        self.stats = {'payment_intents': 0, 'retrievals': 0, 'cancellations': 0, 'transfers': 0, 'failures': 0,
+                      'webhooks_sent': 0}
+
+    def _call(self, name):
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        with self._lock:
+            failed = self._random.random() < self.failure_rate
+            self.stats['failures' if failed else name] += 1
+        if failed:
+            raise PaymentGatewayError(f"Simulated {name} failure")
+
+    def create_payment_intent(self, amount, currency, description, metadata, transfer_group=None,
+                              idempotency_key=None):
+        with self._lock:
+            if idempotency_key in self._idempotent_results:
+                return self._idempotent_results[idempotency_key]
+        self._call('payment_intents')
+        intent_id = f"pi_fake_{uuid.uuid4().hex[:24]}"
+        intent = {
+            'id': intent_id,
+            'object': 'payment_intent',
+            'client_secret': f"{intent_id}_secret_{uuid.uuid4().hex[:16]}",
+            'status': 'requires_payment_method',
+            'amount': amount,
+            'currency': currency,
+            'description': description,
+            'metadata': dict(metadata),
+            'transfer_group': transfer_group,
+            'latest_charge': f"ch_fake_{uuid.uuid4().hex[:24]}"
+        }
+        with self._lock:
+            declined = self._random.random() < self.decline_rate
+            self._intents[intent_id] = intent
+            if idempotency_key:
+                self._idempotent_results[idempotency_key] = intent
+        timer = threading.Timer(self.webhook_delay_ms / 1000, self._send_webhook, args=(intent, declined))
+        timer.daemon = True
+        timer.start()
+        return intent
+
+    def retrieve_payment_intent(self, intent_id):
+        self._call('retrievals')
+        with self._lock:
+            intent = self._intents.get(intent_id)
+        if intent is None:
+            raise PaymentGatewayError(f"No such payment_intent: {intent_id}")
+        return intent
+
+    def cancel_payment_intent(self, intent_id):
+        self._call('cancellations')
+        with self._lock:
+            intent = self._intents.get(intent_id)
+            if intent is None:
+                raise PaymentGatewayError(f"No such payment_intent: {intent_id}")
+            intent = self._intents[intent_id] = dict(intent, status='canceled')
+        return intent
+
+    def create_transfer(self, amount, currency, destination, source_transaction=None, transfer_group=None,
+                        idempotency_key=None):
+        with self._lock:
+            if idempotency_key in self._idempotent_results:
+                return self._idempotent_results[idempotency_key]
+        self._call('transfers')
+        transfer = {
+            'id': f"tr_fake_{uuid.uuid4().hex[:24]}",
+            'object': 'transfer',
+            'amount': amount,
+            'currency': currency,
+            'destination': destination,
+            'source_transaction': source_transaction,
+            'transfer_group': transfer_group
+        }
+        if idempotency_key:
+            with self._lock:
+                self._idempotent_results[idempotency_key] = transfer
+        return transfer
+
+    def construct_event(self, payload, sig_header):
+        try:
+            parts = dict(item.split('=', 1) for item in (sig_header or '').split(','))
+            expected = sign_payload(payload, self.webhook_secret, parts['t'])
+        except (ValueError, KeyError):
+            raise WebhookSignatureError('Malformed signature header')
+        if not hmac.compare_digest(expected, sig_header):
+            raise WebhookSignatureError('Signature does not match the payload')
+        try:
+            return json.loads(payload)
+        except ValueError as e:
+            raise WebhookSignatureError(str(e))
+
+    def _send_webhook(self, intent, declined):
+        intent = dict(intent, status='requires_payment_method' if declined else 'succeeded')
+        with self._lock:
+            self._intents[intent['id']] = intent
+        event = {
+            'id': f"evt_fake_{uuid.uuid4().hex[:24]}",
+            'object': 'event',
+            'type': 'payment_intent.payment_failed' if declined else 'payment_intent.succeeded',
+            'created': int(time.time()),
+            'data': {'object': intent}
+        }
+        try:
+            if self.webhook_url:
+                payload = json.dumps(event)
+                request = urllib.request.Request(self.webhook_url, data=payload.encode(), method='POST', headers={
+                    'Content-Type': 'application/json',
+                    'Stripe-Signature': sign_payload(payload, self.webhook_secret)
+                })
+                urllib.request.urlopen(request, timeout=10).close()
+            else:
+                from app import db
+                from app.services.stripe_events import record_event
+                with self.app.app_context():
+                    try:
+                        record_event(event)
+                    finally:
+                        db.session.remove()
+            with self._lock:
+                self.stats['webhooks_sent'] += 1
+        except Exception as e:
+            print(f"Fake gateway could not deliver {event['type']} for {intent['id']}: {str(e)}")
+
+
+# ---------------- FACTORY ----------------
+def get_gateway():
+    """The payment gateway configured by PAYMENT_GATEWAY ('stripe' or 'fake'), one per app."""
+    app = current_app._get_current_object()
+    gateway = app.extensions.get('payment_gateway')
+    if gateway is None:
+        config = app.config
+        if config['PAYMENT_GATEWAY'] == 'fake':
+            gateway = FakeGateway(
+                app,
+                config['STRIPE_WEBHOOK_SECRET'],
+                latency_ms=config['PAYMENT_FAKE_LATENCY_MS'],
+                failure_rate=config['PAYMENT_FAKE_FAILURE_RATE'],
+                decline_rate=config['PAYMENT_FAKE_DECLINE_RATE'],
+                webhook_delay_ms=config['PAYMENT_FAKE_WEBHOOK_DELAY_MS'],
+                webhook_url=config['PAYMENT_FAKE_WEBHOOK_URL']
+            )
+        elif config['PAYMENT_GATEWAY'] == 'stripe':
+            gateway = StripeGateway(
+                config['STRIPE_SECRET_KEY'],
+                config['STRIPE_WEBHOOK_SECRET'],
+                pool_size=config['PAYMENT_EXECUTOR_WORKERS'],
+                timeout=config['PAYMENT_CALL_TIMEOUT']
+            )
+        else:
+            raise ValueError(f"Unknown PAYMENT_GATEWAY: {config['PAYMENT_GATEWAY']}")
+        app.extensions['payment_gateway'] = gateway
+    return gateway
+
+
+def get_executor():
+    """The bounded executor payment calls made from request handlers run on, one per app."""
+    app = current_app._get_current_object()
+    executor = app.extensions.get('payment_executor')
+    if executor is None:
+        executor = BoundedExecutor(app.config['PAYMENT_EXECUTOR_WORKERS'], app.config['PAYMENT_EXECUTOR_QUEUE'])
+        app.extensions['payment_executor'] = executor
+    return executor
+
+
+def intent_idempotency_key(invoice_id, role, amount, previous_intent_id=None):
+    """
+    Idempotency key for an invoice's PaymentIntent. Retries and double clicks
+    map to the same key; a changed amount or replacing a dead intent does not.
+    """
+    return f"invoice-{invoice_id}-{role}-{amount}-{previous_intent_id or 'new'}"
@@ -0,0 +1,321 @@
+# app/services/rollups.py
+
+from datetime import date, datetime
+from decimal import Decimal
+import uuid
+
+from sqlalchemy import case, delete, event, func, inspect, select, or_
+
+from app import db
+from app.database_engine import upsert_insert
+from app.models import Project, Tier2Seller
+from app.models.project import SubscriptionPlan
+from app.models.billing import ProjectBilling, Invoice, RevenueRollup, RevenueRollupPosting
+from app.services.commissions import bill_commissions
+
+ROLLUP_KEY = ('tier1_seller_id', 'tier2_seller_id', 'plan_id', 'month', 'status')
+ROLLUP_TOTALS = ('bill_count', 'amount', 'admin_commission', 'tier1_commission')
+POSTING_AMOUNTS = ('amount', 'admin_commission', 'tier1_commission')
+
+PENDING_STATUSES = ('pending', 'invoiced')
+
+_listeners_registered = False
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def bill_posting(status, month, amount, tier1_seller_id, tier2_seller_id,
+                 plan_id=None, price=None, admin_pct=None, tier1_pct=None):
+    """The rollup key and amounts one bill contributes to revenue_rollups."""
+    admin_commission, tier1_commission = bill_commissions(
+        price, admin_pct, tier1_pct, tier1_seller_id, tier2_seller_id
+    )
+    return {
+        'tier1_seller_id': tier1_seller_id or '',
+        'tier2_seller_id': tier2_seller_id or '',
+        'plan_id': plan_id or '',
+        'month': month,
+        'status': status,
+        'amount': Decimal(amount or 0),
+        'admin_commission': admin_commission,
+        'tier1_commission': tier1_commission
+    }
+
+
+def add_posting(deltas, posting, sign):
+    """Adds (sign=1) or removes (sign=-1) one bill's posting to the pending rollup deltas."""
+    key = tuple(posting[name] for name in ROLLUP_KEY)
+    totals = deltas.setdefault(key, [0, Decimal('0'), Decimal('0'), Decimal('0')])
+    totals[0] += sign
+    for index, name in enumerate(POSTING_AMOUNTS, start=1):
+        totals[index] += sign * Decimal(posting[name])
+
+
+def apply_deltas(conn, deltas):
+    """Upserts the accumulated deltas into revenue_rollups on `conn`."""
+    rows = [
+        dict(zip(ROLLUP_KEY, key), **dict(zip(ROLLUP_TOTALS, totals)), updated_at=datetime.utcnow())
+        for key, totals in deltas.items() if any(totals)
+    ]
+    if not rows:
+        return
+
+    table = RevenueRollup.__table__
+    stmt = upsert_insert(conn.dialect.name)(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(ROLLUP_KEY),
+        set_={
+            **{name: table.c[name] + stmt.excluded[name] for name in ROLLUP_TOTALS},
+            'updated_at': stmt.excluded.updated_at
+        }
+    )
+    conn.execute(stmt, rows)
+
+
+class RollupChanges:
+    """
+    The rollup changes of one flush or bulk write, kept per bill. post()
+    records what a bill contributes now; reverse() subtracts what it
+    contributed before, read back from revenue_rollup_postings. `fallback` is
+    only used for bills posted before postings were stored (until the next
+    rebuild_rollups).
+    """
+
+    def __init__(self):
+        self.deltas = {}
+        self.postings = {}
+        self.reversals = {}
+        self.removed = set()
+
+    def __bool__(self):
+        return bool(self.postings or self.reversals)
+
+    def post(self, bill_id, posting):
+        self.postings[bill_id] = posting
+        add_posting(self.deltas, posting, 1)
+
+    def reverse(self, bill_id, fallback, remove=False):
+        self.reversals.setdefault(bill_id, fallback)
+        if remove:
+            self.removed.add(bill_id)
+
+    def apply(self, conn):
+        """Writes the rollup deltas and the bills' postings on `conn`."""
+        table = RevenueRollupPosting.__table__
+        if self.reversals:
+            stored = {
+                row.bill_id: row._mapping
+                for row in conn.execute(select(table).where(table.c.bill_id.in_(list(self.reversals))))
+            }
+            for bill_id, fallback in self.reversals.items():
+                add_posting(self.deltas, stored.get(bill_id, fallback), -1)
+        apply_deltas(conn, self.deltas)
+
+        if self.removed:
+            conn.execute(delete(table).where(table.c.bill_id.in_(list(self.removed))))
+        if self.postings:
+            now = datetime.utcnow()
+            stmt = upsert_insert(conn.dialect.name)(table)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['bill_id'],
+                set_={name: stmt.excluded[name] for name in ROLLUP_KEY + POSTING_AMOUNTS + ('updated_at',)}
+            )
+            conn.execute(stmt, [
+                dict(posting, bill_id=bill_id, updated_at=now) for bill_id, posting in self.postings.items()
+            ])
+
+
+# ---------------- INCREMENTAL MAINTENANCE (ORM) ----------------
+def _bill_month(bill, status, paid_date=None):
+    paid_date = paid_date or (bill.invoice.paid_date if bill.invoice is not None else None)
+    if status == 'paid' and paid_date:
+        return month_start(paid_date)
+    return month_start((bill.created_at or datetime.utcnow()).date())
+
+
+def _orm_posting(session, bill, status, paid_date=None):
+    project = session.get(Project, bill.project_id) if bill.project_id else None
+    if project is None:
+        return None
+    plan = project.subscription_plan
+    return bill_posting(
+        status or 'pending', _bill_month(bill, status, paid_date), bill.amount,
+        project.tier1_seller_id, project.tier2_seller_id,
+        plan.id if plan else None,
+        plan.price if plan else None,
+        plan.admin_commission_pct if plan else None,
+        plan.tier1_commission_pct if plan else None
+    )
+
+
+def _repost(session, changes, bill, old_status, old_paid_date=None):
+    fallback = _orm_posting(session, bill, old_status, old_paid_date)
+    if fallback is not None:
+        changes.reverse(bill.id, fallback)
+    posting = _orm_posting(session, bill, bill.status)
+    if posting is not None:
+        changes.post(bill.id, posting)
+
+
+def _before_flush(session, flush_context, instances):
+    changes = session.info.setdefault('revenue_rollup_changes', RollupChanges())
+    reposted = set()
+    with session.no_autoflush:
+        for obj in session.new:
+            if isinstance(obj, ProjectBilling):
+                if obj.id is None:
+                    # The posting is keyed by the bill id, so assign it before the INSERT
+                    obj.id = str(uuid.uuid4())
+                posting = _orm_posting(session, obj, obj.status)
+                if posting is not None:
+                    changes.post(obj.id, posting)
+
+        for obj in session.deleted:
+            if isinstance(obj, ProjectBilling):
+                history = inspect(obj).attrs.status.history
+                old_status = history.deleted[0] if history.deleted else obj.status
+                fallback = _orm_posting(session, obj, old_status)
+                if fallback is not None:
+                    changes.reverse(obj.id, fallback, remove=True)
+
+        for obj in session.dirty:
+            if isinstance(obj, ProjectBilling):
+                history = inspect(obj).attrs.status.history
+                if history.deleted and history.deleted[0] != obj.status:
+                    _repost(session, changes, obj, history.deleted[0])
+                    reposted.add(obj.id)
+
+        # A corrected paid_date moves a paid bill to another month
+        for obj in session.dirty:
+            if isinstance(obj, Invoice) and obj.billing_record_id not in reposted:
+                history = inspect(obj).attrs.paid_date.history
+                bill = obj.billing_record
+                if history.deleted and bill is not None and bill.status == 'paid' and bill not in session.deleted:
+                    _repost(session, changes, bill, bill.status, history.deleted[0])
+                    reposted.add(bill.id)
+
+
+def _after_flush(session, flush_context):
+    changes = session.info.pop('revenue_rollup_changes', None)
+    if changes:
+        changes.apply(session.connection())
+
+
+def _after_rollback(session):
+    session.info.pop('revenue_rollup_changes', None)
+
+
+def register_listeners():
+    """Keeps the rollups in step with every bill written through the ORM session."""
+    global _listeners_registered
+    if _listeners_registered:
+        return
+    event.listen(db.session, 'before_flush', _before_flush)
+    event.listen(db.session, 'after_flush', _after_flush)
+    event.listen(db.session, 'after_soft_rollback', lambda session, previous_transaction: _after_rollback(session))
+    _listeners_registered = True
+
+
+# ---------------- BACKFILL ----------------
+def rebuild_rollups(batch_size=5000):
+    """
+    Recomputes every rollup row, and every bill's posting, from
+    project_billing, streaming the bills. Needed once before enabling
+    REVENUE_ROLLUPS_ENABLED; afterwards only to repair the rollups.
+    """
+    db.session.query(RevenueRollup).delete(synchronize_session=False)
+    db.session.query(RevenueRollupPosting).delete(synchronize_session=False)
+
+    rows = db.session.query(
+        ProjectBilling.id,
+        ProjectBilling.status,
+        ProjectBilling.amount,
+        ProjectBilling.created_at,
+        Invoice.paid_date,
+        Project.tier1_seller_id,
+        Project.tier2_seller_id,
+        SubscriptionPlan.id,
+        SubscriptionPlan.price,
+        SubscriptionPlan.admin_commission_pct,
+        SubscriptionPlan.tier1_commission_pct
+    ).select_from(ProjectBilling).join(
+        Project, ProjectBilling.project_id == Project.id
+    ).outerjoin(
+        Invoice, Invoice.billing_record_id == ProjectBilling.id
+    ).outerjoin(
+        SubscriptionPlan, Project.subscription_plan_id == SubscriptionPlan.id
+    ).execution_options(yield_per=batch_size)
+
+    changes = RollupChanges()
+    keys = set()
+    bill_count = 0
+    for bill_id, status, amount, created_at, paid_date, tier1_id, tier2_id, plan_id, price, admin_pct, tier1_pct in rows:
+        if status == 'paid' and paid_date:
+            month = month_start(paid_date)
+        else:
+            month = month_start((created_at or datetime.utcnow()).date())
+        changes.post(bill_id, bill_posting(status, month, amount, tier1_id, tier2_id, plan_id, price, admin_pct, tier1_pct))
+        bill_count += 1
+        if len(changes.postings) >= batch_size:
+            keys.update(changes.deltas)
+            changes.apply(db.session.connection())
+            changes = RollupChanges()
+
+    keys.update(changes.deltas)
+    changes.apply(db.session.connection())
+    db.session.commit()
+    return {'bills': bill_count, 'rollup_rows': len(keys)}
+
+
+# ---------------- READS ----------------
+def _total(column, criterion):
+    return func.coalesce(func.sum(case((criterion, column), else_=0)), 0)
+
+
+def _managed_tier2_ids(tier1_id):
+    return select(Tier2Seller.id).where(Tier2Seller.tier1_seller_id == tier1_id).scalar_subquery()
+
+
+def admin_monthly_revenue_stmt(day):
+    return select(func.coalesce(func.sum(RevenueRollup.admin_commission), 0)).where(
+        RevenueRollup.status == 'paid',
+        RevenueRollup.month == month_start(day)
+    )
+
+
+def tier1_dashboard_stmt(tier1_id):
+    tier2_rows = RevenueRollup.tier2_seller_id.in_(_managed_tier2_ids(tier1_id))
+    admin_rows = or_(
+        (RevenueRollup.tier1_seller_id == tier1_id) & (RevenueRollup.tier2_seller_id == ''),
+        tier2_rows
+    )
+    is_paid = RevenueRollup.status == 'paid'
+    return select(
+        _total(RevenueRollup.tier1_commission, tier2_rows & is_paid),
+        _total(RevenueRollup.admin_commission, is_paid),
+        _total(RevenueRollup.admin_commission, RevenueRollup.status.in_(PENDING_STATUSES))
+    ).where(admin_rows)
+
+
+def tier2_dashboard_stmt(tier2_id):
+    return select(
+        _total(RevenueRollup.tier1_commission, RevenueRollup.status == 'paid'),
+        _total(RevenueRollup.tier1_commission, RevenueRollup.status.in_(PENDING_STATUSES))
+    ).where(RevenueRollup.tier2_seller_id == tier2_id)
+
+
+def admin_monthly_revenue(day=None):
+    """Admin commission on bills paid in the month of `day`."""
+    return Decimal(db.session.execute(admin_monthly_revenue_stmt(day or date.today())).scalar())
+
+
+def tier1_dashboard_totals(tier1_id):
+    """(revenue from Tier-2 projects, commission paid to admin, commission pending to admin)."""
+    return tuple(Decimal(total) for total in db.session.execute(tier1_dashboard_stmt(tier1_id)).one())
+
+
+def tier2_dashboard_totals(tier2_id):
+    """(Tier-1 commission paid, Tier-1 commission pending) on a Tier-2 seller's bills."""
+    return tuple(Decimal(total) for total in db.session.execute(tier2_dashboard_stmt(tier2_id)).one())
@@ -0,0 +1,239 @@
+# app/services/settlements.py
+
+from datetime import date, datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import func, update
+
+from app import db
+from app.scheduling import check_lease
+from app.models.seller import Tier1Seller
+from app.models.settlement import SettlementEntry, SettlementPayout
+from app.services.payment_gateway import get_gateway
+
+# Payouts sent per batch, and entries rolled into payouts per transaction.
+SETTLEMENT_BATCH_SIZE = 100
+
+# A failing payout is retried after 1, 2, 4, ... minutes (capped), then marked failed.
+MAX_PAYOUT_ATTEMPTS = 8
+BACKOFF_BASE_SECONDS = 60
+BACKOFF_MAX_SECONDS = 6 * 3600
+
+# A payout left in 'sending' this long (worker died mid-call) is picked up again;
+# the idempotency key makes the provider return the original transfer.
+SENDING_TIMEOUT = timedelta(minutes=15)
+
+
+def settlement_period(day):
+    """Entries are settled in daily periods."""
+    return day.isoformat()
+
+
+# ---------------- QUEUEING (at payment time) ----------------
+def queue_invoice_transfers(payment_intent, project, invoice):
+    """
+    Queues the Tier-1 and admin shares recorded in invoice.transfer_data as
+    settlement entries in the current transaction: a couple of local inserts
+    per payment, no provider calls.
+    """
+    transfer_info = getattr(invoice, 'transfer_data', None)
+    if not transfer_info:
+        return
+
+    # Use the currency from the payment intent for consistency
+    currency = payment_intent.get('currency') or 'usd'
+    period = settlement_period(invoice.paid_date or date.today())
+    source_txn = payment_intent.get('latest_charge')
+
+    tier1_id = project.tier1_seller_id or (project.tier2_seller.tier1_seller_id if project.tier2_seller else None)
+    shares = [
+        ('tier1_seller', tier1_id, int(transfer_info.get('tier1_amount', 0))),
+        ('admin', '', int(transfer_info.get('admin_amount', 0))),
+    ]
+    for party_type, party_id, amount in shares:
+        if amount <= 0 or party_id is None:
+            continue
+        db.session.add(SettlementEntry(
+            invoice_id=invoice.id,
+            party_type=party_type,
+            party_id=party_id,
+            amount=amount,
+            currency=currency,
+            period=period,
+            source_transaction=source_txn
+        ))
+
+
+# ---------------- AGGREGATION ----------------
+def aggregate_entries(before_period=None, batch_size=SETTLEMENT_BATCH_SIZE, lease_holder=None):
+    """
+    Rolls queued entries of closed periods (before `before_period`, default
+    today) into one pending payout per party, currency and period. Entries are
+    claimed with SKIP LOCKED, so concurrent runs never batch an entry twice.
+    Returns the number of payouts created.
+    """
+    before_period = before_period or settlement_period(date.today())
+    created = 0
+
+    while True:
+        check_lease(lease_holder)
+        entries = db.session.query(
+            SettlementEntry.id,
+            SettlementEntry.party_type,
+            SettlementEntry.party_id,
+            SettlementEntry.currency,
+            SettlementEntry.period,
+            SettlementEntry.amount
+        ).filter(
+            SettlementEntry.status == 'queued',
+            SettlementEntry.period < before_period
+        ).order_by(SettlementEntry.id).limit(batch_size * 10).with_for_update(skip_locked=True).all()
+        if not entries:
+            break
+
+        groups = {}
+        for entry in entries:
+            groups.setdefault((entry.party_type, entry.party_id, entry.currency, entry.period), []).append(entry)
+
+        now = datetime.utcnow()
+        for (party_type, party_id, currency, period), group in groups.items():
+            payout = SettlementPayout(
+                party_type=party_type,
+                party_id=party_id,
+                currency=currency,
+                period=period,
+                amount=sum(entry.amount for entry in group),
+                entry_count=len(group),
+                status='pending',
+                next_attempt_at=now
+            )
+            db.session.add(payout)
+            db.session.flush()
+            db.session.execute(
+                update(SettlementEntry)
+                .where(SettlementEntry.id.in_([entry.id for entry in group]))
+                .values(status='batched', payout_id=payout.id)
+                .execution_options(synchronize_session=False)
+            )
+        db.session.commit()
+        created += len(groups)
+
+        if len(entries) < batch_size * 10:
+            break
+
+    return created
+
+
+# ---------------- PAYOUTS ----------------
+def _destination_account(party_type, party_id):
+    if party_type == 'admin':
+        return current_app.config.get('ADMIN_STRIPE_ACCOUNT_ID')
+    seller = db.session.get(Tier1Seller, party_id)
+    return seller.stripe_account_id if seller else None
+
+
+def _backoff(attempts):
+    return timedelta(seconds=min(BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), BACKOFF_MAX_SECONDS))
+
+
+def _claim_payouts(batch_size, lease_holder=None):
+    """Marks up to `batch_size` due payouts as 'sending' and commits; returns their ids."""
+    check_lease(lease_holder)
+    now = datetime.utcnow()
+    payouts = SettlementPayout.query.filter(
+        ((SettlementPayout.status == 'pending') & (SettlementPayout.next_attempt_at <= now)) |
+        ((SettlementPayout.status == 'sending') & (SettlementPayout.next_attempt_at <= now - SENDING_TIMEOUT))
+    ).order_by(SettlementPayout.next_attempt_at).limit(batch_size).with_for_update(skip_locked=True).all()
+
+    for payout in payouts:
+        payout.status = 'sending'
+        payout.attempts += 1
+        payout.next_attempt_at = now
+    db.session.commit()
+    return [payout.id for payout in payouts]
+
+
+def send_payouts(batch_size=SETTLEMENT_BATCH_SIZE, lease_holder=None):
+    """
+    Sends one batch of due payouts. Payouts are claimed and committed first,
+    so no row lock is held during provider calls; each result is committed
+    as soon as it is known. Returns {'sent', 'retrying', 'failed'} counts.
+    Payouts left 'sending' by a run that lost the scheduler lease are picked
+    up again after SENDING_TIMEOUT.
+    """
+    gateway = get_gateway()
+    counts = {'sent': 0, 'retrying': 0, 'failed': 0}
+
+    for payout_id in _claim_payouts(batch_size, lease_holder):
+        check_lease(lease_holder)
+        payout = db.session.get(SettlementPayout, payout_id)
+        try:
+            destination = _destination_account(payout.party_type, payout.party_id)
+            if not destination:
+                raise ValueError(f"No Stripe account configured for {payout.party_type} {payout.party_id}")
+
+            transfer = gateway.create_transfer(
+                amount=payout.amount,
+                currency=payout.currency,
+                destination=destination,
+                transfer_group=f"settlement-{payout.period}",
+                idempotency_key=f"settlement-payout-{payout.id}"
+            )
+            payout.status = 'paid'
+            payout.destination_account = destination
+            payout.transfer_id = transfer['id']
+            payout.paid_at = datetime.utcnow()
+            payout.last_error = None
+            counts['sent'] += 1
+        except Exception as e:
+            print(f"Error sending settlement payout {payout.id} (attempt {payout.attempts}): {str(e)}")
+            payout.last_error = str(e)
+            if payout.attempts >= MAX_PAYOUT_ATTEMPTS:
+                payout.status = 'failed'
+                counts['failed'] += 1
+            else:
+                payout.status = 'pending'
+                payout.next_attempt_at = datetime.utcnow() + _backoff(payout.attempts)
+                counts['retrying'] += 1
+        db.session.commit()
+
+    return counts
+
+
+def run_settlement(before_period=None, batch_size=SETTLEMENT_BATCH_SIZE, lease_holder=None):
+    """
+    Aggregates closed periods into payouts, then sends every due payout batch
+    by batch. A scheduled run passes its `lease_holder` and stops as soon as
+    that process loses the scheduler lease.
+    """
+    report = {
+        'payouts_created': aggregate_entries(before_period, batch_size, lease_holder),
+        'sent': 0, 'retrying': 0, 'failed': 0
+    }
+    while True:
+        counts = send_payouts(batch_size, lease_holder)
+        for name, value in counts.items():
+            report[name] += value
+        if sum(counts.values()) < batch_size:
+            return report
+
+
+def settlement_summary():
+    """Queued, pending and paid totals (in cents) per party type and currency."""
+    entries = db.session.query(
+        SettlementEntry.party_type, SettlementEntry.currency, func.count(SettlementEntry.id), func.sum(SettlementEntry.amount)
+    ).filter(SettlementEntry.status == 'queued').group_by(SettlementEntry.party_type, SettlementEntry.currency).all()
+    payouts = db.session.query(
+        SettlementPayout.status, SettlementPayout.party_type, SettlementPayout.currency,
+        func.count(SettlementPayout.id), func.sum(SettlementPayout.amount)
+    ).group_by(SettlementPayout.status, SettlementPayout.party_type, SettlementPayout.currency).all()
+    return {
+        'queued_entries': [
+            {'party_type': party_type, 'currency': currency, 'count': count, 'amount': int(amount or 0)}
+            for party_type, currency, count, amount in entries
+        ],
+        'payouts': [
+            {'status': status, 'party_type': party_type, 'currency': currency, 'count': count, 'amount': int(amount or 0)}
+            for status, party_type, currency, count, amount in payouts
+        ]
+    }
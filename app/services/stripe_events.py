@@ -0,0 +1,130 @@
+# app/services/stripe_events.py
+
+from datetime import date, datetime, timedelta
+
+from app import db
+from app.database_engine import upsert_insert
+from app.scheduling import check_lease
+from app.models.billing import Invoice, StripeEvent
+from app.services.ledger import record_invoice_payment
+from app.services.settlements import queue_invoice_transfers
+
+# Events claimed and applied per consumer transaction.
+EVENT_BATCH_SIZE = 100
+
+# A failing event is retried after 30 s, 1, 2, 4 ... minutes (capped), then marked failed.
+MAX_EVENT_ATTEMPTS = 5
+BACKOFF_BASE_SECONDS = 30
+BACKOFF_MAX_SECONDS = 3600
+
+
+# ---------------- INGESTION ----------------
+def record_event(event):
+    """
+    Stores a verified webhook event in the inbox and commits. Returns False
+    when the event id is already there (a Stripe redelivery), True otherwise.
+    """
+    table = StripeEvent.__table__
+    now = datetime.utcnow()
+    insert = upsert_insert(db.session.get_bind().dialect.name)
+    result = db.session.execute(
+        insert(table).values(
+            id=event['id'],
+            type=event['type'],
+            payload=event,
+            status='received',
+            attempts=0,
+            received_at=now,
+            next_attempt_at=now
+        ).on_conflict_do_nothing(index_elements=['id'])
+    )
+    db.session.commit()
+    return result.rowcount == 1
+
+
+# ---------------- CONSUMERS ----------------
+def _backoff(attempts):
+    return timedelta(seconds=min(BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), BACKOFF_MAX_SECONDS))
+
+
+def process_events(batch_size=EVENT_BATCH_SIZE, lease_holder=None):
+    """
+    Claims up to `batch_size` received events that are due (skipping rows
+    other consumers hold), applies each in its own savepoint and commits the
+    whole batch at once. An event is marked 'processed' in the same
+    transaction that applies it, so it takes effect exactly once however often
+    it was delivered; a failed one waits out its backoff before the next try.
+    Returns the number of events claimed.
+    """
+    check_lease(lease_holder)
+    events = StripeEvent.query.filter(
+        StripeEvent.status == 'received',
+        StripeEvent.next_attempt_at <= datetime.utcnow()
+    ).order_by(
+        StripeEvent.next_attempt_at
+    ).limit(batch_size).with_for_update(skip_locked=True).all()
+
+    for event in events:
+        event.attempts += 1
+        try:
+            with db.session.begin_nested():
+                apply_event(event.payload)
+            event.status = 'processed'
+            event.processed_at = datetime.utcnow()
+            event.error = None
+        except Exception as e:
+            print(f"Error applying Stripe event {event.id} ({event.type}): {str(e)}")
+            event.error = str(e)
+            if event.attempts >= MAX_EVENT_ATTEMPTS:
+                event.status = 'failed'
+            else:
+                event.next_attempt_at = datetime.utcnow() + _backoff(event.attempts)
+
+    db.session.commit()
+    return len(events)
+
+
+def drain_events(batch_size=EVENT_BATCH_SIZE, lease_holder=None):
+    """
+    Processes batches until the inbox has no unclaimed events left; returns
+    the number claimed. A scheduled consumer passes its `lease_holder` and
+    stops as soon as that process loses the scheduler lease.
+    """
+    total = 0
+    while True:
+        claimed = process_events(batch_size, lease_holder)
+        total += claimed
+        if claimed < batch_size:
+            return total
+
+
+# ---------------- EVENT HANDLERS ----------------
+def apply_event(event):
+    """Applies one Stripe event (a dict) to the invoices in the current transaction."""
+    if event['type'] == 'payment_intent.succeeded':
+        intent = event['data']['object']
+        invoice_id = intent.get('metadata', {}).get('invoice_id')
+        if not invoice_id:
+            raise ValueError('Missing invoice_id in metadata')
+
+        invoice = Invoice.query.filter_by(id=invoice_id).with_for_update().first()
+        if invoice and invoice.status != 'paid':
+            invoice.status = 'paid'
+            invoice.paid_date = date.today()
+            if invoice.billing_record:
+                invoice.billing_record.status = 'paid'
+
+            project = invoice.project
+            if project:
+                record_invoice_payment(invoice, project, intent.get('currency'))
+            if project and project.tier2_seller_id:
+                queue_invoice_transfers(intent, project, invoice)
+
+    elif event['type'] == 'payment_intent.payment_failed':
+        intent = event['data']['object']
+        invoice_id = intent.get('metadata', {}).get('invoice_id')
+        if invoice_id:
+            invoice = Invoice.query.filter_by(id=invoice_id).with_for_update().first()
+            # A failure of an earlier attempt arriving after the success must not undo it
+            if invoice and invoice.status != 'paid':
+                invoice.status = 'failed'
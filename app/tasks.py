@@ -1,67 +1,526 @@
 # app/tasks.py
 
-from datetime import date
+from datetime import date, datetime
 from dateutil.relativedelta import relativedelta
 from decimal import Decimal
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+import json
+import multiprocessing
+import time
 import uuid
 
-from . import create_app, db
-from .models.project import Project
-from .models.billing import ProjectBilling, Invoice
+import click
+from flask import current_app, has_app_context
+from flask.cli import AppGroup
+from sqlalchemy import BigInteger, cast, func, insert, update
+
+from . import create_job_app, db, scheduling
+from .database_engine import check_sharding, statement_role
+from .database_routing import use_replica
+from .models.project import Project, SubscriptionPlan
+from .models.billing import ProjectBilling, Invoice, BillingRun
+from .services.invoice_numbers import allocate_invoice_numbers, invoice_period
+from .services import exports, ledger, rollups, settlements, stripe_events
+
+# Number of due projects selected, billed and advanced per round-trip.
+BILLING_CHUNK_SIZE = 1000
+
+# Application the scheduled jobs run in; bound by create_app() via init_app().
+_job_app = None
+
+# Columns a partitioned run can shard due projects on.
+PARTITION_KEYS = {
+    'id': Project.id,
+    'tier1_seller': Project.tier1_seller_id
+}
+
+
+def init_app(app):
+    """Binds the scheduled jobs to the running application."""
+    global _job_app
+    _job_app = app
+
+
+@contextmanager
+def job_context():
+    """
+    Application context for a background job. Reuses the current or bound
+    application, and with it the engine and connection pool, and only falls
+    back to a minimal job app when the job runs on its own (CLI, worker process).
+    """
+    if has_app_context():
+        with statement_role('job'):
+            yield current_app
+        return
+
+    global _job_app
+    if _job_app is None:
+        _job_app = create_job_app()
+
+    # Jobs scheduled in a web process still get the job statement timeout
+    with _job_app.app_context(), statement_role('job'):
+        yield _job_app
+
+
+def _shard_predicate(partition_by, shard, shard_count):
+    """
+    SQL predicate selecting one of `shard_count` disjoint slices of the projects
+    table, hashed on the partition column (PostgreSQL `hashtext`).
+    """
+    check_sharding(db.engine.dialect.name, shard_count)
+    if partition_by not in PARTITION_KEYS:
+        raise ValueError(f"Unknown partition key '{partition_by}'. Use one of: {', '.join(PARTITION_KEYS)}")
+    if not 0 <= shard < shard_count:
+        raise ValueError(f"Shard {shard} is out of range for {shard_count} shards")
+
+    column = func.coalesce(PARTITION_KEYS[partition_by], '')
+    return func.mod(func.abs(cast(func.hashtext(column), BigInteger)), shard_count) == shard
+
+
+def due_chunk_query(today, after_id, limit, shard_filter=None):
+    """
+    The query for the next chunk of due projects together with their plan price,
+    joined in one statement and ordered by project id (keyset pagination).
+
+    The project rows are claimed with FOR UPDATE SKIP LOCKED, so concurrent
+    workers never pick up a project another worker is currently billing.
+    """
+    query = db.session.query(
+        Project.id,
+        Project.tier1_seller_id,
+        Project.tier2_seller_id,
+        SubscriptionPlan.id.label('plan_id'),
+        SubscriptionPlan.price,
+        SubscriptionPlan.admin_commission_pct,
+        SubscriptionPlan.tier1_commission_pct
+    ).join(
+        SubscriptionPlan, Project.subscription_plan_id == SubscriptionPlan.id
+    ).filter(
+        Project.status == 'active',
+        Project.next_billing_date <= today,
+        Project.id > after_id,
+        SubscriptionPlan.price.isnot(None),
+        SubscriptionPlan.price > 0
+    )
+    if shard_filter is not None:
+        query = query.filter(shard_filter)
+
+    return query.order_by(Project.id).limit(limit).with_for_update(
+        skip_locked=True, of=Project
+    )
+
+
+def _bill_chunk(rows, today):
+    """
+    Creates one bill and one invoice per row with two bulk INSERTs and moves
+    the projects' next_billing_date forward with one set-based UPDATE. The
+    bulk INSERTs bypass the ORM, so the chunk's revenue rollups are applied here.
+    """
+    now = datetime.utcnow()
+    due_date = today + relativedelta(days=15)
+    description = f"Monthly service for {today.strftime('%B %Y')}"
+
+    invoice_numbers = allocate_invoice_numbers(len(rows), invoice_period(today))
+
+    bills = []
+    invoices = []
+    rollup_changes = rollups.RollupChanges()
+    for row, invoice_number in zip(rows, invoice_numbers):
+        bill_id = str(uuid.uuid4())
+        amount = Decimal(row.price)
+        bills.append({
+            'id': bill_id,
+            'project_id': row.id,
+            'billing_type': 'Monthly Retainer',
+            'amount': amount,
+            'description': description,
+            'status': 'invoiced',
+            'due_date': due_date,
+            'created_at': now,
+            'updated_at': now
+        })
+        invoices.append({
+            'id': str(uuid.uuid4()),
+            'billing_record_id': bill_id,
+            'project_id': row.id,
+            'invoice_number': invoice_number,
+            'total_amount': amount,
+            'issue_date': today,
+            'due_date': due_date,
+            'status': 'sent',
+            'created_at': now,
+            'updated_at': now
+        })
+        rollup_changes.post(bill_id, rollups.bill_posting(
+            'invoiced', rollups.month_start(now.date()), amount,
+            row.tier1_seller_id, row.tier2_seller_id, row.plan_id,
+            row.price, row.admin_commission_pct, row.tier1_commission_pct
+        ))
+
+    db.session.execute(insert(ProjectBilling), bills)
+    db.session.execute(insert(Invoice), invoices)
+    rollup_changes.apply(db.session.connection())
+    db.session.execute(
+        update(Project)
+        .where(Project.id.in_([row.id for row in rows]))
+        .values(next_billing_date=today + relativedelta(months=1), updated_at=now)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _start_run(today, shard, shard_count, partition_by):
+    """
+    Returns the checkpoint row for this shard of today's run. A run that was
+    interrupted ('running' or 'failed') is resumed from its last committed
+    project; a completed run is restarted from the beginning so projects that
+    became due since then are still picked up.
+    """
+    run = BillingRun.query.filter_by(
+        run_date=today, shard=shard, shard_count=shard_count, partition_by=partition_by
+    ).first()
+
+    if not run:
+        run = BillingRun(
+            run_date=today, shard=shard, shard_count=shard_count, partition_by=partition_by,
+            last_project_id='', projects_billed=0, chunks=0
+        )
+        db.session.add(run)
+    elif run.status == 'completed':
+        run.last_project_id = ''
+        run.projects_billed = 0
+        run.chunks = 0
+        run.finished_at = None
+    elif run.last_project_id:
+        print(f"Resuming billing run for shard {shard}/{shard_count} after project {run.last_project_id}.")
+
+    run.status = 'running'
+    run.error = None
+    db.session.commit()
+    return run
+
+
+def run_billing(today=None, chunk_size=BILLING_CHUNK_SIZE, shard=0, shard_count=1, partition_by='id',
+                lease_holder=None):
+    """
+    Bills every due project in chunks and returns a summary of the run.
+    With `shard_count` > 1 only the projects hashing to `shard` are billed,
+    which lets several processes or nodes split one billing run between them.
+
+    Every chunk is committed together with the run's checkpoint, so a failure
+    only rolls back the chunk in flight and the next run resumes after the
+    last committed project. A scheduled run passes its `lease_holder` and
+    stops as soon as that process loses the scheduler lease. Must be called
+    inside an application context.
+    """
+    today = today or date.today()
+    shard_filter = _shard_predicate(partition_by, shard, shard_count) if shard_count > 1 else None
+    run = _start_run(today, shard, shard_count, partition_by)
+    run_id = run.id
+    report = {
+        'run_id': run_id,
+        'run_date': today.isoformat(),
+        'shard': shard,
+        'shard_count': shard_count,
+        'partition_by': partition_by,
+        'resumed_from': run.last_project_id or None,
+        'projects_billed': 0,
+        'chunks': 0,
+        'elapsed_seconds': 0.0
+    }
+    started = time.perf_counter()
+    last_id = run.last_project_id
+
+    try:
+        while True:
+            chunk_started = time.perf_counter()
+            scheduling.check_lease(lease_holder)
+            rows = due_chunk_query(today, last_id, chunk_size, shard_filter).all()
+            if not rows:
+                break
+
+            _bill_chunk(rows, today)
+            last_id = rows[-1].id
+            db.session.execute(
+                update(BillingRun)
+                .where(BillingRun.id == run_id)
+                .values(
+                    last_project_id=last_id,
+                    projects_billed=BillingRun.projects_billed + len(rows),
+                    chunks=BillingRun.chunks + 1,
+                    updated_at=datetime.utcnow()
+                )
+                .execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+
+            elapsed = time.perf_counter() - chunk_started
+            report['chunks'] += 1
+            report['projects_billed'] += len(rows)
+            print(f"Shard {shard}/{shard_count} chunk {report['chunks']}: billed {len(rows)} projects "
+                  f"in {elapsed:.2f}s ({len(rows) / elapsed if elapsed else 0:.0f} rows/sec).")
+    except Exception as e:
+        db.session.rollback()
+        _finish_run(run_id, 'failed', str(e))
+        raise
+
+    _finish_run(run_id, 'completed')
+    report['elapsed_seconds'] = round(time.perf_counter() - started, 3)
+    return report
+
+
+def _finish_run(run_id, status, error=None):
+    db.session.execute(
+        update(BillingRun)
+        .where(BillingRun.id == run_id)
+        .values(status=status, error=error, finished_at=datetime.utcnow(), updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+
+
+def _run_shard(shard, shard_count, partition_by, today, chunk_size, lease_holder):
+    """Process-pool entry point: bills one shard in the worker's job app."""
+    with job_context():
+        return run_billing(today, chunk_size, shard, shard_count, partition_by, lease_holder)
+
+
+def aggregate_reports(reports, today):
+    """Combines the per-shard reports of one billing run into a completion report."""
+    elapsed = max((r['elapsed_seconds'] for r in reports), default=0.0)
+    billed = sum(r['projects_billed'] for r in reports)
+    return {
+        'run_date': today.isoformat(),
+        'shard_count': len(reports),
+        'projects_billed': billed,
+        'chunks': sum(r['chunks'] for r in reports),
+        'failed_shards': [r['shard'] for r in reports if r.get('error')],
+        'elapsed_seconds': elapsed,
+        'rows_per_second': round(billed / elapsed, 1) if elapsed else 0.0,
+        'shards': reports
+    }
+
+
+def run_partitioned_billing(shard_count, partition_by='id', workers=None, today=None,
+                            chunk_size=BILLING_CHUNK_SIZE, lease_holder=None):
+    """
+    Splits the due projects into `shard_count` disjoint shards and bills them
+    in a process pool, returning one aggregated completion report.
+    """
+    today = today or date.today()
+    context = multiprocessing.get_context('spawn')
+    reports = []
+
+    with ProcessPoolExecutor(max_workers=workers or shard_count, mp_context=context) as pool:
+        futures = {
+            pool.submit(_run_shard, shard, shard_count, partition_by, today, chunk_size, lease_holder): shard
+            for shard in range(shard_count)
+        }
+        for future, shard in futures.items():
+            try:
+                reports.append(future.result())
+            except Exception as e:
+                print(f"Error billing shard {shard}/{shard_count}: {str(e)}")
+                reports.append({
+                    'shard': shard, 'projects_billed': 0, 'chunks': 0,
+                    'elapsed_seconds': 0.0, 'error': str(e)
+                })
+
+    return aggregate_reports(reports, today)
+
+
 def generate_monthly_invoices():
     """
     A scheduled task to automatically generate bills and invoices for active projects.
     """
-    app = create_app()
-    with app.app_context():
+    if not scheduling.is_leader():
+        # Never bill twice: only the holder of the scheduler lease runs scheduled jobs
+        print("Skipping monthly billing: this process does not hold the scheduler lease.")
+        return
+
+    with job_context():
         today = date.today()
         print(f"Running monthly billing job on {today}...")
 
-        projects_to_bill = Project.query.filter(
-            Project.status == 'active',
-            Project.next_billing_date <= today
-        ).all()
+        shard_count = current_app.config['BILLING_SHARDS']
+        partition_by = current_app.config['BILLING_PARTITION_BY']
+        # Shard processes check the lease of this process between chunks
+        holder = scheduling.lease_holder_id()
 
-        if not projects_to_bill:
+        try:
+            if shard_count > 1:
+                report = run_partitioned_billing(shard_count, partition_by, today=today, lease_holder=holder)
+            else:
+                report = run_billing(today, lease_holder=holder)
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error during monthly billing job: {str(e)}")
+            return
+
+        if not report['projects_billed']:
             print("No projects are due for billing today.")
             return
 
-        for project in projects_to_bill:
-            try:
-                if not project.subscription_plan or not project.subscription_plan.price:
-                    print(f"Skipping project {project.id} - no active subscription plan with a price.")
-                    continue
-
-                new_bill = ProjectBilling(
-                    project_id=project.id,
-                    billing_type='Monthly Retainer',
-                    amount=Decimal(project.subscription_plan.price),
-                    description=f"Monthly service for {today.strftime('%B %Y')}",
-                    status='pending',
-                    due_date=today + relativedelta(days=15)
-                )
-                db.session.add(new_bill)
-
-                new_invoice = Invoice(
-                    billing_record=new_bill,
-                    project_id=project.id,
-                    invoice_number=f"INV-{uuid.uuid4().hex[:6].upper()}",
-                    total_amount=new_bill.amount,
-                    issue_date=today,
-                    due_date=new_bill.due_date,
-                    status='sent'
-                )
-                new_bill.status = 'invoiced'
-                db.session.add(new_invoice)
+        print(f"Monthly billing job finished: {report['projects_billed']} projects billed "
+              f"in {report['elapsed_seconds']}s.")
 
-                project.next_billing_date = today + relativedelta(months=1)
-                
-                print(f"Successfully generated invoice for project {project.id}.")
 
-            except Exception as e:
-                db.session.rollback()
-                print(f"Error processing project {project.id}: {str(e)}")
-                continue
-        
-        db.session.commit()
-        print("Monthly billing job finished.")
\ No newline at end of file
+def consume_stripe_events():
+    """
+    A scheduled consumer of the Stripe webhook inbox. Several instances may run
+    at once (STRIPE_EVENT_CONSUMERS); they claim disjoint batches.
+    """
+    if not scheduling.is_leader():
+        return
+
+    with job_context():
+        try:
+            claimed = stripe_events.drain_events(
+                current_app.config['STRIPE_EVENT_BATCH_SIZE'], lease_holder=scheduling.lease_holder_id()
+            )
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error while consuming Stripe events: {str(e)}")
+            return
+
+        if claimed:
+            print(f"Consumed {claimed} Stripe events.")
+
+
+def settle_transfers():
+    """
+    A scheduled task that rolls the queued Tier-1/admin shares of closed
+    periods into payouts and sends the due ones.
+    """
+    if not scheduling.is_leader():
+        return
+
+    with job_context():
+        try:
+            report = settlements.run_settlement(lease_holder=scheduling.lease_holder_id())
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error during settlement run: {str(e)}")
+            return
+
+        if any(report.values()):
+            print(f"Settlement run: {report['payouts_created']} payouts created, {report['sent']} sent, "
+                  f"{report['retrying']} to retry, {report['failed']} failed.")
+
+
+# ---------------- CLI ----------------
+billing_cli = AppGroup('billing', help='Monthly billing job commands.')
+
+
+@billing_cli.command('run')
+@click.option('--date', 'run_date', type=click.DateTime(formats=['%Y-%m-%d']), help='Billing date (default: today).')
+@click.option('--shards', type=int, default=None, help='Number of shards to split the run into.')
+@click.option('--shard', type=int, default=None, help='Bill only this shard, e.g. to spread a run over several nodes.')
+@click.option('--partition-by', type=click.Choice(list(PARTITION_KEYS)), default=None, help='Column the shards are hashed on.')
+@click.option('--workers', type=int, default=None, help='Worker processes for a partitioned run.')
+@click.option('--chunk-size', type=int, default=BILLING_CHUNK_SIZE, show_default=True)
+def run_billing_command(run_date, shards, shard, partition_by, workers, chunk_size):
+    """Runs the monthly billing job and prints its completion report."""
+    today = run_date.date() if run_date else date.today()
+    shard_count = shards or current_app.config['BILLING_SHARDS']
+    partition_by = partition_by or current_app.config['BILLING_PARTITION_BY']
+    try:
+        check_sharding(db.engine.dialect.name, shard_count)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="'--shards'")
+
+    if shard is not None:
+        report = run_billing(today, chunk_size, shard, shard_count, partition_by)
+    elif shard_count > 1:
+        report = run_partitioned_billing(shard_count, partition_by, workers, today, chunk_size)
+    else:
+        report = run_billing(today, chunk_size)
+
+    click.echo(json.dumps(report, indent=2))
+
+
+@billing_cli.command('rebuild-rollups')
+def rebuild_rollups_command():
+    """Recomputes the revenue rollups from all bills (run before enabling REVENUE_ROLLUPS_ENABLED)."""
+    click.echo(json.dumps(rollups.rebuild_rollups(), indent=2))
+
+
+@billing_cli.command('backfill-ledger')
+def backfill_ledger_command():
+    """Posts paid invoices missing from the commission ledger and recomputes the balances."""
+    click.echo(json.dumps(ledger.backfill_ledger(), indent=2))
+
+
+@billing_cli.command('consume-events')
+@click.option('--once', is_flag=True, help='Drain the inbox once and exit instead of polling.')
+@click.option('--batch-size', type=int, default=None, help='Events applied per transaction.')
+def consume_events_command(once, batch_size):
+    """Runs a Stripe webhook inbox consumer; start several for more throughput."""
+    batch_size = batch_size or current_app.config['STRIPE_EVENT_BATCH_SIZE']
+    poll_seconds = current_app.config['STRIPE_EVENT_POLL_SECONDS']
+
+    while True:
+        claimed = stripe_events.drain_events(batch_size)
+        if claimed:
+            click.echo(f"Consumed {claimed} Stripe events.")
+        if once:
+            return
+        time.sleep(poll_seconds)
+
+
+@billing_cli.command('settle')
+@click.option('--before', 'before_period', default=None, help='Settle periods before this one (YYYY-MM-DD, default today).')
+def settle_command(before_period):
+    """Aggregates queued settlement entries into payouts and sends the due payouts."""
+    click.echo(json.dumps(settlements.run_settlement(before_period), indent=2))
+
+
+@billing_cli.command('export')
+@click.option('--format', 'fmt', type=click.Choice(list(exports.EXPORT_FORMATS)), default='csv', show_default=True)
+@click.option('--output', '-o', type=click.Path(dir_okay=False, writable=True), required=True, help="File to write ('-' for stdout).")
+@click.option('--gzip', 'compress', is_flag=True, help='gzip-compress the output.')
+@click.option('--date-from', type=click.DateTime(formats=['%Y-%m-%d']), default=None, help='Bills created on or after this date.')
+@click.option('--date-to', type=click.DateTime(formats=['%Y-%m-%d']), default=None, help='Bills created on or before this date.')
+@click.option('--status', default=None, help='Comma-separated bill statuses.')
+@click.option('--seller-id', default=None, help='Tier-1 or Tier-2 seller id.')
+@click.option('--batch-size', type=int, default=exports.EXPORT_BATCH_SIZE, show_default=True)
+def export_command(fmt, output, compress, date_from, date_to, status, seller_id, batch_size):
+    """Streams bills with their invoices, projects, sellers and plans to a CSV, NDJSON or Parquet file."""
+    stmt = exports.export_statement(
+        date_from=date_from.date() if date_from else None,
+        date_to=date_to.date() if date_to else None,
+        statuses=status.split(',') if status else None,
+        seller_id=seller_id
+    )
+    try:
+        chunks = exports.export_chunks(fmt, exports.iter_batches(stmt, batch_size), compress=compress)
+    except exports.ExportError as e:
+        raise click.ClickException(str(e))
+
+    written = 0
+    with use_replica(), click.open_file(output, 'wb') as out:
+        for chunk in chunks:
+            out.write(chunk)
+            written += len(chunk)
+    if output != '-':
+        click.echo(f"Wrote {written} bytes to {output}.")
+
+
+@billing_cli.command('scheduler')
+def scheduler_command():
+    """
+    Runs the scheduled jobs in a dedicated process, while it holds the
+    cluster-wide scheduler lease. Run it next to web workers started with
+    SCHEDULER_ENABLED=false; extra instances stand by and take over when the
+    leader stops.
+    """
+    app = current_app._get_current_object()
+    if getattr(app, 'apscheduler', None) is None:
+        # create_app() has already configured the scheduler; create_job_app() leaves it out
+        scheduling.init_scheduler(app)
+    scheduling.run_scheduler_process(app)
+
+
+def register_billing_commands(app):
+    """Register billing commands with Flask CLI"""
+    app.cli.add_command(billing_cli)
@@ -1,6 +1,12 @@
 from functools import wraps
-from flask import jsonify
+from collections import OrderedDict
+import threading
+import time
+from flask import jsonify, current_app
 from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity,get_jwt
+from sqlalchemy import event
+from app import db
+from app.database_routing import use_primary
 
 def jwt_required_custom(f):
     @wraps(f)
@@ -24,4 +30,135 @@ def admin_required(f):
             return f(*args, **kwargs)
         except Exception as e:
             return jsonify({'message': 'Token is invalid'}), 401
-    return decorated
\ No newline at end of file
+    return decorated
+
+
+# ------------------ PRINCIPAL RESOLUTION ------------------
+# Lookup order used when a token carries no role claim. Without the claim a
+# Tier-2 seller costs three primary-key queries, a Tier-1 seller two.
+PRINCIPAL_ROLES = ('admin', 'tier1_seller', 'tier2_seller')
+
+
+def _principal_model(role):
+    from app.models import Admin, Tier1Seller, Tier2Seller
+    return {'admin': Admin, 'tier1_seller': Tier1Seller, 'tier2_seller': Tier2Seller}[role]
+
+
+class PrincipalCache:
+    """Per-process TTL + LRU cache of resolved principals ({'id', 'role'} dicts)."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'db_lookups': 0, 'db_lookups_saved': 0, 'invalidations': 0}
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            principal, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return principal
+
+    def put(self, principal):
+        with self._lock:
+            self._entries[principal['id']] = (principal, time.monotonic() + self.ttl)
+            self._entries.move_to_end(principal['id'])
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            if self._entries.pop(user_id, None) is not None:
+                self.stats['invalidations'] += 1
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.stats[name] += n
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats, size=len(self._entries), maxsize=self.maxsize, ttl_seconds=self.ttl)
+
+
+_principal_cache = None
+
+
+def get_principal_cache():
+    global _principal_cache
+    if _principal_cache is None:
+        _principal_cache = PrincipalCache(
+            current_app.config['PRINCIPAL_CACHE_SIZE'],
+            current_app.config['PRINCIPAL_CACHE_TTL']
+        )
+    return _principal_cache
+
+
+def _role_claim():
+    try:
+        return get_jwt().get('role')
+    except RuntimeError:
+        return None
+
+
+def resolve_principal(user_id, role=None):
+    """
+    Returns {'id', 'role'} for the authenticated user, or None if the user no
+    longer exists. The JWT's role claim picks the one table to look in, and the
+    result is cached per process; "db_lookups_saved" counts the primary-key
+    queries avoided compared to probing every table in turn. Users are always
+    looked up on the primary: a replica lagging behind a sign-up would not know them.
+    """
+    if not user_id:
+        return None
+    role = role or _role_claim()
+    cache = get_principal_cache()
+
+    principal = cache.get(user_id)
+    if principal and (role is None or principal['role'] == role):
+        cache.count('hits')
+        cache.count('db_lookups_saved', PRINCIPAL_ROLES.index(principal['role']) + 1)
+        return principal
+    cache.count('misses')
+
+    roles = (role,) if role in PRINCIPAL_ROLES else PRINCIPAL_ROLES
+    for lookups, candidate in enumerate(roles, start=1):
+        with use_primary():
+            user = db.session.get(_principal_model(candidate), user_id)
+        if user:
+            cache.count('db_lookups', lookups)
+            cache.count('db_lookups_saved', PRINCIPAL_ROLES.index(candidate) + 1 - lookups)
+            principal = {"id": user.id, "role": candidate}
+            cache.put(principal)
+            return principal
+
+    cache.count('db_lookups', len(roles))
+    return None
+
+
+def invalidate_principal(user_id):
+    if _principal_cache is not None:
+        _principal_cache.invalidate(user_id)
+
+
+def _invalidate_on_change(mapper, connection, target):
+    invalidate_principal(target.id)
+
+
+def register_principal_listeners():
+    """
+    Drops this process's cached principal when a user record is updated or
+    deleted through the ORM. Bulk query deletes and other processes' writes
+    fire no mapper events; those entries go stale for at most the TTL.
+    """
+    for role in PRINCIPAL_ROLES:
+        model = _principal_model(role)
+        if not event.contains(model, 'after_update', _invalidate_on_change):
+            event.listen(model, 'after_update', _invalidate_on_change)
+            event.listen(model, 'after_delete', _invalidate_on_change)
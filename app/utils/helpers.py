@@ -0,0 +1,46 @@
+from flask import request
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+
+def get_page_args(default=None, maximum=MAX_PAGE_SIZE):
+    """
+    Reads the `limit` and `after` keyset-pagination arguments, capping the
+    page size. Pagination is opt-in: a request with neither argument gets
+    (None, None), i.e. every row, unless the endpoint passes a `default` page
+    size. `after` alone pages with DEFAULT_PAGE_SIZE.
+    """
+    after = request.args.get('after') or None
+    limit = request.args.get('limit', type=int)
+    if limit is None:
+        if after is None and default is None:
+            return None, None
+        limit = default or DEFAULT_PAGE_SIZE
+    return max(1, min(limit, maximum)), after
+
+
+def keyset_page(query, key_column, after, limit, key=lambda row: row.id):
+    """
+    Returns one page of `query` ordered by `key_column` (a unique column)
+    starting after the cursor `after`, plus the cursor of the next page
+    (None on the last page). A `limit` of None returns every row.
+    """
+    if after is not None:
+        query = query.filter(key_column > after)
+    if limit is None:
+        return query.order_by(key_column).all(), None
+
+    rows = query.order_by(key_column).limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    return rows, key(rows[-1])
+
+
+def with_next_cursor(response, next_cursor):
+    """Exposes the next-page cursor in the X-Next-Cursor header, keeping the body unchanged."""
+    if next_cursor is not None:
+        response.headers['X-Next-Cursor'] = str(next_cursor)
+    return response
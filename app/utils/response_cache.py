@@ -0,0 +1,325 @@
+from functools import wraps
+from collections import OrderedDict
+import hashlib
+import json
+import threading
+import time
+from flask import current_app, g, request
+from flask_jwt_extended import get_jwt, get_jwt_identity
+from sqlalchemy import event
+from app import db
+
+
+# ------------------ DASHBOARD RESPONSE CACHE ------------------
+# Responses of the dashboard endpoints are cached per (endpoint, role,
+# principal, arguments). Every key embeds a generation number; a commit that
+# writes any of WATCHED_TABLES bumps the generation, so all cached responses
+# are dropped at once and the next request recomputes them.
+WATCHED_TABLES = frozenset({
+    'project_billing', 'invoices', 'subscription_plans', 'projects',
+    'tier1_sellers', 'tier2_sellers', 'commission_ledger_entries',
+})
+
+# Response headers kept with a cached body (pagination cursor, content type).
+CACHED_HEADERS = ('Content-Type', 'X-Next-Cursor')
+
+
+class LRUBackend:
+    """
+    Per-process TTL + LRU store. Invalidations only reach this process, so it
+    is only correct when a single process serves and writes (run.py); the
+    gunicorn launcher refuses it with more than one worker.
+    """
+
+    name = 'lru'
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._generation = 0
+        self._invalidated_at = 0.0
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0, 'invalidations': 0}
+
+    def generation(self):
+        return self._generation
+
+    def invalidated_at(self):
+        return self._invalidated_at
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.stats['expirations'] += 1
+                self.stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.stats['evictions'] += 1
+
+    def invalidate(self):
+        with self._lock:
+            # Old keys become unreachable; clear them now rather than wait for eviction
+            self._generation += 1
+            self._invalidated_at = time.time()
+            self._entries.clear()
+            self.stats['invalidations'] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats, backend=self.name, size=len(self._entries), maxsize=self.maxsize,
+                        ttl_seconds=self.ttl, generation=self._generation)
+
+
+class LocalStore:
+    """
+    In-process stand-in for the Redis client (the get/set/incr/info subset used
+    by SharedBackend), for tests and single-process development.
+    """
+
+    def __init__(self):
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value, expires_at = self._values.get(key, (None, None))
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._values[key]
+                return None
+            return value
+
+    def set(self, key, value, ex=None):
+        with self._lock:
+            self._values[key] = (value, time.monotonic() + ex if ex else None)
+
+    def incr(self, key):
+        with self._lock:
+            value = int(self._values.get(key, (0, None))[0]) + 1
+            self._values[key] = (value, None)
+            return value
+
+    def info(self, section=None):
+        return {'evicted_keys': 0, 'expired_keys': 0}
+
+
+class SharedBackend:
+    """
+    Store shared by every worker (Redis). The generation lives in the store
+    too, so an invalidation in one worker is seen by all of them; eviction of
+    entries is left to the store's own TTL and maxmemory policy.
+    """
+
+    name = 'redis'
+
+    def __init__(self, client, ttl, prefix='respcache'):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'invalidations': 0, 'errors': 0}
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def generation(self):
+        try:
+            return int(self.client.get(f"{self.prefix}:generation") or 0)
+        except Exception:
+            self._count('errors')
+            return None
+
+    def invalidated_at(self):
+        try:
+            return float(self.client.get(f"{self.prefix}:invalidated_at") or 0)
+        except Exception:
+            self._count('errors')
+            return 0.0
+
+    def get(self, key):
+        try:
+            value = self.client.get(f"{self.prefix}:{key}")
+        except Exception:
+            self._count('errors')
+            value = None
+        self._count('hits' if value is not None else 'misses')
+        return json.loads(value) if value is not None else None
+
+    def set(self, key, value):
+        try:
+            self.client.set(f"{self.prefix}:{key}", json.dumps(value), ex=self.ttl)
+        except Exception:
+            self._count('errors')
+
+    def invalidate(self):
+        try:
+            self.client.incr(f"{self.prefix}:generation")
+            self.client.set(f"{self.prefix}:invalidated_at", time.time())
+            self._count('invalidations')
+        except Exception as e:
+            self._count('errors')
+            print(f"Error invalidating response cache: {str(e)}")
+
+    def snapshot(self):
+        with self._lock:
+            snapshot = dict(self.stats, backend=self.name, ttl_seconds=self.ttl)
+        try:
+            info = self.client.info('stats')
+            snapshot.update(evictions=info.get('evicted_keys', 0), expirations=info.get('expired_keys', 0))
+        except Exception:
+            pass
+        return snapshot
+
+
+def _create_backend(app):
+    backend = app.config['RESPONSE_CACHE_BACKEND']
+    ttl = app.config['RESPONSE_CACHE_TTL']
+    if backend == 'lru':
+        return LRUBackend(app.config['RESPONSE_CACHE_SIZE'], ttl)
+    if backend == 'redis':
+        url = app.config['RESPONSE_CACHE_URL']
+        if url == 'memory://':
+            return SharedBackend(LocalStore(), ttl)
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("RESPONSE_CACHE_BACKEND=redis requires the redis package (pip install redis)")
+        return SharedBackend(redis.Redis.from_url(url), ttl)
+    if backend == 'none':
+        return None
+    raise ValueError(f"Unknown RESPONSE_CACHE_BACKEND '{backend}'")
+
+
+def get_response_cache():
+    """The backend of the current app, created on first use; None when caching is disabled."""
+    app = current_app._get_current_object()
+    if 'response_cache' not in app.extensions:
+        app.extensions['response_cache'] = _create_backend(app)
+    return app.extensions['response_cache']
+
+
+def _cache_key(generation):
+    try:
+        role = get_jwt().get('role')
+    except RuntimeError:
+        role = None
+    args = json.dumps(
+        [request.endpoint, role, get_jwt_identity(), sorted(request.view_args.items()),
+         sorted(request.args.items(multi=True))],
+        default=str
+    )
+    return f"{generation}:{hashlib.sha256(args.encode()).hexdigest()}"
+
+
+def _maybe_lagging(cache):
+    if not g.get('db_read_replica'):
+        return False
+    return time.time() - cache.invalidated_at() < current_app.config['REPLICA_PRIMARY_PIN_SECONDS']
+
+
+def cached_response(view):
+    """
+    Caches successful JSON responses of an authenticated view. Apply below
+    the auth decorator, so the token is verified before the cache is read.
+    Streamed responses are passed through uncached, and so are responses
+    read from a replica that may not have replayed the latest invalidating
+    write yet (REPLICA_PRIMARY_PIN_SECONDS).
+    """
+    @wraps(view)
+    def decorated(*args, **kwargs):
+        cache = get_response_cache()
+        generation = cache.generation() if cache else None
+        if generation is None:
+            return view(*args, **kwargs)
+
+        key = _cache_key(generation)
+        cached = cache.get(key)
+        if cached is not None:
+            response = current_app.response_class(cached['body'], status=cached['status'], headers=cached['headers'])
+            response.headers['X-Cache'] = 'HIT'
+            return response
+
+        response = current_app.make_response(view(*args, **kwargs))
+        if response.status_code == 200 and not response.is_streamed and not _maybe_lagging(cache):
+            cache.set(key, {
+                'body': response.get_data(as_text=True),
+                'status': response.status_code,
+                'headers': {name: response.headers[name] for name in CACHED_HEADERS if name in response.headers}
+            })
+        response.headers['X-Cache'] = 'MISS'
+        return response
+    return decorated
+
+
+# ------------------ INVALIDATION ------------------
+def _mark_dirty(session):
+    session.info['response_cache_dirty'] = True
+
+
+def _after_flush(session, flush_context):
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        table = getattr(obj, '__tablename__', None)
+        if table in WATCHED_TABLES:
+            _mark_dirty(session)
+            return
+
+
+def _do_orm_execute(orm_execute_state):
+    # Bulk insert(...) / update(...) / delete(...) statements bypass the flush
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, 'table', None)
+        if getattr(table, 'name', None) in WATCHED_TABLES:
+            _mark_dirty(orm_execute_state.session)
+
+
+def _after_commit(session):
+    if session.in_nested_transaction():
+        # A released savepoint: nothing is visible to other sessions before the outer commit
+        return
+    if session.info.pop('response_cache_dirty', False):
+        try:
+            # Created on demand, so writes from job processes reach a shared store too
+            cache = get_response_cache()
+        except RuntimeError:
+            return
+        if cache is not None:
+            cache.invalidate()
+
+
+def _after_soft_rollback(session, previous_transaction):
+    # A rolled-back savepoint (begin_nested) leaves the outer transaction and
+    # the writes it already flushed in place; only an outermost rollback
+    # discards them.
+    if not previous_transaction.nested:
+        session.info.pop('response_cache_dirty', None)
+
+
+_listeners_registered = False
+
+
+def register_response_cache_listeners():
+    """Invalidates cached responses whenever a commit wrote bills, invoices, plans, projects or sellers."""
+    global _listeners_registered
+    if _listeners_registered:
+        return
+    event.listen(db.session, 'after_flush', _after_flush)
+    event.listen(db.session, 'do_orm_execute', _do_orm_execute)
+    event.listen(db.session, 'after_commit', _after_commit)
+    event.listen(db.session, 'after_soft_rollback', _after_soft_rollback)
+    _listeners_registered = True
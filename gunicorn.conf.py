@@ -0,0 +1,82 @@
+# Production launcher: gunicorn -c gunicorn.conf.py wsgi:app
+#
+# The app is loaded once in the master (database bootstrap, route setup) and
+# forked into WEB_CONCURRENCY workers of GUNICORN_THREADS threads each. Every
+# worker drops the connection pool it inherited and opens its own. Unless
+# SCHEDULER_ENABLED=false (or WEB_SCHEDULER=false), one worker per host competes
+# for the cluster-wide scheduler lease, and only the lease holder runs the
+# APScheduler jobs (see app.scheduling).
+#
+# Reload:   kill -HUP <master>   replaces the workers gracefully (config changes)
+# Deploy:   kill -USR2 <master>  starts a new master with the new code, then
+#           kill -QUIT <old master> once the new workers are serving
+import multiprocessing
+import os
+
+# The master must not run scheduled jobs: with WEB_SCHEDULER on, the workers elect
+# one candidate after fork. WEB_SCHEDULER defaults to the operator's SCHEDULER_ENABLED,
+# recorded before it is overridden below; the environment keeps it across HUP reloads
+# and USR2 re-execs, which evaluate this file again.
+os.environ.setdefault('WEB_SCHEDULER', os.environ.get('SCHEDULER_ENABLED', 'true'))
+web_scheduler = os.environ['WEB_SCHEDULER'].lower() == 'true'
+os.environ['SCHEDULER_ENABLED'] = 'false'
+
+bind = os.environ.get('GUNICORN_BIND', f"0.0.0.0:{os.environ.get('PORT', 5021)}")
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+worker_class = 'gthread'
+# Keep DB_POOL_SIZE + DB_MAX_OVERFLOW >= threads so no thread waits for a connection
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+preload_app = True
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+# Recycle workers periodically; the jitter keeps them from restarting together
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 10000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 1000))
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+
+def on_starting(server):
+    # A per-process response cache only sees the invalidations of its own worker;
+    # writes from other workers, the scheduler and the event consumers would be missed
+    backend = server.app.wsgi().config['RESPONSE_CACHE_BACKEND']
+    if backend == 'lru' and server.cfg.workers > 1:
+        raise RuntimeError("RESPONSE_CACHE_BACKEND=lru is per process; use 'redis' or 'none' with several workers")
+
+
+def when_ready(server):
+    from app.database_engine import dispose_engines
+
+    # Close the master's own connections (database bootstrap) before workers fork
+    dispose_engines(server.app.wsgi(), close=True)
+
+
+def post_fork(server, worker):
+    from app.database_engine import dispose_engines
+    from app.scheduling import pin_scheduler_to_one_worker
+
+    app = worker.app.wsgi()
+    dispose_engines(app)
+    if web_scheduler:
+        pin_scheduler_to_one_worker(app)
+
+
+def post_worker_init(worker):
+    from app.database_engine import pool_health
+
+    app = worker.app.wsgi()
+    with app.app_context():
+        healthy, report = pool_health()
+    if not healthy:
+        worker.log.warning("Worker %s started with an unhealthy database pool: %s", worker.pid, report['engines'])
+
+
+def worker_exit(server, worker):
+    from app.scheduling import stop_scheduler
+
+    stop_scheduler(worker.app.wsgi())
@@ -0,0 +1,72 @@
+"""settlement ledger
+
+Revision ID: a3d9e7f1c5b8
+Revises: f2c8d1a7b4e3
+Create Date: 2026-10-18 15:06:37.281945
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3d9e7f1c5b8'
+down_revision = 'f2c8d1a7b4e3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('settlement_payouts',
+    sa.Column('id', sa.String(length=36), nullable=False),
+    sa.Column('party_type', sa.String(length=20), nullable=False),
+    sa.Column('party_id', sa.String(length=36), nullable=False),
+    sa.Column('currency', sa.String(length=3), nullable=False),
+    sa.Column('period', sa.String(length=20), nullable=False),
+    sa.Column('amount', sa.BigInteger(), nullable=False),
+    sa.Column('entry_count', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('destination_account', sa.String(length=255), nullable=True),
+    sa.Column('transfer_id', sa.String(length=255), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('paid_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('settlement_payouts', schema=None) as batch_op:
+        batch_op.create_index('ix_settlement_payouts_status_next_attempt_at', ['status', 'next_attempt_at'], unique=False)
+
+    op.create_table('settlement_entries',
+    sa.Column('id', sa.String(length=36), nullable=False),
+    sa.Column('invoice_id', sa.String(length=36), nullable=False),
+    sa.Column('party_type', sa.String(length=20), nullable=False),
+    sa.Column('party_id', sa.String(length=36), nullable=False),
+    sa.Column('amount', sa.BigInteger(), nullable=False),
+    sa.Column('currency', sa.String(length=3), nullable=False),
+    sa.Column('period', sa.String(length=20), nullable=False),
+    sa.Column('source_transaction', sa.String(length=255), nullable=True),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('payout_id', sa.String(length=36), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['invoice_id'], ['invoices.id'], ),
+    sa.ForeignKeyConstraint(['payout_id'], ['settlement_payouts.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('invoice_id', 'party_type', name='uq_settlement_entries_invoice_party')
+    )
+    with op.batch_alter_table('settlement_entries', schema=None) as batch_op:
+        batch_op.create_index('ix_settlement_entries_status_period', ['status', 'period'], unique=False)
+        batch_op.create_index('ix_settlement_entries_payout_id', ['payout_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('settlement_entries', schema=None) as batch_op:
+        batch_op.drop_index('ix_settlement_entries_payout_id')
+        batch_op.drop_index('ix_settlement_entries_status_period')
+
+    op.drop_table('settlement_entries')
+    with op.batch_alter_table('settlement_payouts', schema=None) as batch_op:
+        batch_op.drop_index('ix_settlement_payouts_status_next_attempt_at')
+
+    op.drop_table('settlement_payouts')
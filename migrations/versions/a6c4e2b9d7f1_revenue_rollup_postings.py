@@ -0,0 +1,36 @@
+"""revenue rollup postings
+
+Revision ID: a6c4e2b9d7f1
+Revises: c5f1a8d3e7b2
+Create Date: 2026-10-18 19:12:08.417305
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a6c4e2b9d7f1'
+down_revision = 'c5f1a8d3e7b2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('revenue_rollup_postings',
+    sa.Column('bill_id', sa.String(length=36), nullable=False),
+    sa.Column('tier1_seller_id', sa.String(length=36), nullable=False),
+    sa.Column('tier2_seller_id', sa.String(length=36), nullable=False),
+    sa.Column('plan_id', sa.String(length=36), nullable=False),
+    sa.Column('month', sa.Date(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('amount', sa.Numeric(precision=14, scale=2), nullable=False),
+    sa.Column('admin_commission', sa.Numeric(precision=14, scale=4), nullable=False),
+    sa.Column('tier1_commission', sa.Numeric(precision=14, scale=4), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('bill_id')
+    )
+
+
+def downgrade():
+    op.drop_table('revenue_rollup_postings')
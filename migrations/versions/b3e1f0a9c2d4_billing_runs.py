@@ -0,0 +1,40 @@
+"""billing runs
+
+Revision ID: b3e1f0a9c2d4
+Revises: 4cf52fd0b30b
+Create Date: 2026-10-18 09:12:44.318201
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3e1f0a9c2d4'
+down_revision = '4cf52fd0b30b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('billing_runs',
+    sa.Column('id', sa.String(length=36), nullable=False),
+    sa.Column('run_date', sa.Date(), nullable=False),
+    sa.Column('shard', sa.Integer(), nullable=False),
+    sa.Column('shard_count', sa.Integer(), nullable=False),
+    sa.Column('partition_by', sa.String(length=20), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('last_project_id', sa.String(length=36), nullable=False),
+    sa.Column('projects_billed', sa.Integer(), nullable=False),
+    sa.Column('chunks', sa.Integer(), nullable=False),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('run_date', 'shard', 'shard_count', 'partition_by', name='uq_billing_runs_shard')
+    )
+
+
+def downgrade():
+    op.drop_table('billing_runs')
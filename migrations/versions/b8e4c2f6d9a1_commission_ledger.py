@@ -0,0 +1,56 @@
+"""commission ledger
+
+Revision ID: b8e4c2f6d9a1
+Revises: a3d9e7f1c5b8
+Create Date: 2026-10-18 15:48:12.530274
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8e4c2f6d9a1'
+down_revision = 'a3d9e7f1c5b8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('commission_ledger_entries',
+    sa.Column('id', sa.String(length=36), nullable=False),
+    sa.Column('invoice_id', sa.String(length=36), nullable=False),
+    sa.Column('leg', sa.Integer(), nullable=False),
+    sa.Column('account_type', sa.String(length=20), nullable=False),
+    sa.Column('account_id', sa.String(length=36), nullable=False),
+    sa.Column('entry_type', sa.String(length=30), nullable=False),
+    sa.Column('amount', sa.BigInteger(), nullable=False),
+    sa.Column('currency', sa.String(length=3), nullable=False),
+    sa.Column('month', sa.Date(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['invoice_id'], ['invoices.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('invoice_id', 'leg', name='uq_commission_ledger_entries_invoice_leg')
+    )
+    with op.batch_alter_table('commission_ledger_entries', schema=None) as batch_op:
+        batch_op.create_index('ix_commission_ledger_entries_account', ['account_type', 'account_id'], unique=False)
+
+    op.create_table('commission_balances',
+    sa.Column('account_type', sa.String(length=20), nullable=False),
+    sa.Column('account_id', sa.String(length=36), nullable=False),
+    sa.Column('currency', sa.String(length=3), nullable=False),
+    sa.Column('month', sa.Date(), nullable=False),
+    sa.Column('credits', sa.BigInteger(), nullable=False),
+    sa.Column('debits', sa.BigInteger(), nullable=False),
+    sa.Column('entry_count', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('account_type', 'account_id', 'currency', 'month')
+    )
+
+
+def downgrade():
+    op.drop_table('commission_balances')
+    with op.batch_alter_table('commission_ledger_entries', schema=None) as batch_op:
+        batch_op.drop_index('ix_commission_ledger_entries_account')
+
+    op.drop_table('commission_ledger_entries')
@@ -0,0 +1,36 @@
+"""stripe event retry backoff
+
+Revision ID: b9d3f7a1c6e4
+Revises: a6c4e2b9d7f1
+Create Date: 2026-10-18 20:41:36.209514
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b9d3f7a1c6e4'
+down_revision = 'a6c4e2b9d7f1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('stripe_events', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('next_attempt_at', sa.DateTime(), nullable=True))
+
+    # Events already in the inbox are due right away
+    op.execute('UPDATE stripe_events SET next_attempt_at = received_at')
+
+    with op.batch_alter_table('stripe_events', schema=None) as batch_op:
+        batch_op.alter_column('next_attempt_at', existing_type=sa.DateTime(), nullable=False)
+        batch_op.drop_index('ix_stripe_events_status_received_at')
+        batch_op.create_index('ix_stripe_events_status_next_attempt_at', ['status', 'next_attempt_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('stripe_events', schema=None) as batch_op:
+        batch_op.drop_index('ix_stripe_events_status_next_attempt_at')
+        batch_op.create_index('ix_stripe_events_status_received_at', ['status', 'received_at'], unique=False)
+        batch_op.drop_column('next_attempt_at')
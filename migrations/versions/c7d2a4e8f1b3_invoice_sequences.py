@@ -0,0 +1,29 @@
+"""invoice sequences
+
+Revision ID: c7d2a4e8f1b3
+Revises: b3e1f0a9c2d4
+Create Date: 2026-10-18 10:02:17.554930
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7d2a4e8f1b3'
+down_revision = 'b3e1f0a9c2d4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('invoice_sequences',
+    sa.Column('period', sa.String(length=20), nullable=False),
+    sa.Column('next_value', sa.BigInteger(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('period')
+    )
+
+
+def downgrade():
+    op.drop_table('invoice_sequences')
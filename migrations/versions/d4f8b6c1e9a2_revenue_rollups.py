@@ -0,0 +1,36 @@
+"""revenue rollups
+
+Revision ID: d4f8b6c1e9a2
+Revises: c7d2a4e8f1b3
+Create Date: 2026-10-18 11:24:50.902113
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4f8b6c1e9a2'
+down_revision = 'c7d2a4e8f1b3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('revenue_rollups',
+    sa.Column('tier1_seller_id', sa.String(length=36), nullable=False),
+    sa.Column('tier2_seller_id', sa.String(length=36), nullable=False),
+    sa.Column('plan_id', sa.String(length=36), nullable=False),
+    sa.Column('month', sa.Date(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('bill_count', sa.Integer(), nullable=False),
+    sa.Column('amount', sa.Numeric(precision=14, scale=2), nullable=False),
+    sa.Column('admin_commission', sa.Numeric(precision=14, scale=4), nullable=False),
+    sa.Column('tier1_commission', sa.Numeric(precision=14, scale=4), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('tier1_seller_id', 'tier2_seller_id', 'plan_id', 'month', 'status')
+    )
+
+
+def downgrade():
+    op.drop_table('revenue_rollups')
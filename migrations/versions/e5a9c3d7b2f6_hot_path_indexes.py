@@ -0,0 +1,61 @@
+"""hot path indexes
+
+Revision ID: e5a9c3d7b2f6
+Revises: d4f8b6c1e9a2
+Create Date: 2026-10-18 13:40:08.117462
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5a9c3d7b2f6'
+down_revision = 'd4f8b6c1e9a2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('projects', schema=None) as batch_op:
+        batch_op.create_index('ix_projects_tier1_seller_id_tier2_seller_id', ['tier1_seller_id', 'tier2_seller_id'], unique=False)
+        batch_op.create_index('ix_projects_tier2_seller_id', ['tier2_seller_id'], unique=False)
+        batch_op.create_index('ix_projects_status_next_billing_date', ['status', 'next_billing_date'], unique=False)
+        # Partial index: the billing job only ever looks at active projects
+        batch_op.create_index('ix_projects_active_next_billing_date', ['next_billing_date', 'id'], unique=False,
+                              postgresql_where=sa.text("status = 'active'"),
+                              sqlite_where=sa.text("status = 'active'"))
+
+    with op.batch_alter_table('project_billing', schema=None) as batch_op:
+        batch_op.create_index('ix_project_billing_project_id_status', ['project_id', 'status'], unique=False)
+
+    with op.batch_alter_table('invoices', schema=None) as batch_op:
+        batch_op.create_index('ix_invoices_paid_date_status', ['paid_date', 'status'], unique=False)
+
+    with op.batch_alter_table('tier2_sellers', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_tier2_sellers_tier1_seller_id'), ['tier1_seller_id'], unique=False)
+
+    with op.batch_alter_table('revenue_rollups', schema=None) as batch_op:
+        batch_op.create_index('ix_revenue_rollups_tier2_seller_id', ['tier2_seller_id'], unique=False)
+        batch_op.create_index('ix_revenue_rollups_month_status', ['month', 'status'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('revenue_rollups', schema=None) as batch_op:
+        batch_op.drop_index('ix_revenue_rollups_month_status')
+        batch_op.drop_index('ix_revenue_rollups_tier2_seller_id')
+
+    with op.batch_alter_table('tier2_sellers', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_tier2_sellers_tier1_seller_id'))
+
+    with op.batch_alter_table('invoices', schema=None) as batch_op:
+        batch_op.drop_index('ix_invoices_paid_date_status')
+
+    with op.batch_alter_table('project_billing', schema=None) as batch_op:
+        batch_op.drop_index('ix_project_billing_project_id_status')
+
+    with op.batch_alter_table('projects', schema=None) as batch_op:
+        batch_op.drop_index('ix_projects_active_next_billing_date')
+        batch_op.drop_index('ix_projects_status_next_billing_date')
+        batch_op.drop_index('ix_projects_tier2_seller_id')
+        batch_op.drop_index('ix_projects_tier1_seller_id_tier2_seller_id')
@@ -0,0 +1,62 @@
+from datetime import date
+
+import pytest
+from flask_jwt_extended import create_access_token
+
+from app import create_app, db
+from app.config import Config
+
+
+@pytest.fixture
+def make_app(tmp_path, monkeypatch):
+    """Builds an app on a fresh SQLite file; keyword arguments override Config."""
+    def factory(**overrides):
+        settings = {
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'primary.db'}",
+            'JWT_SECRET_KEY': 'test-secret',
+            'SCHEDULER_ENABLED': False,
+            **overrides,
+        }
+        for name, value in settings.items():
+            monkeypatch.setattr(Config, name, value, raising=False)
+        return create_app()
+    return factory
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app()
+
+
+def seed(app):
+    """An admin, a Tier-1 and a Tier-2 seller and a plan with one project per seller; returns their ids."""
+    from app.models import Admin, Project, Tier1Seller, Tier2Seller
+    from app.models.project import SubscriptionPlan
+
+    with app.app_context():
+        admin = Admin(name='Admin', email='admin@test', password_hash='x')
+        tier1 = Tier1Seller(name='Tier 1', admin_email='tier1@test', password_hash='x', subdomain='tier1')
+        db.session.add_all([admin, tier1])
+        db.session.flush()
+        tier2 = Tier2Seller(name='Tier 2', admin_email='tier2@test', password_hash='x',
+                            tier1_seller_id=tier1.id, subdomain='tier2')
+        plan = SubscriptionPlan(name='Plan', price=100, creator_id=admin.id, creator_type='admin',
+                                admin_commission_pct=10, tier1_commission_pct=20)
+        db.session.add_all([tier2, plan])
+        db.session.flush()
+        direct = Project(name='Direct', tier1_seller_id=tier1.id, subscription_plan_id=plan.id,
+                         next_billing_date=date.today())
+        resold = Project(name='Resold', tier1_seller_id=tier1.id, tier2_seller_id=tier2.id,
+                         subscription_plan_id=plan.id, next_billing_date=date.today())
+        db.session.add_all([direct, resold])
+        db.session.commit()
+        return {
+            'admin': admin.id, 'tier1': tier1.id, 'tier2': tier2.id, 'plan': plan.id,
+            'direct_project': direct.id, 'resold_project': resold.id,
+        }
+
+
+def auth_headers(app, user_id, role):
+    with app.app_context():
+        token = create_access_token(identity=user_id, additional_claims={'role': role})
+    return {'Authorization': f"Bearer {token}"}
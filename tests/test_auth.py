@@ -0,0 +1,27 @@
+import time
+
+from app import db
+from app.models import Admin
+from app.utils import auth
+
+from conftest import auth_headers, seed
+
+
+def test_bulk_deleted_user_loses_access_after_the_cache_ttl(make_app, monkeypatch):
+    monkeypatch.setattr(auth, '_principal_cache', None)
+    app = make_app(PRINCIPAL_CACHE_TTL=1)
+    ids = seed(app)
+    client = app.test_client()
+    headers = auth_headers(app, ids['admin'], 'admin')
+
+    first = client.post('/api/seller/tier1', json={'name': 'One', 'admin_email': 'one@test'}, headers=headers)
+    assert first.status_code == 201
+
+    # A bulk delete fires no mapper events, so the cached principal is not dropped
+    with app.app_context():
+        Admin.query.filter_by(id=ids['admin']).delete()
+        db.session.commit()
+    time.sleep(1.1)
+
+    second = client.post('/api/seller/tier1', json={'name': 'Two', 'admin_email': 'two@test'}, headers=headers)
+    assert second.status_code == 403
@@ -0,0 +1,37 @@
+import pytest
+
+from conftest import auth_headers, seed
+
+
+@pytest.mark.parametrize('path, field', [
+    ('/api/billing/bill/create-batch', 'project_ids'),
+    ('/api/billing/invoice/generate-batch', 'bill_ids'),
+])
+@pytest.mark.parametrize('bad_ids', [[{'id': 'x'}], [['x']], ['x', None], [True]])
+def test_batch_rejects_ids_that_are_not_strings_or_integers(app, path, field, bad_ids):
+    ids = seed(app)
+    response = app.test_client().post(path, json={field: bad_ids},
+                                      headers=auth_headers(app, ids['admin'], 'admin'))
+
+    assert response.status_code == 400
+    assert response.get_json()['message'] == f'{field} must contain only strings or integers'
+
+
+def test_batch_rejects_a_body_that_is_not_an_object(app):
+    ids = seed(app)
+    response = app.test_client().post('/api/billing/bill/create-batch', json=[ids['direct_project']],
+                                      headers=auth_headers(app, ids['admin'], 'admin'))
+
+    assert response.status_code == 400
+
+
+def test_batch_reports_each_id(app):
+    ids = seed(app)
+    client = app.test_client()
+    headers = auth_headers(app, ids['admin'], 'admin')
+
+    created = client.post('/api/billing/bill/create-batch', headers=headers,
+                          json={'project_ids': [ids['direct_project'], ids['direct_project'], 42]})
+
+    assert created.status_code == 201
+    assert [item['success'] for item in created.get_json()['results']] == [True, False, False]
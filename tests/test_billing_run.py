@@ -0,0 +1,87 @@
+from datetime import date
+
+from dateutil.relativedelta import relativedelta
+import pytest
+
+from app import db
+from app.models import Project
+from app import tasks
+from app.models.billing import BillingRun, Invoice, ProjectBilling
+from app.tasks import run_billing
+
+from conftest import seed
+
+
+def _due_projects(app, count):
+    """The seed's two due projects plus `count` more on the same plan; returns all their ids."""
+    ids = seed(app)
+    with app.app_context():
+        for number in range(count):
+            db.session.add(Project(name=f"Project {number}", tier1_seller_id=ids['tier1'],
+                                   subscription_plan_id=ids['plan'], next_billing_date=date.today()))
+        db.session.commit()
+        return sorted(project.id for project in Project.query.all())
+
+
+def test_due_projects_are_billed_in_chunks(app):
+    project_ids = _due_projects(app, 3)
+    with app.app_context():
+        report = run_billing(chunk_size=2)
+
+        assert (report['projects_billed'], report['chunks']) == (5, 3)
+        bills = ProjectBilling.query.all()
+        assert sorted(bill.project_id for bill in bills) == project_ids
+        assert {bill.amount for bill in bills} == {100}
+        invoices = Invoice.query.all()
+        assert {invoice.billing_record_id for invoice in invoices} == {bill.id for bill in bills}
+        assert len({invoice.invoice_number for invoice in invoices}) == 5
+        next_month = date.today() + relativedelta(months=1)
+        assert {project.next_billing_date for project in Project.query.all()} == {next_month}
+
+        # Nothing is due any more
+        assert run_billing(chunk_size=2)['projects_billed'] == 0
+        assert ProjectBilling.query.count() == 5
+
+
+
+def test_failed_run_resumes_after_the_last_committed_chunk(app, monkeypatch):
+    project_ids = _due_projects(app, 3)
+    bill_chunk = tasks._bill_chunk
+    chunks = []
+
+    def failing_second_chunk(rows, today):
+        chunks.append(rows)
+        if len(chunks) == 2:
+            raise RuntimeError('connection lost')
+        bill_chunk(rows, today)
+    monkeypatch.setattr(tasks, '_bill_chunk', failing_second_chunk)
+
+    with app.app_context():
+        with pytest.raises(RuntimeError):
+            run_billing(chunk_size=2)
+
+        run = BillingRun.query.one()
+        assert (run.status, run.error) == ('failed', 'connection lost')
+        assert (run.last_project_id, run.projects_billed, run.chunks) == (project_ids[1], 2, 1)
+        assert sorted(bill.project_id for bill in ProjectBilling.query.all()) == project_ids[:2]
+
+        report = run_billing(chunk_size=2)
+
+        assert report['resumed_from'] == project_ids[1]
+        assert (report['projects_billed'], report['chunks']) == (3, 2)
+        assert sorted(bill.project_id for bill in ProjectBilling.query.all()) == project_ids
+        run = BillingRun.query.one()
+        assert (run.status, run.projects_billed, run.chunks) == ('completed', 5, 3)
+
+def test_sharded_run_is_rejected_on_sqlite(app):
+    result = app.test_cli_runner().invoke(args=['billing', 'run', '--shards', '2'])
+
+    assert result.exit_code == 2
+    assert "Sharded billing needs PostgreSQL" in result.output
+    with app.app_context(), pytest.raises(ValueError):
+        run_billing(shard=0, shard_count=2)
+
+
+def test_sharded_configuration_fails_at_startup_on_sqlite(make_app):
+    with pytest.raises(RuntimeError, match='BILLING_SHARDS'):
+        make_app(BILLING_SHARDS=2)
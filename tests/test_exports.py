@@ -0,0 +1,106 @@
+from datetime import date, datetime
+from decimal import Decimal
+import csv
+import gzip
+import io
+import json
+import sys
+
+import pytest
+
+from app import db
+from app.models.billing import ProjectBilling
+from app.services.exports import EXPORT_COLUMNS, ExportError, export_chunks
+
+from conftest import auth_headers, seed
+
+NAMES = [name for name, _, _ in EXPORT_COLUMNS]
+
+
+def _row(number):
+    """One export row: a bill with its invoice, typed the way the database returns them."""
+    values = {name: f"{name}-{number}" for name, _, kind in EXPORT_COLUMNS if kind == 'string'}
+    values.update({
+        'amount': Decimal('100.00'), 'plan_price': Decimal('100.00'), 'invoice_total': Decimal('100.00'),
+        'admin_commission_pct': Decimal('10.00'), 'tier1_commission_pct': Decimal('20.00'),
+        'bill_due_date': date(2026, 10, 15), 'issue_date': date(2026, 10, 1), 'invoice_due_date': date(2026, 10, 15),
+        'paid_date': None, 'bill_created_at': datetime(2026, 10, 1, 5, 0, number),
+    })
+    return tuple(values[name] for name in NAMES)
+
+
+BATCHES = [[_row(1), _row(2)], [_row(3)]]
+
+
+def test_csv_has_a_header_and_one_chunk_per_batch():
+    chunks = list(export_chunks('csv', iter(BATCHES)))
+
+    assert len(chunks) == 2
+    rows = list(csv.reader(io.StringIO(b''.join(chunks).decode())))
+    assert rows[0] == NAMES
+    assert [row[NAMES.index('bill_id')] for row in rows[1:]] == ['bill_id-1', 'bill_id-2', 'bill_id-3']
+    assert rows[1][NAMES.index('amount')] == '100.00'
+    assert rows[1][NAMES.index('paid_date')] == ''
+
+
+def test_ndjson_writes_one_object_per_row():
+    chunks = list(export_chunks('ndjson', iter(BATCHES)))
+
+    assert len(chunks) == 2
+    records = [json.loads(line) for line in b''.join(chunks).decode().splitlines()]
+    assert [record['bill_id'] for record in records] == ['bill_id-1', 'bill_id-2', 'bill_id-3']
+    assert records[0]['amount'] == '100.00'
+    assert records[0]['bill_due_date'] == '2026-10-15'
+    assert records[0]['bill_created_at'] == '2026-10-01T05:00:01'
+    assert records[0]['paid_date'] is None
+
+
+@pytest.mark.parametrize('fmt', ['csv', 'ndjson'])
+def test_gzip_stream_decompresses_to_the_plain_export(fmt):
+    plain = b''.join(export_chunks(fmt, iter(BATCHES)))
+    compressed = b''.join(export_chunks(fmt, iter(BATCHES), compress=True))
+
+    assert gzip.decompress(compressed) == plain
+
+
+def test_parquet_writes_one_row_group_per_batch():
+    pq = pytest.importorskip('pyarrow.parquet')
+
+    data = b''.join(export_chunks('parquet', iter(BATCHES)))
+
+    parquet = pq.ParquetFile(io.BytesIO(data))
+    assert parquet.metadata.num_row_groups == 2
+    table = parquet.read()
+    assert table.column_names == NAMES
+    assert table.column('bill_id').to_pylist() == ['bill_id-1', 'bill_id-2', 'bill_id-3']
+    assert table.column('amount').to_pylist()[0] == Decimal('100.00')
+
+
+def test_parquet_without_pyarrow_is_an_export_error(monkeypatch):
+    monkeypatch.setitem(sys.modules, 'pyarrow', None)
+
+    with pytest.raises(ExportError, match='pyarrow'):
+        export_chunks('parquet', iter(BATCHES))
+
+
+def test_unknown_format_is_an_export_error():
+    with pytest.raises(ExportError):
+        export_chunks('xlsx', iter(BATCHES))
+
+
+def test_export_endpoint_streams_every_bill(app):
+    ids = seed(app)
+    with app.app_context():
+        for project_id in (ids['direct_project'], ids['resold_project']):
+            db.session.add(ProjectBilling(project_id=project_id, billing_type='Monthly Retainer', amount=100,
+                                          status='pending'))
+        db.session.commit()
+    client = app.test_client()
+
+    response = client.get('/api/billing/export?format=ndjson&gzip=1', headers=auth_headers(app, ids['admin'], 'admin'))
+
+    assert response.status_code == 200
+    assert response.mimetype == 'application/gzip'
+    records = [json.loads(line) for line in gzip.decompress(response.data).decode().splitlines()]
+    assert sorted(record['project_id'] for record in records) == sorted([ids['direct_project'], ids['resold_project']])
+    assert client.get('/api/billing/export', headers=auth_headers(app, ids['tier1'], 'tier1_seller')).status_code == 403
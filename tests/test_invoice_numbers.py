@@ -0,0 +1,46 @@
+from sqlalchemy import false
+
+from app import db
+from app.models.billing import InvoiceSequence
+from app.services import invoice_numbers
+from app.services.invoice_numbers import allocate_invoice_numbers, next_invoice_number
+
+
+def test_numbers_are_consecutive_per_period(app):
+    with app.app_context():
+        assert allocate_invoice_numbers(3, '202610') == [
+            'INV-202610-00000001', 'INV-202610-00000002', 'INV-202610-00000003'
+        ]
+        assert next_invoice_number('202610') == 'INV-202610-00000004'
+        assert next_invoice_number('202611') == 'INV-202611-00000001'
+        assert allocate_invoice_numbers(0, '202610') == []
+        assert db.session.get(InvoiceSequence, '202610').next_value == 5
+
+
+def test_numbers_reserved_by_a_rolled_back_caller_are_not_reused(app):
+    with app.app_context():
+        first = next_invoice_number('202610')
+        db.session.rollback()
+
+        assert next_invoice_number('202610') != first
+
+
+def test_concurrent_first_number_of_a_period_bumps_the_other_counter(app, monkeypatch):
+    with app.app_context():
+        # Another process created the period's counter and handed out 1-4 after
+        # our UPDATE found no row, so our INSERT of the counter collides.
+        db.session.add(InvoiceSequence(period='202610', next_value=5))
+        db.session.commit()
+        update = invoice_numbers.update
+        updates = []
+
+        def update_racing_the_insert(table):
+            updates.append(table)
+            statement = update(table)
+            return statement.where(false()) if len(updates) == 1 else statement
+        monkeypatch.setattr(invoice_numbers, 'update', update_racing_the_insert)
+
+        assert allocate_invoice_numbers(2, '202610') == ['INV-202610-00000005', 'INV-202610-00000006']
+        assert len(updates) == 2
+        db.session.expire_all()
+        assert db.session.get(InvoiceSequence, '202610').next_value == 7
@@ -0,0 +1,79 @@
+from datetime import date
+
+from sqlalchemy import event
+
+from app import db
+from app.models.billing import Invoice, ProjectBilling
+from app.models.ledger import CommissionLedgerEntry
+from app.services import ledger
+
+from conftest import seed
+
+
+def _paid_invoice(project_id, number):
+    bill = ProjectBilling(project_id=project_id, billing_type='Monthly Retainer', amount=100, status='paid')
+    db.session.add(bill)
+    db.session.flush()
+    db.session.add(Invoice(billing_record_id=bill.id, project_id=project_id, invoice_number=f"INV-{number}",
+                           total_amount=100, issue_date=date.today(), due_date=date.today(),
+                           status='paid', paid_date=date.today()))
+
+
+def test_backfill_commits_one_chunk_at_a_time(app):
+    ids = seed(app)
+    with app.app_context():
+        for number in range(5):
+            _paid_invoice(ids['direct_project'] if number % 2 else ids['resold_project'], number)
+        db.session.commit()
+
+        commits = []
+        listener = lambda session: commits.append(1)
+        event.listen(db.session, 'after_commit', listener)
+        try:
+            report = ledger.backfill_ledger(batch_size=2)
+        finally:
+            event.remove(db.session, 'after_commit', listener)
+
+        assert report['invoices_posted'] == 5
+        # three chunks of invoices, then the balance rebuild
+        assert len(commits) == 4
+        assert db.session.query(CommissionLedgerEntry.invoice_id).distinct().count() == 5
+        # direct: 10.00 each x2; resold: 20.00 x 10% = 2.00 each x3
+        assert ledger.account_totals('admin') == (26, 0)
+
+        assert ledger.backfill_ledger(batch_size=2)['invoices_posted'] == 0
+        assert ledger.account_totals('admin') == (26, 0)
+
+
+def test_backfill_loads_sellers_and_plans_once_per_chunk(app):
+    from app.models import Project, Tier2Seller
+    from app.models.project import SubscriptionPlan
+
+    ids = seed(app)
+    with app.app_context():
+        for number in range(4):
+            tier2 = Tier2Seller(name=f"Tier 2 #{number}", admin_email=f"t2-{number}@test", password_hash='x',
+                                tier1_seller_id=ids['tier1'], subdomain=f"t2-{number}")
+            plan = SubscriptionPlan(name=f"Plan {number}", price=100, creator_id=ids['admin'], creator_type='admin',
+                                    admin_commission_pct=10, tier1_commission_pct=20)
+            db.session.add_all([tier2, plan])
+            db.session.flush()
+            project = Project(name=f"Resold {number}", tier1_seller_id=ids['tier1'], tier2_seller_id=tier2.id,
+                              subscription_plan_id=plan.id, next_billing_date=date.today())
+            db.session.add(project)
+            db.session.flush()
+            _paid_invoice(project.id, number)
+        db.session.commit()
+        db.session.expunge_all()
+
+        statements = []
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            assert ledger.backfill_ledger(batch_size=10)['invoices_posted'] == 4
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+
+        selects = [s for s in statements if s.lstrip().upper().startswith('SELECT')]
+        assert len([s for s in selects if 'FROM tier2_sellers' in s]) == 1
+        assert len([s for s in selects if 'FROM subscription_plans' in s]) == 1
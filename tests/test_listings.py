@@ -0,0 +1,58 @@
+import pytest
+
+from conftest import auth_headers, seed
+
+
+@pytest.mark.parametrize('path', ['/api/seller/tier1', '/api/projects/'])
+def test_listing_returns_everything_without_pagination_arguments(app, path):
+    ids = seed(app)
+    client = app.test_client()
+    headers = auth_headers(app, ids['admin'], 'admin')
+
+    response = client.get(path, headers=headers)
+
+    assert response.status_code == 200
+    assert len(response.get_json()) == 2
+    assert 'X-Next-Cursor' not in response.headers
+
+
+@pytest.mark.parametrize('path', ['/api/seller/tier1', '/api/projects/'])
+def test_listing_pages_with_limit_and_after(app, path):
+    ids = seed(app)
+    client = app.test_client()
+    headers = auth_headers(app, ids['admin'], 'admin')
+
+    first = client.get(path, query_string={'limit': 1}, headers=headers)
+    cursor = first.headers['X-Next-Cursor']
+    second = client.get(path, query_string={'limit': 1, 'after': cursor}, headers=headers)
+
+    assert len(first.get_json()) == len(second.get_json()) == 1
+    assert first.get_json()[0]['id'] == cursor
+    assert second.get_json()[0]['id'] > cursor
+    assert 'X-Next-Cursor' not in second.headers
+
+
+def test_revenue_returns_every_bill_without_pagination_arguments(app):
+    from app import db
+    from app.models.billing import ProjectBilling
+
+    ids = seed(app)
+    with app.app_context():
+        db.session.add_all([
+            ProjectBilling(project_id=project_id, billing_type='Monthly Retainer', amount=100, status='pending')
+            for project_id in [ids['direct_project'], ids['resold_project']] * 2
+        ])
+        db.session.commit()
+    client = app.test_client()
+    headers = auth_headers(app, ids['admin'], 'admin')
+
+    def bill_count(response):
+        return sum(len(rows) for name, rows in response.get_json().items() if name != 'summary')
+
+    everything = client.get('/api/billing/revenue', headers=headers)
+    page = client.get('/api/billing/revenue', query_string={'limit': 3}, headers=headers)
+
+    assert bill_count(everything) == 4
+    assert 'X-Next-Cursor' not in everything.headers
+    assert bill_count(page) == 3
+    assert 'X-Next-Cursor' in page.headers
@@ -0,0 +1,100 @@
+from datetime import date
+
+import pytest
+
+from app import db
+from app.models.billing import Invoice, ProjectBilling
+from app.models.project import SubscriptionPlan
+from app.services.payment_gateway import PaymentGatewayError, get_gateway
+
+from conftest import auth_headers, seed
+
+
+@pytest.fixture
+def payment(make_app):
+    """A fake-gateway app with one sent invoice on the Tier-1 seller's direct project."""
+    app = make_app(PAYMENT_GATEWAY='fake', PAYMENT_FAKE_LATENCY_MS=0, PAYMENT_FAKE_FAILURE_RATE=0,
+                   PAYMENT_FAKE_WEBHOOK_DELAY_MS=600000)
+    ids = seed(app)
+    with app.app_context():
+        bill = ProjectBilling(project_id=ids['direct_project'], billing_type='Monthly Retainer', amount=100,
+                              status='invoiced')
+        db.session.add(bill)
+        db.session.flush()
+        db.session.add(Invoice(billing_record_id=bill.id, project_id=ids['direct_project'], invoice_number='INV-1',
+                               total_amount=100, issue_date=date.today(), due_date=date.today(), status='sent'))
+        db.session.commit()
+
+    def pay():
+        return app.test_client().post('/api/billing/invoice/INV-1/initiate-payment',
+                                      headers=auth_headers(app, ids['tier1'], 'tier1_seller'))
+    return app, ids, pay
+
+
+def _gateway(app):
+    with app.app_context():
+        return get_gateway()
+
+
+def _intent_id(app):
+    with app.app_context():
+        return Invoice.query.filter_by(invoice_number='INV-1').one().stripe_payment_intent_id
+
+
+def test_open_intent_is_handed_out_again(payment):
+    app, _, pay = payment
+    first, second = pay(), pay()
+
+    assert first.status_code == second.status_code == 200
+    assert first.get_json()['client_secret'] == second.get_json()['client_secret']
+    assert _gateway(app).stats['payment_intents'] == 1
+
+
+def test_failed_lookup_is_retryable_and_creates_no_intent(payment, monkeypatch):
+    app, _, pay = payment
+    assert pay().status_code == 200
+    gateway = _gateway(app)
+
+    def unavailable(intent_id):
+        raise PaymentGatewayError('connection reset')
+    monkeypatch.setattr(gateway, 'retrieve_payment_intent', unavailable)
+
+    assert pay().status_code == 503
+    assert gateway.stats['payment_intents'] == 1
+
+
+def test_cancelled_intent_is_replaced(payment):
+    app, _, pay = payment
+    assert pay().status_code == 200
+    previous = _intent_id(app)
+    _gateway(app).cancel_payment_intent(previous)
+
+    assert pay().status_code == 200
+    assert _intent_id(app) != previous
+
+
+def test_changed_amount_cancels_the_outdated_intent_first(payment):
+    app, ids, pay = payment
+    assert pay().status_code == 200
+    previous = _intent_id(app)
+    with app.app_context():
+        db.session.get(SubscriptionPlan, ids['plan']).admin_commission_pct = 15
+        db.session.commit()
+
+    assert pay().status_code == 200
+    gateway = _gateway(app)
+    assert gateway.retrieve_payment_intent(previous)['status'] == 'canceled'
+    assert gateway.retrieve_payment_intent(_intent_id(app))['amount'] == 1500
+
+
+def test_processing_intent_blocks_a_new_amount(payment):
+    app, ids, pay = payment
+    assert pay().status_code == 200
+    gateway = _gateway(app)
+    gateway._intents[_intent_id(app)]['status'] = 'processing'
+    with app.app_context():
+        db.session.get(SubscriptionPlan, ids['plan']).admin_commission_pct = 15
+        db.session.commit()
+
+    assert pay().status_code == 409
+    assert gateway.stats['payment_intents'] == 1
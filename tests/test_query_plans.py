@@ -0,0 +1,48 @@
+from sqlalchemy import text
+
+from app import db
+from app.database_setup import explain_hot_path_queries
+from app.models.billing import ProjectBilling
+
+from conftest import auth_headers, seed
+
+
+def test_dashboard_and_billing_queries_use_an_index(app):
+    with app.app_context():
+        results = explain_hot_path_queries()
+
+    full_scans = {name: plan for name, (uses_index, plan) in results.items() if not uses_index}
+    assert not full_scans
+
+
+def test_missing_index_is_reported_as_a_full_scan(app):
+    with app.app_context():
+        with db.engine.begin() as conn:
+            conn.execute(text('DROP INDEX ix_invoices_paid_date_status'))
+        db.engine.dispose()  # pooled SQLite connections keep their cached statements
+        uses_index, plan = explain_hot_path_queries()['admin dashboard revenue']
+
+    assert not uses_index
+    assert 'SCAN invoices' in plan
+
+
+def test_dashboards_run_the_explained_statements(app):
+    ids = seed(app)
+    with app.app_context():
+        db.session.add_all([
+            ProjectBilling(project_id=ids['direct_project'], billing_type='Monthly Retainer', amount=100, status='paid'),
+            ProjectBilling(project_id=ids['resold_project'], billing_type='Monthly Retainer', amount=100, status='pending'),
+        ])
+        db.session.commit()
+    client = app.test_client()
+
+    tier1 = client.get(f"/api/admin/dashboard/tier1/{ids['tier1']}", headers=auth_headers(app, ids['tier1'], 'tier1_seller'))
+    tier2 = client.get(f"/api/admin/dashboard/tier2/{ids['tier2']}", headers=auth_headers(app, ids['tier2'], 'tier2_seller'))
+
+    assert tier1.status_code == 200
+    assert tier1.get_json()['stats'] == {
+        'tier1_seller_id': ids['tier1'], 'total_tier2_sellers': 1, 'total_projects': 1,
+        'total_revenue': 0.0, 'total_paid': 10.0, 'pending_amount': 2.0
+    }
+    assert tier2.status_code == 200
+    assert tier2.get_json()['stats']['pending_amount'] == 20.0
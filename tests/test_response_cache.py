@@ -0,0 +1,91 @@
+import pytest
+
+from app import db
+from app.models.billing import ProjectBilling
+from app.utils.response_cache import LocalStore, SharedBackend
+
+from conftest import auth_headers, seed
+
+
+def _add_bill(project_id, status='paid'):
+    db.session.add(ProjectBilling(project_id=project_id, billing_type='Monthly Retainer', amount=100, status=status))
+
+
+@pytest.fixture
+def cached_app(make_app):
+    app = make_app(RESPONSE_CACHE_BACKEND='redis', RESPONSE_CACHE_URL='memory://')
+    return app, seed(app)
+
+
+def test_dashboard_is_cached_until_a_bill_is_written(cached_app):
+    app, ids = cached_app
+    client = app.test_client()
+    headers = auth_headers(app, ids['admin'], 'admin')
+
+    assert client.get('/api/admin/dashboard', headers=headers).headers['X-Cache'] == 'MISS'
+    assert client.get('/api/admin/dashboard', headers=headers).headers['X-Cache'] == 'HIT'
+
+    with app.app_context():
+        _add_bill(ids['direct_project'])
+        db.session.commit()
+
+    assert client.get('/api/admin/dashboard', headers=headers).headers['X-Cache'] == 'MISS'
+
+
+def test_rolled_back_transaction_keeps_the_cache(cached_app):
+    app, ids = cached_app
+    client = app.test_client()
+    headers = auth_headers(app, ids['admin'], 'admin')
+    client.get('/api/admin/dashboard', headers=headers)
+
+    with app.app_context():
+        _add_bill(ids['direct_project'])
+        db.session.flush()
+        db.session.rollback()
+        db.session.commit()
+
+    assert client.get('/api/admin/dashboard', headers=headers).headers['X-Cache'] == 'HIT'
+
+
+def test_failed_savepoint_does_not_lose_earlier_writes(cached_app):
+    app, ids = cached_app
+    client = app.test_client()
+    headers = auth_headers(app, ids['tier1'], 'tier1_seller')
+    url = f"/api/admin/dashboard/tier1/{ids['tier1']}"
+    client.get(url, headers=headers)
+
+    # Same shape as stripe_events.process_events: one savepoint per event, one commit per batch
+    with app.app_context():
+        with db.session.begin_nested():
+            _add_bill(ids['resold_project'])
+        with pytest.raises(ValueError):
+            with db.session.begin_nested():
+                _add_bill(ids['resold_project'])
+                db.session.flush()
+                raise ValueError('event failed')
+        # Requests served while the batch is open still see the committed state
+        assert client.get(url, headers=headers).headers['X-Cache'] == 'HIT'
+        db.session.commit()
+
+    assert client.get(url, headers=headers).headers['X-Cache'] == 'MISS'
+
+
+def test_invalidation_reaches_every_worker_sharing_the_store(make_app):
+    store = LocalStore()
+    worker_a = make_app(RESPONSE_CACHE_BACKEND='redis', RESPONSE_CACHE_URL='memory://')
+    ids = seed(worker_a)
+    worker_b = make_app(RESPONSE_CACHE_BACKEND='redis', RESPONSE_CACHE_URL='memory://')
+    for worker in (worker_a, worker_b):
+        worker.extensions['response_cache'] = SharedBackend(store, ttl=30)
+
+    client_b = worker_b.test_client()
+    headers = auth_headers(worker_b, ids['tier2'], 'tier2_seller')
+    url = f"/api/admin/dashboard/tier2/{ids['tier2']}"
+    client_b.get(url, headers=headers)
+    assert client_b.get(url, headers=headers).headers['X-Cache'] == 'HIT'
+
+    with worker_a.app_context():
+        _add_bill(ids['resold_project'])
+        db.session.commit()
+
+    assert client_b.get(url, headers=headers).headers['X-Cache'] == 'MISS'
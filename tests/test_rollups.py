@@ -0,0 +1,77 @@
+from datetime import date
+from decimal import Decimal
+
+from app import db
+from app.models.billing import Invoice, ProjectBilling, RevenueRollup
+from app.models.project import SubscriptionPlan
+from app.services import rollups
+
+from conftest import seed
+
+
+def _rollups():
+    return {
+        (row.tier2_seller_id, row.month, row.status): (row.bill_count, row.amount, row.admin_commission, row.tier1_commission)
+        for row in RevenueRollup.query.all()
+        if row.bill_count or row.amount or row.admin_commission or row.tier1_commission
+    }
+
+
+def _bill_with_invoice(project_id):
+    bill = ProjectBilling(project_id=project_id, billing_type='Monthly Retainer', amount=100, status='invoiced')
+    db.session.add(bill)
+    db.session.flush()
+    db.session.add(Invoice(billing_record_id=bill.id, project_id=project_id, invoice_number=f"INV-{bill.id[:8]}",
+                           total_amount=100, issue_date=date.today(), due_date=date.today(), status='sent'))
+    db.session.commit()
+    return bill
+
+
+def _pay(bill, paid_date):
+    bill.invoice.status = 'paid'
+    bill.invoice.paid_date = paid_date
+    bill.status = 'paid'
+    db.session.commit()
+
+
+def test_payment_reverses_what_was_posted_after_a_plan_edit(app):
+    ids = seed(app)
+    with app.app_context():
+        bill = _bill_with_invoice(ids['resold_project'])
+
+        plan = db.session.get(SubscriptionPlan, ids['plan'])
+        plan.price = 250
+        plan.tier1_commission_pct = 40
+        db.session.commit()
+
+        _pay(bill, date.today())
+        # Nothing is left behind in the invoiced row the bill was posted to
+        assert [status for _, _, status in _rollups()] == ['paid']
+
+
+def test_paid_date_correction_moves_the_bill_to_another_month(app):
+    ids = seed(app)
+    with app.app_context():
+        bill = _bill_with_invoice(ids['direct_project'])
+        _pay(bill, date(2026, 3, 14))
+
+        bill.invoice.paid_date = date(2026, 2, 27)
+        db.session.commit()
+
+        assert list(_rollups()) == [('', date(2026, 2, 1), 'paid')]
+        assert _rollups()[('', date(2026, 2, 1), 'paid')][2] == Decimal('10')
+
+
+def test_incremental_rollups_match_a_rebuild(app):
+    ids = seed(app)
+    with app.app_context():
+        for project in ('direct_project', 'resold_project'):
+            _pay(_bill_with_invoice(ids[project]), date.today())
+        _bill_with_invoice(ids['resold_project'])
+        db.session.delete(ProjectBilling.query.filter_by(status='invoiced').one().invoice)
+        db.session.delete(ProjectBilling.query.filter_by(status='invoiced').one())
+        db.session.commit()
+        incremental = _rollups()
+
+        rollups.rebuild_rollups()
+        assert _rollups() == incremental
@@ -0,0 +1,49 @@
+import time
+
+import pytest
+
+from app import scheduling
+
+
+def test_lease_is_held_until_released(app):
+    with app.app_context():
+        assert scheduling.acquire_lease('test', 'node-a', 30)
+        assert not scheduling.acquire_lease('test', 'node-b', 30)
+        assert scheduling.acquire_lease('test', 'node-a', 30)
+
+        lease = scheduling.current_lease('test')
+        assert lease['holder'] == 'node-a'
+        assert not lease['expired']
+
+        scheduling.release_lease('test', 'node-a')
+        assert scheduling.current_lease('test')['expired']
+        assert scheduling.acquire_lease('test', 'node-b', 30)
+
+
+def test_unrenewed_lease_expires_by_the_database_clock(app):
+    with app.app_context():
+        assert scheduling.acquire_lease('test', 'node-a', 1)
+        assert not scheduling.acquire_lease('test', 'node-b', 30)
+        time.sleep(2.1)
+        assert scheduling.acquire_lease('test', 'node-b', 30)
+        assert scheduling.current_lease('test')['holder'] == 'node-b'
+
+
+def test_scheduled_billing_stops_when_the_lease_is_lost(app):
+    from app.models.billing import BillingRun, ProjectBilling
+    from app.tasks import run_billing
+    from conftest import seed
+
+    seed(app)
+    with app.app_context():
+        assert scheduling.acquire_lease(scheduling.SCHEDULER_LEASE, 'node-a', 30)
+        scheduling.release_lease(scheduling.SCHEDULER_LEASE, 'node-a')
+        assert scheduling.acquire_lease(scheduling.SCHEDULER_LEASE, 'node-b', 30)
+
+        with pytest.raises(scheduling.LeaseLost):
+            run_billing(chunk_size=1, lease_holder='node-a')
+        assert ProjectBilling.query.count() == 0
+        assert BillingRun.query.one().status == 'failed'
+
+        report = run_billing(chunk_size=1, lease_holder='node-b')
+        assert report['projects_billed'] == 2
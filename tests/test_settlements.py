@@ -0,0 +1,127 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from app import db
+from app.models import Tier1Seller
+from app.models.billing import Invoice, ProjectBilling
+from app.models.settlement import SettlementEntry, SettlementPayout
+from app.services import settlements
+from app.services.payment_gateway import get_gateway
+
+from conftest import seed
+
+YESTERDAY = settlements.settlement_period(date.today() - timedelta(days=1))
+TODAY = settlements.settlement_period(date.today())
+
+
+@pytest.fixture
+def settlement_app(make_app):
+    app = make_app(PAYMENT_GATEWAY='fake', PAYMENT_FAKE_LATENCY_MS=0, PAYMENT_FAKE_FAILURE_RATE=0,
+                   ADMIN_STRIPE_ACCOUNT_ID='acct_admin')
+    ids = seed(app)
+    with app.app_context():
+        db.session.get(Tier1Seller, ids['tier1']).stripe_account_id = 'acct_tier1'
+        db.session.commit()
+    return app, ids
+
+
+def _queue(project_id, number, period, shares):
+    """A paid invoice with one queued settlement entry per (party_type, party_id, amount)."""
+    bill = ProjectBilling(project_id=project_id, billing_type='Monthly Retainer', amount=100, status='paid')
+    db.session.add(bill)
+    db.session.flush()
+    invoice = Invoice(billing_record_id=bill.id, project_id=project_id, invoice_number=f"INV-{number}",
+                      total_amount=100, issue_date=date.today(), due_date=date.today(), status='paid')
+    db.session.add(invoice)
+    db.session.flush()
+    for party_type, party_id, amount in shares:
+        db.session.add(SettlementEntry(invoice_id=invoice.id, party_type=party_type, party_id=party_id,
+                                       amount=amount, currency='usd', period=period))
+    db.session.commit()
+
+
+def _make_due():
+    SettlementPayout.query.update({'next_attempt_at': datetime.utcnow() - timedelta(seconds=1)})
+    db.session.commit()
+
+
+def test_closed_periods_are_settled_in_one_transfer_per_party(settlement_app):
+    app, ids = settlement_app
+    with app.app_context():
+        _queue(ids['resold_project'], 1, YESTERDAY, [('tier1_seller', ids['tier1'], 1600), ('admin', '', 200)])
+        _queue(ids['resold_project'], 2, YESTERDAY, [('tier1_seller', ids['tier1'], 1600), ('admin', '', 200)])
+        _queue(ids['resold_project'], 3, TODAY, [('tier1_seller', ids['tier1'], 1600)])
+
+        report = settlements.run_settlement()
+
+        assert report == {'payouts_created': 2, 'sent': 2, 'retrying': 0, 'failed': 0}
+        payouts = {payout.party_type: payout for payout in SettlementPayout.query.all()}
+        assert (payouts['tier1_seller'].amount, payouts['tier1_seller'].entry_count) == (3200, 2)
+        assert (payouts['admin'].amount, payouts['admin'].destination_account) == (400, 'acct_admin')
+        assert {payout.status for payout in payouts.values()} == {'paid'}
+        assert get_gateway().stats['transfers'] == 2
+        # Today's period is still open
+        assert SettlementEntry.query.filter_by(status='queued').one().period == TODAY
+
+        assert settlements.run_settlement() == {'payouts_created': 0, 'sent': 0, 'retrying': 0, 'failed': 0}
+
+
+def test_failing_payout_is_retried_with_backoff_then_marked_failed(settlement_app):
+    app, ids = settlement_app
+    with app.app_context():
+        db.session.get(Tier1Seller, ids['tier1']).stripe_account_id = None
+        db.session.commit()
+        _queue(ids['direct_project'], 1, YESTERDAY, [('tier1_seller', ids['tier1'], 1800)])
+
+        assert settlements.run_settlement()['retrying'] == 1
+        payout = SettlementPayout.query.one()
+        assert (payout.status, payout.attempts) == ('pending', 1)
+        assert payout.next_attempt_at > datetime.utcnow() + timedelta(seconds=50)
+        assert 'No Stripe account' in payout.last_error
+
+        # Not due yet
+        assert settlements.send_payouts() == {'sent': 0, 'retrying': 0, 'failed': 0}
+
+        for _ in range(settlements.MAX_PAYOUT_ATTEMPTS - 1):
+            _make_due()
+            settlements.send_payouts()
+        payout = SettlementPayout.query.one()
+        assert (payout.status, payout.attempts) == ('failed', settlements.MAX_PAYOUT_ATTEMPTS)
+        assert get_gateway().stats['transfers'] == 0
+
+
+def test_payout_succeeds_once_the_account_is_configured(settlement_app):
+    app, ids = settlement_app
+    with app.app_context():
+        tier1 = db.session.get(Tier1Seller, ids['tier1'])
+        tier1.stripe_account_id = None
+        db.session.commit()
+        _queue(ids['direct_project'], 1, YESTERDAY, [('tier1_seller', ids['tier1'], 1800)])
+        assert settlements.run_settlement()['retrying'] == 1
+
+        db.session.get(Tier1Seller, ids['tier1']).stripe_account_id = 'acct_tier1'
+        db.session.commit()
+        _make_due()
+
+        assert settlements.send_payouts() == {'sent': 1, 'retrying': 0, 'failed': 0}
+        payout = SettlementPayout.query.one()
+        assert (payout.status, payout.attempts, payout.destination_account) == ('paid', 2, 'acct_tier1')
+        assert payout.transfer_id.startswith('tr_fake_')
+
+
+def test_payout_left_sending_by_a_dead_worker_is_sent_once(settlement_app):
+    app, ids = settlement_app
+    with app.app_context():
+        _queue(ids['direct_project'], 1, YESTERDAY, [('tier1_seller', ids['tier1'], 1800)])
+        settlements.aggregate_entries()
+        payout = SettlementPayout.query.one()
+        first = get_gateway().create_transfer(1800, 'usd', 'acct_tier1',
+                                              idempotency_key=f"settlement-payout-{payout.id}")
+        payout.status, payout.attempts = 'sending', 1
+        payout.next_attempt_at = datetime.utcnow() - settlements.SENDING_TIMEOUT - timedelta(seconds=1)
+        db.session.commit()
+
+        assert settlements.send_payouts()['sent'] == 1
+        assert SettlementPayout.query.one().transfer_id == first['id']
+        assert get_gateway().stats['transfers'] == 1
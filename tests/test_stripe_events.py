@@ -0,0 +1,69 @@
+from datetime import date, datetime, timedelta
+
+from app import db
+from app.models.billing import Invoice, ProjectBilling, StripeEvent
+from app.services import stripe_events
+
+from conftest import seed
+
+
+def _bad_event():
+    # No invoice_id in the metadata: applying it always fails
+    return {'id': 'evt_bad', 'type': 'payment_intent.succeeded', 'data': {'object': {'metadata': {}}}}
+
+
+def _make_due(event_id):
+    db.session.get(StripeEvent, event_id).next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+    db.session.commit()
+
+
+def test_failed_event_waits_out_its_backoff(app):
+    with app.app_context():
+        stripe_events.record_event(_bad_event())
+
+        assert stripe_events.process_events() == 1
+        event = db.session.get(StripeEvent, 'evt_bad')
+        assert event.attempts == 1
+        assert event.next_attempt_at > datetime.utcnow() + timedelta(seconds=20)
+
+        # The next polls skip it until it is due
+        assert stripe_events.process_events() == 0
+        assert stripe_events.drain_events() == 0
+
+        _make_due('evt_bad')
+        assert stripe_events.process_events() == 1
+        event = db.session.get(StripeEvent, 'evt_bad')
+        assert event.attempts == 2
+        assert event.next_attempt_at > datetime.utcnow() + timedelta(seconds=50)
+
+
+def test_event_is_marked_failed_after_the_last_attempt(app):
+    with app.app_context():
+        stripe_events.record_event(_bad_event())
+        for _ in range(stripe_events.MAX_EVENT_ATTEMPTS):
+            _make_due('evt_bad')
+            stripe_events.process_events()
+
+        event = db.session.get(StripeEvent, 'evt_bad')
+        assert (event.status, event.attempts) == ('failed', stripe_events.MAX_EVENT_ATTEMPTS)
+        _make_due('evt_bad')
+        assert stripe_events.process_events() == 0
+
+
+def test_late_payment_failure_leaves_a_paid_invoice_paid(app):
+    ids = seed(app)
+    with app.app_context():
+        bill = ProjectBilling(project_id=ids['direct_project'], billing_type='Monthly Retainer', amount=100, status='paid')
+        db.session.add(bill)
+        db.session.flush()
+        invoice = Invoice(billing_record_id=bill.id, project_id=ids['direct_project'], invoice_number='INV-1',
+                          total_amount=100, issue_date=date.today(), due_date=date.today(), status='paid')
+        db.session.add(invoice)
+        db.session.commit()
+
+        stripe_events.record_event({'id': 'evt_failed', 'type': 'payment_intent.payment_failed',
+                                    'data': {'object': {'metadata': {'invoice_id': invoice.id}}}})
+        assert stripe_events.process_events() == 1
+
+        assert db.session.get(Invoice, invoice.id).status == 'paid'
+        assert db.session.get(StripeEvent, 'evt_failed').status == 'processed'